@@ -5,6 +5,36 @@ DataShear - A Python package that allows you to split CSV files
 __version__ = "0.1.0"
 __author__ = "HakumenNC"
 
+from .adaptive import AdaptiveSizer
+from .arrays import Schema
+from .cache import RunCache
+from .cluster import ClusterError, Coordinator
 from .core import Splitter
+from .dedup import Deduplicator
+from .index import RowIndex
+from .memory import MemoryBudget
+from .plan import ShardPlan, SplitPlan
+from .stats import ZoneMap
+from .sink import ArchiveSink, FileSink, MemorySink, ObjectStoreSink, Sink
+from .validate import Validator
 
-__all__ = ["Splitter"]
\ No newline at end of file
+__all__ = [
+    "Splitter",
+    "SplitPlan",
+    "ShardPlan",
+    "RowIndex",
+    "RunCache",
+    "Coordinator",
+    "ClusterError",
+    "Deduplicator",
+    "Validator",
+    "AdaptiveSizer",
+    "MemoryBudget",
+    "ZoneMap",
+    "Schema",
+    "Sink",
+    "FileSink",
+    "MemorySink",
+    "ArchiveSink",
+    "ObjectStoreSink",
+]
\ No newline at end of file
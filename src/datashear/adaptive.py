@@ -0,0 +1,122 @@
+"""
+Adaptive shard limits, adjusted from downstream feedback while a split streams.
+"""
+
+import math
+from typing import Optional
+
+
+class AdaptiveSizer:
+    """
+    Adjusts the row or byte limit of the next shards of a split as each shard is closed.
+
+    With ``target_time``, ``feedback(shard)`` is called with every closed
+    shard and returns the throughput measured downstream, in rows or bytes
+    (the unit of the split limit) per second, or ``None`` while nothing was
+    measured; the next limit is what the consumer gets through in
+    ``target_time`` seconds, measures being smoothed by ``smoothing``
+    (the weight of the latest one). With ``shards=(low, high)``, the rest of
+    the input is spread over the shards left so that the split ends with
+    between ``low`` and ``high`` shards; the input size must be known. Size
+    limits leave room for the header and for the record that ends a shard,
+    so ``(n, n)`` gives ``n`` shards; row limits are converted with the bytes
+    per row seen so far (at first, over the start of the input), so the
+    count is approximate when rows vary in size. Both can be combined, the
+    count range then bounds the time target.
+
+    Limits stay within ``[min_limit, max_limit]``; ``limits`` records the
+    limit each shard was cut at.
+    """
+
+    def __init__(self, target_time: Optional[float] = None, feedback=None, shards: Optional[tuple] = None,
+                 min_limit: int = 1, max_limit: Optional[int] = None, smoothing: float = 0.5):
+        if target_time is None and shards is None: raise ValueError("target_time or shards must be given")
+        if target_time is not None and target_time <= 0: raise ValueError("target time must be greater than 0")
+        if target_time is not None and feedback is None: raise ValueError("target_time needs a feedback callback")
+        if shards is not None and not 0 < shards[0] <= shards[1]: raise ValueError("shards must be a (low, high) range")
+        if min_limit <= 0: raise ValueError("min limit must be greater than 0")
+        if max_limit is not None and max_limit < min_limit: raise ValueError("max limit must not be below min limit")
+        if not 0 < smoothing <= 1: raise ValueError("smoothing must be in (0, 1]")
+        self.target_time = target_time
+        self.feedback = feedback
+        self.shards = shards
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.smoothing = smoothing
+        self.unit: Optional[str] = None
+        self.limits: list = []
+        self.throughput: Optional[float] = None
+        self._expected_size = 0
+        self._header_size = 0
+        self._row_size: Optional[float] = None
+        self._rows = 0
+        self._bytes = 0
+
+    def bind(self, unit: str, limit: int, expected_size: int, header_size: int = 0, row_size: Optional[float] = None):
+        """
+        Start a split limited in ``unit`` (``rows`` or ``size``) at ``limit``; return the first limit.
+
+        ``expected_size`` is the bytes of records the split is expected to
+        write, 0 when unknown;
+        ``header_size`` the bytes of the header heading a shard and
+        ``row_size`` the average bytes of the first records, when known.
+        """
+        if self.shards is not None and not expected_size: raise ValueError("shards needs the input size")
+        self.unit = unit
+        self.limits = []
+        self.throughput = None
+        self._expected_size = expected_size
+        self._header_size = header_size
+        self._row_size = row_size
+        self._rows = self._bytes = 0
+        # with a time target the first limit only gets bounded, the throughput is not known yet
+        if self.shards is not None and (unit == "size" or row_size):
+            limit = self._spread(None if self.target_time is None else limit)
+        return self._clamp(limit)
+
+    def update(self, shard, limit: float, size: int):
+        """Account for a closed ``shard`` cut at ``limit``, holding ``size`` bytes of records; return the next limit."""
+        self.limits.append(limit)
+        self._rows += shard.rows
+        self._bytes += size
+        if self.target_time is not None:
+            measured = self.feedback(shard)
+            if measured:
+                previous = self.throughput
+                self.throughput = measured if previous is None else (
+                    self.smoothing * measured + (1 - self.smoothing) * previous)
+                limit = self.throughput * self.target_time
+        if self.shards is not None:
+            limit = self._spread(None if self.target_time is None or self.throughput is None else limit)
+        return self._clamp(limit)
+
+    def _spread(self, limit):
+        # limit of the next shard so that the rest of the input makes a count in the range;
+        # ``limit`` is the time target, kept when the range allows it
+        low, high = self.shards
+        written = len(self.limits)
+        remaining = self._expected_size - self._bytes
+        if remaining <= 0 and self.limits:
+            # the input outgrew its expected size: the shards left are cut like the last one
+            return self.limits[-1] if limit is None else limit
+        remaining = max(0, remaining)
+        # a shard is cut before the record that would go over its limit: room for the
+        # header and one more record keeps the share of the shard whole
+        room = self._header_size + (self._per_row() or 0) if self.unit == "size" else 0
+        # limits of a shard when the rest makes (high, middle, low) more shards; shards
+        # end a little below their limit, so the middle leaves room for that
+        bounds = [remaining / max(1, math.ceil(count - written)) + room for count in (high, (low + high) / 2, low)]
+        if self.unit == "rows": bounds = [math.ceil(bound / self._per_row()) for bound in bounds]
+        smallest, middle, largest = bounds
+        return middle if limit is None else min(max(limit, smallest), largest)
+
+    def _per_row(self):
+        # bytes per row seen so far, or over the start of the input before the first shard
+        return self._bytes / self._rows if self._rows else self._row_size
+
+    def _clamp(self, limit):
+        limit = max(self.min_limit, int(limit))
+        return limit if self.max_limit is None else min(limit, self.max_limit)
+
+    def to_dict(self):
+        return {'unit': self.unit, 'limits': self.limits, 'throughput': self.throughput}
@@ -0,0 +1,123 @@
+"""
+Typed NumPy column batches of records.
+
+NumPy is only imported when arrays are asked for.
+"""
+
+import csv
+import io
+from typing import Optional
+
+from .stats import ColumnStats
+
+# inferred column type -> NumPy dtype
+DTYPES = {
+    'int': 'int64',
+    'float': 'float64',
+    'date': 'datetime64[D]',
+    'datetime': 'datetime64[us]',
+    'string': 'str',
+}
+
+
+def require_numpy():
+    """Return the numpy module, or raise an ImportError saying it is needed."""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("NumPy is needed for array output: pip install numpy")
+    return numpy
+
+
+class Schema:
+    """
+    Column names and NumPy dtypes of the arrays built from records.
+
+    A ``str`` dtype gives fixed-width strings as wide as the longest value.
+    Integer columns with empty fields are inferred as ``float64`` (empty
+    fields become NaN); empty dates become NaT.
+    """
+
+    def __init__(self, columns: list, dtypes: list):
+        if len(columns) != len(dtypes): raise ValueError("schema needs one dtype per column")
+        self.columns = list(columns)
+        self.dtypes = list(dtypes)
+
+    @classmethod
+    def infer(cls, header: list, rows: list, given: Optional[dict] = None):
+        """Schema of ``header`` from sample ``rows``; ``given`` maps some columns to their dtype."""
+        given = given or {}
+        unknown = [column for column in given if column not in header]
+        if unknown: raise ValueError(f"Unknown column: {unknown[0]}")
+
+        dtypes = []
+        for i, column in enumerate(header):
+            if column in given:
+                dtypes.append(given[column])
+                continue
+            stats = ColumnStats()
+            stats.update([row[i] if i < len(row) else '' for row in rows])
+            kind = stats.kind or 'float'
+            if kind == 'int' and stats.nulls: kind = 'float'
+            dtypes.append(DTYPES[kind])
+        return cls(header, dtypes)
+
+    def convert(self, rows: list):
+        """Dict of column name -> array for a batch of parsed rows, one vectorized conversion per column."""
+        numpy = require_numpy()
+        width = len(self.columns)
+        if any(len(row) != width for row in rows): rows = [(row + [''] * width)[:width] for row in rows]
+        columns = zip(*rows) if rows else ([] for _ in self.columns)
+
+        arrays = {}
+        for name, dtype, values in zip(self.columns, self.dtypes, columns):
+            text = numpy.array(values, dtype=str)
+            try:
+                if dtype == 'str':
+                    arrays[name] = text
+                    continue
+                kind = numpy.dtype(dtype).kind
+                if kind == 'f': text = numpy.where(text == '', 'nan', text)
+                elif kind == 'M': text = numpy.where(text == '', 'NaT', text)
+                arrays[name] = text.astype(dtype)
+            except ValueError as e:
+                raise ValueError(f"Cannot convert column {name!r} to {dtype}: {e}")
+        return arrays
+
+
+def column_batches(header: list, records, batch_rows: int = 65536, schema=None, sample_rows: int = 1000,
+                   encoding: str = 'utf-8', delimiter: str = ','):
+    """
+    Yield dicts of column name -> array, for ``batch_rows`` records at a time.
+
+    The schema is ``schema`` (a Schema, or a dict of dtypes for some
+    columns) completed by inference on the first ``sample_rows`` records.
+    """
+    if batch_rows <= 0: raise ValueError("batch rows must be greater than 0")
+    require_numpy()
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_rows:
+            rows = _parse_batch(batch, encoding, delimiter)
+            batch = []
+            if not isinstance(schema, Schema): schema = Schema.infer(header, rows[:sample_rows], schema)
+            yield schema.convert(rows)
+    if batch:
+        rows = _parse_batch(batch, encoding, delimiter)
+        if not isinstance(schema, Schema): schema = Schema.infer(header, rows[:sample_rows], schema)
+        yield schema.convert(rows)
+
+
+def structured_array(arrays: dict):
+    """One structured array with a field per column, which can be saved as .npy and memory-mapped."""
+    numpy = require_numpy()
+    fields = [(name, array.dtype) for name, array in arrays.items()]
+    result = numpy.empty(len(next(iter(arrays.values()))) if arrays else 0, dtype=fields)
+    for name, array in arrays.items(): result[name] = array
+    return result
+
+
+def _parse_batch(batch: list, encoding: str, delimiter: str):
+    return list(csv.reader(io.StringIO(b"".join(batch).decode(encoding), newline=''), delimiter=delimiter))
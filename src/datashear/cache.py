@@ -0,0 +1,115 @@
+"""
+Cache of split runs, to skip re-splitting inputs that did not change.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+# bytes hashed at each end of the input for its fingerprint
+FINGERPRINT_SIZE = 64 * 1024
+
+
+class RunCache:
+    """
+    Remembers the shards written by earlier splits, keyed by input and parameters.
+
+    An entry holds the identity of the input (size, modification time and,
+    with ``fingerprint``, hashes of its first and last FINGERPRINT_SIZE bytes)
+    and the manifest of the shards. The fingerprint also tells when the input
+    was only appended to. At most ``max_entries`` entries are kept, the least
+    recently used are evicted first.
+    """
+
+    VERSION = 1
+
+    def __init__(self, directory: str, max_entries: int = 256, fingerprint: bool = True):
+        if max_entries <= 0: raise ValueError("max entries must be greater than 0")
+        self.directory = directory
+        self.max_entries = max_entries
+        self.fingerprint = fingerprint
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, parameters: dict):
+        data = json.dumps(parameters, sort_keys=True, default=_describe)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def identity(self, path: str):
+        stat = os.stat(path)
+        identity = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        if self.fingerprint:
+            with open(path, 'rb') as file:
+                identity['head'], identity['tail'] = _fingerprint(file, stat.st_size)
+        return identity
+
+    def unchanged(self, path: str, identity: dict):
+        """Whether the file at ``path`` still has ``identity``."""
+        stat = os.stat(path)
+        if (stat.st_size, stat.st_mtime) != (identity['size'], identity['mtime']): return False
+        return 'head' not in identity or self.identity(path) == identity
+
+    def appended(self, path: str, identity: dict):
+        """Whether the file at ``path`` is the file of ``identity`` with bytes added at the end."""
+        if 'head' not in identity: return False
+        size = os.path.getsize(path)
+        if size <= identity['size']: return False
+        with open(path, 'rb') as file:
+            return _fingerprint(file, identity['size']) == (identity['head'], identity['tail'])
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if entry.get('version') != self.VERSION: return None
+        # a hit makes the entry the most recently used one
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+        return entry
+
+    def put(self, key: str, entry: dict):
+        path = self._path(key)
+        temp = path + ".tmp"
+        with open(temp, 'w', encoding='utf-8') as file:
+            json.dump(dict(entry, version=self.VERSION), file)
+        os.replace(temp, path)
+        self.evict()
+
+    def evict(self):
+        entries = [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")
+        ]
+        if len(entries) <= self.max_entries: return
+        entries.sort(key=lambda path: os.stat(path).st_mtime_ns)
+        for path in entries[:len(entries) - self.max_entries]:
+            try: os.remove(path)
+            except FileNotFoundError: pass
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, key + ".json")
+
+
+def _fingerprint(file, size: int):
+    # hashes of the first and last bytes of the first ``size`` bytes of ``file``
+    file.seek(0)
+    head = hashlib.blake2b(file.read(min(size, FINGERPRINT_SIZE)), digest_size=16).hexdigest()
+    file.seek(max(0, size - FINGERPRINT_SIZE))
+    tail = hashlib.blake2b(file.read(min(size, FINGERPRINT_SIZE)), digest_size=16).hexdigest()
+    return head, tail
+
+
+def _describe(value):
+    # parameters that are not JSON, such as column types, are keyed by their full name; values
+    # without a stable one (lambdas, local functions, objects shown by address) cannot be keyed
+    name = getattr(value, '__qualname__', None)
+    if name is not None and '<' not in name: return f"{getattr(value, '__module__', None)}.{name}"
+    description = repr(value)
+    if name is not None or ' at 0x' in description:
+        raise ValueError(f"Runs with {description} cannot be cached: it has no stable description")
+    return description
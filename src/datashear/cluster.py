@@ -0,0 +1,409 @@
+"""
+Coordinator and workers splitting byte ranges of one input on several hosts.
+
+The coordinator cuts the input at record boundaries and hands the ranges out
+over a line-delimited JSON protocol on a TCP socket; workers on any host that
+sees the input and the output directory split their ranges and report the
+shards they wrote. Messages, one JSON object per line:
+
+    worker -> {"op": "next"}
+    coordinator -> {"task": {...}} | {"wait": seconds} | {"task": null} when all is done
+    worker -> {"op": "done", "task": id, "attempt": n, "shards": [...]}
+    worker -> {"op": "failed", "task": id, "attempt": n, "error": "..."}
+    coordinator -> {"ok": true}
+"""
+
+import collections
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Optional
+
+from .core import Splitter
+from .formats import FORMATS
+from .plan import read_header
+from .policy import Shard
+from .scanner import DEFAULT_BUFFER_SIZE, record_start
+from .stats import ZoneMap
+from .util import Util
+
+# bytes of input per range, unless a number of ranges is given
+DEFAULT_RANGE_SIZE = 64 * 1024 * 1024
+# split() options that need the whole input or write files of their own
+_UNSUPPORTED = ('sort_key', 'dedup', 'cache', 'validate', 'adaptive')
+
+
+class ClusterError(RuntimeError):
+    pass
+
+
+class Coordinator:
+    """
+    Hands quote-safe byte ranges of ``input_file`` to workers and collects their shards.
+
+    The input is cut into ``ranges`` ranges, or ranges of about
+    ``range_size`` bytes, each starting on a record boundary. ``options``
+    are the keywords of ``Splitter.split`` applied to every range. Workers
+    write their shards under hidden per-attempt names; once every range is
+    done the coordinator renames them in input order to globally numbered
+    names and writes a ``<base>_manifest.json``, so the output directory
+    must be shared. A range whose worker fails, disconnects or holds it
+    longer than ``lease`` seconds is handed out again, up to
+    ``max_attempts`` times; the files left by attempts that did not count,
+    complete or partial, are removed once the split is published or failed.
+
+    Ranges are split independently: the last shard of a range can be short.
+    """
+
+    VERSION = 1
+
+    def __init__(
+            self,
+            input_file: str,
+            output_dir: str = ".",
+            output_base_filename: str = "",
+            output_prefix: str = "",
+            output_sufix: str = "",
+            ranges: Optional[int] = None,
+            range_size: int = DEFAULT_RANGE_SIZE,
+            max_attempts: int = 3,
+            lease: Optional[float] = None,
+            host: str = "127.0.0.1",
+            port: int = 0,
+            encoding: Optional[str] = None,
+            delimiter: Optional[str] = None,
+            buffer_size: int = DEFAULT_BUFFER_SIZE,
+            **options
+    ):
+        if ranges is not None and ranges <= 0: raise ValueError("ranges must be greater than 0")
+        if range_size <= 0: raise ValueError("range size must be greater than 0")
+        if max_attempts <= 0: raise ValueError("max attempts must be greater than 0")
+        unsupported = [name for name in _UNSUPPORTED if options.get(name) not in (None, False)]
+        if unsupported: raise ValueError(f"{unsupported[0]} is not supported by distributed splits")
+        if options.get('repeat_header') is False: raise ValueError("distributed splits repeat the header in every shard")
+
+        # the dialect is settled once, so that all workers read the ranges alike
+        splitter = Splitter(input_file, output_dir, encoding=encoding, delimiter=delimiter)
+        if splitter.transcoded:
+            raise ValueError(f"Ranges and indexes need an ASCII-compatible encoding, not {splitter.source_encoding}")
+        self.input_file = input_file
+        self.output_dir = output_dir
+        self.output_base_filename = output_base_filename
+        self.output_prefix = output_prefix
+        self.output_sufix = output_sufix
+        self.encoding = splitter.encoding
+        self.delimiter = splitter.delimiter
+        self.options = options
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.host = host
+        self.port = port
+        self.ranges = self._ranges(splitter, ranges, range_size, buffer_size)
+
+        self._condition = threading.Condition()
+        self._pending = collections.deque(range(len(self.ranges)))
+        # task -> (attempt, connection, deadline) of the workers holding it
+        self._leases: dict = {}
+        self._attempts = [0] * len(self.ranges)
+        self._results: dict = {}
+        self._error: Optional[str] = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def address(self):
+        """``(host, port)`` workers connect to, once started."""
+        return self._server.server_address[:2]
+
+    def start(self):
+        self._server = _Server((self.host, self.port), _Handler)
+        self._server.coordinator = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None):
+        """Wait for every range, publish the shards and return them; raise ClusterError if a range failed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._error is None and len(self._results) < len(self.ranges):
+                self._expire()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0: raise TimeoutError("distributed split did not finish in time")
+                self._condition.wait(min(remaining or 1.0, 1.0))
+            error = self._error
+
+        if error is not None:
+            self._discard()
+            raise ClusterError(error)
+        return self._publish()
+
+    def close(self):
+        if self._server is None: return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ranges(self, splitter: Splitter, count: Optional[int], range_size: int, buffer_size: int):
+        # [start, stop) of each range, stop None for the last one; starts are record boundaries
+        size = os.path.getsize(self.input_file)
+        with open(self.input_file, 'rb') as file:
+            header = read_header(file, buffer_size)
+            data_size = size - len(header)
+            if count is None: count = max(1, -(-data_size // range_size))
+            self.columns = splitter._parse(header)
+            field_count = len(self.columns)
+            dialect = {'delimiter': self.delimiter, 'encoding': self.encoding}
+            starts = [len(header)]
+            for i in range(1, count):
+                start = record_start(file, len(header) + data_size * i // count, field_count, len(header),
+                                     buffer_size, **dialect)
+                if starts[-1] < start < size: starts.append(start)
+        return [[start, stop] for start, stop in zip(starts, starts[1:] + [None])]
+
+    def _task(self, task: int, attempt: int):
+        return {
+            'id': task,
+            'attempt': attempt,
+            'input': self.input_file,
+            'output_dir': self.output_dir,
+            'base': self.output_base_filename,
+            'prefix': _temporary_prefix(task, attempt, self.output_prefix),
+            'sufix': self.output_sufix,
+            'range': self.ranges[task],
+            'encoding': self.encoding,
+            'delimiter': self.delimiter,
+            'options': self.options,
+        }
+
+    def _next(self, connection):
+        with self._condition:
+            self._expire()
+            if self._error is not None or len(self._results) == len(self.ranges): return {'task': None}
+            if not self._pending: return {'wait': 0.1}
+            task = self._pending.popleft()
+            self._attempts[task] += 1
+            attempt = self._attempts[task]
+            deadline = None if self.lease is None else time.monotonic() + self.lease
+            self._leases[task] = (attempt, connection, deadline)
+            return {'task': self._task(task, attempt)}
+
+    def _done(self, task: int, attempt: int, shards: list):
+        with self._condition:
+            self._check(task, attempt, shards)
+            lease = self._leases.get(task)
+            if lease is not None and lease[0] == attempt: del self._leases[task]
+            if task in self._results or self._error is not None:
+                # a late or duplicate attempt: its shards are not needed
+                self._remove(shards)
+                return
+            self._results[task] = shards
+            if task in self._pending: self._pending.remove(task)
+            self._condition.notify_all()
+
+    def _check(self, task, attempt, shards):
+        # shard names come from the network and are renamed or removed in output_dir:
+        # only the hidden names of an attempt handed out are taken
+        if not isinstance(task, int) or not 0 <= task < len(self.ranges): raise ValueError(f"Unknown range: {task!r}")
+        if not isinstance(attempt, int) or not 0 < attempt <= self._attempts[task]:
+            raise ValueError(f"Unknown attempt of range {task}: {attempt!r}")
+        if not isinstance(shards, list): raise ValueError("shards must be a list")
+        prefix = _temporary_prefix(task, attempt, self.output_prefix) + "_"
+        for shard in shards:
+            name = shard.get('name') if isinstance(shard, dict) else None
+            if not isinstance(name, str) or os.path.basename(name) != name or not name.startswith(prefix):
+                raise ValueError(f"Not a shard of range {task}, attempt {attempt}: {name!r}")
+
+    def _failed(self, task: int, attempt: int, error: str):
+        with self._condition:
+            lease = self._leases.get(task)
+            if lease is None or lease[0] != attempt: return
+            del self._leases[task]
+            self._retry(task, error)
+
+    def _disconnected(self, connection):
+        with self._condition:
+            for task, lease in list(self._leases.items()):
+                if lease[1] is connection:
+                    del self._leases[task]
+                    self._retry(task, "worker disconnected")
+
+    def _expire(self):
+        now = time.monotonic()
+        for task, (_, _, deadline) in list(self._leases.items()):
+            if deadline is not None and deadline < now:
+                del self._leases[task]
+                self._retry(task, "lease expired")
+
+    def _retry(self, task: int, error: str):
+        # called with the condition held
+        if task in self._results: return
+        if self._attempts[task] >= self.max_attempts:
+            self._error = f"range {self.ranges[task]} failed {self._attempts[task]} times: {error}"
+        else:
+            self._pending.append(task)
+        self._condition.notify_all()
+
+    def _publish(self):
+        # global numbering follows the input order of the ranges
+        extension = FORMATS[self.options['format']].extension if self.options.get('format', "csv") != "csv" else ""
+        suffix = ".gz" if self.options.get('compression') else ""
+        shards = []
+        for task in range(len(self.ranges)):
+            for data in self._results[task]:
+                shard = Shard.from_dict(data)
+                shard.index = len(shards) + 1
+                name = self._filename(shard.index, extension) + suffix
+                os.replace(os.path.join(self.output_dir, shard.name), os.path.join(self.output_dir, name))
+                shard.name = name
+                shards.append(shard)
+
+        if self.options.get('stats') and shards:
+            zone_map = ZoneMap(self.columns, [{'name': shard.name, 'rows': shard.rows, 'columns': shard.stats}
+                                         for shard in shards])
+            zone_map.save(os.path.join(self.output_dir, self._filename("stats", ".json")))
+
+        manifest = {
+            'version': self.VERSION,
+            'input': os.path.abspath(self.input_file),
+            'ranges': self.ranges,
+            'attempts': self._attempts,
+            'shards': [shard.to_dict() for shard in shards],
+        }
+        path = os.path.join(self.output_dir, self._filename("manifest", ".json"))
+        with open(path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+        os.replace(path + ".tmp", path)
+        self._sweep()
+        return shards
+
+    def _discard(self):
+        self._sweep()
+
+    def _sweep(self):
+        # what is left under the hidden names of every attempt, e.g. by a worker that died while writing
+        _sweep(self.output_dir, [(task, attempt) for task, count in enumerate(self._attempts)
+                                 for attempt in range(1, count + 1)])
+
+    def _remove(self, shards: list):
+        for shard in shards:
+            try: os.remove(os.path.join(self.output_dir, shard['name']))
+            except FileNotFoundError: pass
+
+    def _filename(self, index, extension: str = ""):
+        return Util.get_output_filename(self.input_file, index, self.output_prefix, self.output_base_filename,
+                                        self.output_sufix, extension)
+
+
+def work(address, poll: float = 0.1):
+    """
+    Split the ranges handed out by the coordinator at ``address`` until it has none left.
+
+    ``address`` is ``(host, port)`` or ``"host:port"``. A range that fails
+    is reported and handed to another attempt. Returns the number of ranges
+    this worker split.
+    """
+    if isinstance(address, str):
+        host, _, port = address.rpartition(":")
+        address = (host, int(port))
+
+    done = 0
+    with socket.create_connection(address) as connection, connection.makefile('rwb') as stream:
+        while True:
+            reply = _request(stream, {'op': 'next'})
+            if 'wait' in reply:
+                time.sleep(reply['wait'] or poll)
+                continue
+            task = reply['task']
+            if task is None: return done
+
+            try:
+                shards = _split_range(task)
+            except Exception as e:
+                _request(stream, {'op': 'failed', 'task': task['id'], 'attempt': task['attempt'], 'error': repr(e)})
+                continue
+            _request(stream, {'op': 'done', 'task': task['id'], 'attempt': task['attempt'], 'shards': shards})
+            done += 1
+
+
+def _split_range(task: dict):
+    splitter = Splitter(task['input'], task['output_dir'], task['base'], task['prefix'], task['sufix'],
+                        byte_range=tuple(task['range']), encoding=task['encoding'], delimiter=task['delimiter'])
+    try:
+        shards = splitter.split(**task['options'])
+    except Exception:
+        # the shards written before the failure would never be published
+        _sweep(task['output_dir'], [(task['id'], task['attempt'])])
+        raise
+    # the coordinator writes one zone map for all ranges
+    if task['options'].get('stats') and shards: os.remove(os.path.join(task['output_dir'], splitter._stats_filename()))
+    return [shard.to_dict() for shard in shards]
+
+
+def _temporary_prefix(task: int, attempt: int, prefix: str):
+    # hidden, and distinct per attempt so a late attempt never overwrites the shards of another
+    return f".range{task}-{attempt}" + ("_" + prefix if prefix else "")
+
+
+def _sweep(output_dir: str, attempts: list):
+    # files of the given (task, attempt) pairs, shards or their durable ".<name>.part" copies
+    prefixes = tuple(_temporary_prefix(task, attempt, "") + "_" for task, attempt in attempts)
+    prefixes += tuple("." + prefix for prefix in prefixes)
+    if not prefixes or not os.path.isdir(output_dir): return
+    for name in os.listdir(output_dir):
+        if not name.startswith(prefixes): continue
+        try: os.remove(os.path.join(output_dir, name))
+        except FileNotFoundError: pass
+
+
+def _request(stream, message: dict):
+    stream.write(json.dumps(message).encode('utf-8') + b"\n")
+    stream.flush()
+    line = stream.readline()
+    if not line: raise ConnectionError("coordinator closed the connection")
+    return json.loads(line)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                op = message.get('op')
+                if op == 'next': reply = coordinator._next(self)
+                elif op == 'done':
+                    coordinator._done(message['task'], message['attempt'], message['shards'])
+                    reply = {'ok': True}
+                elif op == 'failed':
+                    coordinator._failed(message['task'], message['attempt'], message.get('error', ""))
+                    reply = {'ok': True}
+                else: reply = {'error': f"Unknown op: {op}"}
+                self.wfile.write(json.dumps(reply).encode('utf-8') + b"\n")
+                self.wfile.flush()
+        except (OSError, ValueError):
+            pass
+        finally:
+            coordinator._disconnected(self)
+
+
+if __name__ == "__main__":
+    # python -m datashear.cluster host:port
+    work(sys.argv[1])
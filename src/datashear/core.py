@@ -1,131 +1,1003 @@
 import os
+import codecs
+import copy
 import csv
+import datetime
 import io
+import itertools
+import gzip
+import json
+import weakref
+import zlib
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Union
+from .adaptive import AdaptiveSizer
+from .arrays import column_batches, require_numpy, structured_array
+from .cache import RunCache
+from .dedup import Deduplicator
+from .detect import SNIFF_SIZE, TranscodingReader, ascii_compatible, detect_encoding, sniff_delimiter
+from .formats import FORMATS
+from .index import RowIndex, row_offset
+from .keyrange import PERIODS, KeySearch, RecordCounter, floor
+from .memory import MemoryBudget
+from .naming import ShardNamer
+from .plan import SplitPlan, index_plan, read_header, sample_plan, scan_plan, split_header
+from .policy import Shard, SplitPolicy
+from .sampling import FractionRouter, reservoir_sample
+from .shuffle import DEFAULT_MEMORY_LIMIT, external_shuffle, terminate
+from .sort import SortKey, external_sort
+from .stats import ShardStats, ZoneMap
+from .scanner import DEFAULT_BUFFER_SIZE, RecordScanner, join_pieces, limit_pieces, record_start
+from .sink import FileSink, Sink
+from .source import AdvisedReader, StreamSource
 from .util import Util
+from .validate import RejectFile, Validator
 
 
 class Splitter:
     
     def __init__(
             self,
-            input_file: str,
+            input_file,
             output_dir: str = ".",
             output_base_filename: str = "",
             output_prefix: str = "",
-            output_sufix: str = ""
+            output_sufix: str = "",
+            sink: Optional[Sink] = None,
+            row_range: Optional[tuple] = None,
+            byte_range: Optional[tuple] = None,
+            index=None,
+            durable: bool = False,
+            encoding: Optional[str] = None,
+            delimiter: Optional[str] = None,
+            fadvise: bool = False,
+            memory=None,
+            name_template: Optional[str] = None,
+            fan_out: Optional[int] = None,
+            fan_out_depth: int = 1
     ):
-        self.input_file = input_file
+        # a path, or a file object: pipes and stdin are read as they come (see StreamSource)
+        if isinstance(input_file, (str, os.PathLike)):
+            self.input_file = os.fspath(input_file)
+            self.source = None
+            # file not found
+            if not os.path.exists(input_file): raise FileNotFoundError(f"Input file not found: {input_file}")
+        else:
+            self.input_file = None
+            self.source = StreamSource(input_file)
+            if index is not None: raise ValueError("Indexes need an input file, not a stream")
+            if encoding is None: encoding = self.source.encoding
+        self.input_name = self.input_file if self.source is None else self.source.name
+        # header bytes and first record offset of the last read, for streams that cannot be read again
+        self._header: Optional[bytes] = None
+        self._start: Optional[int] = None
         self.output_dir = output_dir
         self.output_base_filename = output_base_filename
         self.output_prefix = output_prefix
         self.output_sufix = output_sufix
+        # shard names are worked out once, then only the index changes (see ShardNamer)
+        self.namer = ShardNamer(self.input_name, output_prefix, output_base_filename, output_sufix, name_template,
+                                fan_out, fan_out_depth)
+        # input files read with sequential and DONTNEED advice, to spare the page cache
+        self.fadvise = fadvise
+        # only split data rows [start, stop) or the records starting in bytes [start, stop)
+        self.row_range = self._check_range(row_range, "row")
+        self.byte_range = self._check_range(byte_range, "byte")
+        if row_range is not None and byte_range is not None: raise ValueError("row_range and byte_range are exclusive")
+        # ranges of a pipe are found by seeking in a copy of it
+        if (row_range is not None or byte_range is not None) and self.source and not self.source.seekable:
+            self._spool()
 
-        # file not found
-        if not os.path.exists(input_file): raise FileNotFoundError(f"Input file not found: {input_file}")
-        # create folder if not exists
-        if not os.path.exists(output_dir): os.makedirs(output_dir)
+        # encoding and delimiter are sniffed from the first bytes unless given;
+        # inputs that cannot be scanned as bytes are transcoded to UTF-8 as they are read
+        self.source_encoding, self.delimiter = self._sniff(encoding, delimiter)
+        self.transcoded = not ascii_compatible(self.source_encoding)
+        self.encoding = 'utf-8' if self.transcoded else self.source_encoding
+        if self.transcoded and (row_range is not None or byte_range is not None or index is not None):
+            raise ValueError(f"Ranges and indexes need an ASCII-compatible encoding, not {self.source_encoding}")
+        # a saved row index lets row_range and plan jump to a row without counting from the start
+        self.index = RowIndex.load(index) if isinstance(index, str) else index
+        if self.index is not None and not self.index.matches(self.input_file): raise ValueError("Index does not match the input file")
+        # local folder unless another destination is given; durable shards are
+        # published under their names only once synced to disk
+        self.sink = sink if sink is not None else FileSink(output_dir, durable=durable)
+        # one limit in bytes (or a MemoryBudget) capping the buffer_size and memory_limit of every call
+        self.memory = MemoryBudget(memory) if isinstance(memory, int) else memory
+        if self.memory is not None:
+            bound = self.sink.memory_bound
+            if bound is None: raise ValueError("The memory of the sink is not bounded, or not known")
+            if bound > self.memory.sink_memory:
+                raise ValueError(f"The sink holds up to {bound} bytes, over the {self.memory.sink_memory} of the budget")
 
-    def by_rows(self, nb: int, repeat_header: bool = True ):
+    def by_rows(
+            self,
+            nb: int,
+            repeat_header: bool = True,
+            engine: str = "csv",
+            buffer_size: int = DEFAULT_BUFFER_SIZE,
+            **options
+    ):
+        # options: any other keyword of split()
         if nb <= 0: raise ValueError("rows per file must be greater than 0")
+        return self.split(rows=nb, repeat_header=repeat_header, engine=engine, buffer_size=buffer_size, **options)
 
-        with open(self.input_file, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
+    def by_size(
+            self,
+            size: int,
+            repeat_header: bool = True,
+            engine: str = "csv",
+            buffer_size: int = DEFAULT_BUFFER_SIZE,
+            **options
+    ):
+        # options: any other keyword of split()
+        if size <= 0: raise ValueError("size per file must be greater than 0")
+        return self.split(size=size, repeat_header=repeat_header, engine=engine, buffer_size=buffer_size, **options)
 
-            try: header = next(reader)
-            except: raise ValueError('CSV file is empty')
+    def split(
+            self,
+            rows: Optional[int] = None,
+            size: Optional[int] = None,
+            compressed_size: Optional[int] = None,
+            key=None,
+            max_span: Optional[tuple] = None,
+            repeat_header: bool = True,
+            compression: Optional[str] = None,
+            sort_key=None,
+            dedup=None,
+            dedup_mode: str = "exact",
+            stats: bool = False,
+            validate=False,
+            adaptive: Optional[AdaptiveSizer] = None,
+            cache=None,
+            format: str = "csv",
+            preallocate: bool = False,
+            memory_limit: int = DEFAULT_MEMORY_LIMIT,
+            temp_dir: Optional[str] = None,
+            workers: int = 1,
+            engine: str = "raw",
+            buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        """
+        Split in one pass, closing a shard as soon as any limit would be broken.
+
+        Limits are ``rows``, ``size`` (bytes), ``compressed_size`` (bytes of
+        the gzip output, needs ``compression="gzip"``), ``key`` and
+        ``max_span`` (see SplitPolicy). Sizes are counted on the bytes actually
+        written. Returns the list of written shards.
+
+        With ``sort_key`` (see SortKey) rows are sorted first by an external
+        merge sort using ``memory_limit`` bytes, temporary files in
+        ``temp_dir`` and ``workers`` processes; the merged rows are sharded as
+        they come out, so shards are sorted and do not overlap.
+
+        ``dedup`` drops repeated rows before they reach the shards: ``True``
+        compares whole rows, a column or list of columns compares those, and a
+        Deduplicator can be passed to read its counters afterwards.
+        ``dedup_mode="bloom"`` trades exactness for speed (see Deduplicator).
+        Sort and dedup share ``memory_limit``.
+
+        With ``stats``, the type, min, max and null count of every column are
+        gathered per shard while writing (``Shard.stats``) and saved to a
+        ``<base>_stats.json`` zone map next to the shards (see ZoneMap).
+
+        With ``validate``, records whose field count differs from the header
+        or whose quote is never closed are left out of the shards and written
+        to ``<base>_rejects.csv`` with their input offset and the reason; pass
+        a Validator to read its counters afterwards (see Validator).
+
+        With ``adaptive`` (an AdaptiveSizer), the ``size`` limit, or else the
+        ``rows`` limit, is only the first one: it is adjusted as each shard is
+        closed, from downstream throughput or a target shard count. The limit
+        of each shard is in ``Shard.limit`` and the manifest of the split is
+        saved as ``<base>_manifest.json``.
+
+        ``format`` writes shards as ``jsonl`` (one JSON object per row) or
+        ``tsv`` instead of CSV (see FORMATS); sizes count the bytes of the
+        format written.
+
+        With ``preallocate``, each shard is preallocated to the size limit
+        (``compressed_size`` when compressed) by sinks that can, then cut to
+        its final size when closed, so files are not grown by small appends.
+
+        ``cache`` is a RunCache or its directory. When the input and the
+        parameters match an earlier run whose shards are still in
+        ``output_dir``, those shards are returned without reading the input;
+        when the input was only appended to, the last shard and the following
+        ones are written again. Runs whose parameters have no stable
+        description, such as a lambda ``key``, cannot be cached.
+        """
+        policy = SplitPolicy(rows, size, compressed_size, key, max_span)
+        if not policy.limited: raise ValueError("at least one limit must be given")
+        if compression not in self.COMPRESSIONS: raise ValueError(f"Unknown compression: {compression}")
+        if compressed_size is not None and compression is None: raise ValueError("compressed_size needs a compression")
+        if format != "csv" and format not in FORMATS: raise ValueError(f"Unknown format: {format}")
+        if adaptive is not None and rows is None and size is None: raise ValueError("adaptive needs a rows or size limit")
+        if adaptive is not None and cache is not None: raise ValueError("adaptive splits cannot be cached")
+        engine = self._check_engine(engine)
+        buffer_size, memory_limit = self._buffer_size(buffer_size), self._memory_limit(memory_limit)
+
+        def run(splitter, first):
+            return splitter._split(policy, repeat_header, compression, sort_key, dedup, dedup_mode, stats, memory_limit,
+                                   temp_dir, workers, engine, buffer_size, first=first, format=format, validate=validate,
+                                   preallocate=preallocate, adaptive=adaptive)
+
+        with self._publish():
+            if cache is None:
+                shards = run(self, 1)
+            else:
+                if self.source is not None: raise ValueError("cache needs an input file, not a stream")
+                parameters = {
+                    'input': os.path.abspath(self.input_file),
+                    'output': [os.path.abspath(self.output_dir), self.output_prefix, self.output_base_filename,
+                               self.output_sufix, self.namer.template, self.namer.fan_out, self.namer.depth],
+                    'range': [self.row_range, self.byte_range],
+                    'split': [rows, size, compressed_size, key, max_span, repeat_header, compression, sort_key, dedup,
+                              dedup_mode, stats, bool(validate), engine, format,
+                              memory_limit if dedup is not None else None],
+                }
+                # sorted or deduplicated shards depend on the whole input, rejects on all of it
+                appendable = sort_key is None and dedup is None and self.row_range is None and self.byte_range is None
+                appendable = appendable and not self.transcoded and not validate
+                # raw CSV shards are byte copies of the input, so they tell where to resume
+                copied = engine == "raw" and format == "csv"
+                shards = self._cached_split(cache, parameters, run, repeat_header, copied, appendable, buffer_size)
+
+            if stats and shards: self._write_zone_map(shards, buffer_size)
+            if adaptive is not None and shards: self._write_manifest(shards, adaptive)
+        return shards
+
+    def _split(self, policy, repeat_header, compression, sort_key, dedup, dedup_mode, stats, memory_limit, temp_dir,
+               workers, engine, buffer_size, first=1, format="csv", validate=False, preallocate=False, adaptive=None):
+        # other formats serialize parsed rows, and validation counts the fields of
+        # raw records, so rows are not rewritten as CSV first
+        if format != "csv" or validate: engine = "raw"
+        rejects = RejectFile(lambda: self.sink.open(self._output_filename("rejects", ".csv")), self.encoding)
+
+        with self._open_pieces(engine, buffer_size) as (header, pieces), closing(rejects):
+            policy.bind(self._parse(header))
+            if validate:
+                validator = validate if isinstance(validate, Validator) else Validator(
+                    self.encoding, self.delimiter, buffer_size=buffer_size, temp_dir=temp_dir)
+                pieces = validator.bind(self._parse(header)).filter(pieces, self._start, rejects.write)
+            if sort_key is None and dedup is None and format == "csv":
+                return self._write_shards(header, pieces, policy, repeat_header, compression, stats, first,
+                                          preallocate=preallocate, adaptive=adaptive)
+
+            budget = memory_limit // 2 if sort_key is not None and dedup is not None else memory_limit
+            records = terminate(join_pieces(pieces), Util.line_terminator(header))
+
+            if dedup is not None:
+                if not isinstance(dedup, Deduplicator):
+                    dedup = Deduplicator(dedup, dedup_mode, budget, temp_dir, self.encoding, self.delimiter)
+                records = dedup.bind(self._parse(header)).filter(records, self._input_size())
+
+            if sort_key is not None:
+                key = SortKey(sort_key, self.encoding, self.delimiter).bind(self._parse(header))
+                records = external_sort(records, key, budget, temp_dir, workers)
+
+            output_format = None
+            if format != "csv":
+                output_format = FORMATS[format](self._parse(header))
+                header, records = output_format.header(), output_format.records(records, self.encoding, self.delimiter)
+
+            with closing(records):
+                return self._write_shards(header, ((record, True) for record in records), policy, repeat_header,
+                                          compression, stats, first, output_format, preallocate, adaptive)
+
+    def _cached_split(self, cache, parameters: dict, run, repeat_header: bool, copied: bool, appendable: bool,
+                      buffer_size: int):
+        if isinstance(cache, str): cache = RunCache(cache)
+        if not isinstance(self.sink, FileSink): raise ValueError("cache needs output files in output_dir")
+
+        key = cache.key(parameters)
+        identity = cache.identity(self.input_file)
+        entry = cache.get(key)
+        shards = None
+
+        if entry is not None:
+            previous = [Shard.from_dict(data) for data in entry['shards']]
+            if cache.unchanged(self.input_file, entry['input']) and self._shards_exist(previous): return previous
+
+            resume = entry.get('resume')
+            if resume and cache.appended(self.input_file, entry['input']) and self._shards_exist(previous[:-1]):
+                # the last shard may take more rows now, so it is written again with the new ones
+                resumed = copy.copy(self)
+                if resume['offset'] is not None: resumed.byte_range = (resume['offset'], None)
+                else: resumed.row_range = (resume['row'], None)
+                shards = previous[:-1] + run(resumed, resume['index'])
+
+        if shards is None: shards = run(self, 1)
 
-            output_index = 1
-            row_count = 0
-            current_file = None
-            current_writer = None
+        resume = None
+        if appendable and shards:
+            # where the last shard starts, as a data row and, for raw copies, as an input offset
+            with open(self.input_file, 'rb') as file:
+                header_size = len(read_header(file, buffer_size))
+            kept = shards[:-1]
+            offset = header_size + sum(
+                shard.size - (header_size if repeat_header or shard.index == 1 else 0) for shard in kept
+            )
+            resume = {
+                'index': shards[-1].index,
+                'row': sum(shard.rows for shard in kept),
+                'offset': offset if copied else None,
+            }
+        cache.put(key, {'input': identity, 'shards': [shard.to_dict() for shard in shards], 'resume': resume})
+        return shards
 
+    def _shards_exist(self, shards: list):
+        for shard in shards:
+            expected = shard.size if shard.compressed_size is None else shard.compressed_size
             try:
-                for row in reader:
-                    if row_count == 0:
-                        if current_file: current_file.close()
-
-                        output_filename = Util.get_output_filename(
-                            self.input_file,
-                            output_index,
-                            self.output_prefix,
-                            self.output_base_filename,
-                            self.output_sufix
-                        )
-
-                        output_path = os.path.join(self.output_dir, output_filename)
-                        current_file = open(output_path, 'w', newline='', encoding='utf-8')
-                        current_writer = csv.writer(current_file)
-
-                        if repeat_header or output_index == 1: current_writer.writerow(header)
-
-                    current_writer.writerow(row)
-                    row_count += 1               
-
-                    if row_count >= nb:
-                        Util.show_memory_usage()
-                        row_count = 0
-                        output_index += 1
-                        current_file.close()
-                        current_file = None
-                
+                if os.path.getsize(os.path.join(self.output_dir, shard.name)) != expected: return False
+            except OSError:
+                return False
+        return True
+
+    def _write_zone_map(self, shards: list, buffer_size: int):
+        if self._header is None:
+            with self._open_input() as file: self._header = read_header(file, buffer_size)
+        columns = self._parse(self._header)
+        zone_map = ZoneMap(columns, [{'name': shard.name, 'rows': shard.rows, 'columns': shard.stats} for shard in shards])
+        with self.sink.open(self._stats_filename()) as file:
+            file.write(json.dumps(zone_map.to_dict()).encode('utf-8'))
+
+    def _write_manifest(self, shards: list, adaptive: AdaptiveSizer):
+        manifest = {
+            'version': self.MANIFEST_VERSION,
+            'input': self.input_name,
+            'adaptive': adaptive.to_dict(),
+            'shards': [shard.to_dict() for shard in shards],
+        }
+        with self.sink.open(self._output_filename("manifest", ".json")) as file:
+            file.write(json.dumps(manifest).encode('utf-8'))
+
+    def shuffle(
+            self,
+            rows: Optional[int] = None,
+            size: Optional[int] = None,
+            seed=None,
+            memory_limit: int = DEFAULT_MEMORY_LIMIT,
+            temp_dir: Optional[str] = None,
+            repeat_header: bool = True,
+            engine: str = "raw",
+            buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        """
+        Split into shards of globally shuffled rows, limited by ``rows`` and/or ``size``.
+
+        Rows are shuffled through temporary files in ``temp_dir``, keeping the
+        working set under ``memory_limit`` bytes. Returns the written shards.
+        """
+        policy = SplitPolicy(rows, size)
+        if not policy.limited: raise ValueError("rows or size must be given")
+        buffer_size, memory_limit = self._buffer_size(buffer_size), self._memory_limit(memory_limit)
+
+        with self._publish(), self._open_pieces(self._check_engine(engine), buffer_size) as (header, pieces):
+            records = terminate(join_pieces(pieces), Util.line_terminator(header))
+            shuffled = external_shuffle(records, self._input_size(), seed, memory_limit, temp_dir)
+            with closing(shuffled):
+                return self._write_shards(header, ((record, True) for record in shuffled), policy, repeat_header, None)
+
+    def random_split(
+            self,
+            fractions,
+            seed=None,
+            repeat_header: bool = True,
+            engine: str = "raw",
+            buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        """
+        Send each row to a random subset, in one pass, e.g. ``{"train": 0.8, "test": 0.2}``.
+
+        Each subset is written to its own file, named after the subset. The
+        same seed gives the same subsets. Returns the written shards.
+        """
+        router = FractionRouter(fractions, seed)
+        buffer_size = self._buffer_size(buffer_size)
+
+        with self._publish(), self._open_pieces(self._check_engine(engine), buffer_size) as (header, pieces):
+            shards = [Shard(i, len(header) if repeat_header or i == 1 else 0) for i in range(1, len(router.names) + 1)]
+            outputs = []
+            try:
+                for shard, name in zip(shards, router.names):
+                    shard.name = self._output_filename(name)
+                    outputs.append(self.sink.open(shard.name))
+                    if shard.size: outputs[-1].write(header)
+
+                for record in join_pieces(pieces):
+                    slot = router.route()
+                    if slot is None: continue
+                    outputs[slot].write(record)
+                    shards[slot].rows += 1
+                    shards[slot].size += len(record)
             finally:
-                if current_file:
-                    current_file.close()
-                    current_file = None
+                for output in outputs: output.close()
 
+        return shards
 
-    def by_size(self, size: int, repeat_header: bool = True):
-        if size <= 0: raise ValueError("size per file must be greater than 0")
+    def sample(
+            self,
+            k: int,
+            seed=None,
+            name: str = "sample",
+            engine: str = "raw",
+            buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        """
+        Write a uniform random sample of exactly ``k`` rows, in input order, in O(k) memory.
+
+        The same seed gives the same sample. Returns the written shard.
+        """
+        with self._open_pieces(self._check_engine(engine), self._buffer_size(buffer_size)) as (header, pieces):
+            records = reservoir_sample(join_pieces(pieces), k, seed)
+
+        shard = Shard(1, len(header) + sum(len(record) for record in records))
+        shard.name = self._output_filename(name)
+        shard.rows = len(records)
+        with self._publish(), self.sink.open(shard.name) as output:
+            output.write(header)
+            for record in records: output.write(record)
+        return shard
+
+    def batches(
+            self,
+            batch_rows: int = 65536,
+            schema=None,
+            sample_rows: int = 1000,
+            engine: str = "raw",
+            buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        """
+        Yield the rows as typed NumPy arrays, one dict of column name -> array per ``batch_rows`` rows.
+
+        ``schema`` is a Schema, or a dict giving the dtype of some columns;
+        the others are inferred from the first ``sample_rows`` rows. Needs NumPy.
+        """
+        with self._open_pieces(self._check_engine(engine), self._buffer_size(buffer_size)) as (header, pieces):
+            yield from column_batches(self._parse(header), join_pieces(pieces), batch_rows, schema, sample_rows,
+                                      self.encoding, self.delimiter)
+
+    def to_arrays(
+            self,
+            rows: int,
+            format: str = "npy",
+            schema=None,
+            sample_rows: int = 1000,
+            engine: str = "raw",
+            buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        """
+        Write shards of ``rows`` rows as NumPy files instead of CSV.
+
+        An ``npy`` shard holds one structured array, with a field per column,
+        that ``numpy.load(path, mmap_mode='r')`` can memory-map; an ``npz``
+        shard holds one array per column. See ``batches`` for ``schema``.
+        Returns the written shards.
+        """
+        if rows <= 0: raise ValueError("rows per file must be greater than 0")
+        if format not in self.ARRAY_FORMATS: raise ValueError(f"Unknown array format: {format}")
+        numpy = require_numpy()
+        shards: list = []
+
+        def write(arrays):
+            shard = Shard(len(shards) + 1)
+            shard.name = self._output_filename(shard.index, "." + format)
+            shard.rows = len(next(iter(arrays.values())))
+            with _CountingWriter(self.sink.open(shard.name)) as output:
+                if format == "npy": numpy.lib.format.write_array(output, structured_array(arrays))
+                else: numpy.savez(output, **arrays)
+            shard.size = output.written
+            shards.append(shard)
 
-        with open(self.input_file, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
+        with self._publish():
+            pending = []
+            count = 0
+            for arrays in self.batches(min(rows, 65536), schema, sample_rows, engine, buffer_size):
+                pending.append(arrays)
+                count += len(next(iter(arrays.values())))
+                while count >= rows:
+                    merged = {name: numpy.concatenate([batch[name] for batch in pending]) for name in arrays}
+                    write({name: array[:rows] for name, array in merged.items()})
+                    pending = [{name: array[rows:] for name, array in merged.items()}]
+                    count -= rows
+            if count: write({name: numpy.concatenate([batch[name] for batch in pending]) for name in pending[0]})
+
+        return shards
+
+    def plan(
+            self,
+            rows: Optional[int] = None,
+            size: Optional[int] = None,
+            repeat_header: bool = True,
+            index=None,
+            estimate: bool = False,
+            buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        """
+        Work out the shards a raw split would produce, without writing anything.
 
+        The layout is exact and comes from one byte-level scan, or from
+        ``index`` (a RowIndex or the path of a saved one, defaulting to the
+        Splitter's) when splitting by rows only. With ``estimate=True`` a few
+        sampled blocks are read instead and the result is approximate. The
+        row or byte range of the Splitter is honoured.
+        """
+        if rows is None and size is None: raise ValueError("rows or size must be given")
+        if self.source is not None: self._spool()
+        if self.transcoded: raise ValueError(f"Plans need an ASCII-compatible encoding, not {self.source_encoding}")
+        if rows is not None and rows <= 0: raise ValueError("rows per file must be greater than 0")
+        if size is not None and size <= 0: raise ValueError("size per file must be greater than 0")
+        buffer_size = self._buffer_size(buffer_size)
+
+        if isinstance(index, str): index = RowIndex.load(index)
+        if index is not None and not index.matches(self.input_file): raise ValueError("Index does not match the input file")
+        index = index if index is not None else self.index
+
+        if index is not None and rows is not None and size is None and not estimate and self.byte_range is None:
+            first_row, last_row = self.row_range or (0, None)
+            return index_plan(self.input_file, index, rows, repeat_header, buffer_size, first_row, last_row)
+
+        with open(self.input_file, 'rb') as file:
+            window = self._window(file, read_header(file, buffer_size), buffer_size, index)
+
+        if estimate:
+            return sample_plan(self.input_file, rows, size, repeat_header, buffer_size, window,
+                               delimiter=self.delimiter, encoding=self.encoding)
+        return scan_plan(self.input_file, rows, size, repeat_header, buffer_size, window)
+
+    def execute(self, plan: SplitPlan, shards: Optional[list] = None, workers: int = 1, preallocate: bool = False,
+                buffer_size: int = DEFAULT_BUFFER_SIZE):
+        """
+        Write the shards of an exact plan; ``shards`` restricts it to some shard indices.
+
+        Each shard is a straight copy of its byte range, so independent
+        workers can each execute their part of ``plan.partition(n)``. With
+        ``preallocate`` each shard file gets its exact size up front. Returns
+        the written shards, in plan order.
+        """
+        if not plan.exact: raise ValueError("Only exact plans can be executed")
+        buffer_size = self._buffer_size(buffer_size)
+        if self.source is not None: raise ValueError("Plans of a stream are executed by the Splitter that made them")
+        if self.transcoded: raise ValueError(f"Plans need an ASCII-compatible encoding, not {self.source_encoding}")
+        stat = os.stat(self.input_file)
+        if (stat.st_size, stat.st_mtime) != (plan.input_size, plan.input_mtime):
+            raise ValueError("Input file changed since the plan was made")
+
+        wanted = None if shards is None else set(shards)
+        selected = [shard for shard in plan.shards if wanted is None or shard.index in wanted]
+
+        with open(self.input_file, 'rb') as file:
+            header = file.read(plan.header_size)
+
+        def write(shard):
+            written = Shard(shard.index, plan.shard_size(shard))
+            written.name = self._output_filename(shard.index)
+            written.rows = shard.rows
+            size = written.size if preallocate else None
+            with self._open_file() as file, self._open_shard(written.name, size) as output:
+                if plan.repeat_header or shard.index == 1: output.write(header)
+                file.seek(shard.start)
+                remaining = shard.end - shard.start
+                while remaining > 0:
+                    data = file.read(min(buffer_size, remaining))
+                    if not data: raise ValueError("Input file changed since the plan was made")
+                    output.write(data)
+                    remaining -= len(data)
+            return written
+
+        with self._publish():
+            if workers <= 1: return [write(shard) for shard in selected]
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(write, selected))
+
+    def by_key_range(
+            self,
+            column,
+            bounds: Optional[list] = None,
+            every=None,
+            key_type=None,
+            repeat_header: bool = True,
+            preallocate: bool = False,
+            buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        """
+        Split an input already sorted by ``column`` at key boundaries, reading little more than what is written.
+
+        With ``bounds``, a sorted list of keys, each shard holds the rows
+        whose key is in ``[bounds[i], bounds[i + 1])``, so ``[low, high]``
+        keeps the rows between two keys. With ``every`` ("hour", "day",
+        "week", a timedelta or a number) there is one shard per period that
+        holds rows. ``key_type`` converts the field text (see SortKey); with
+        ``every`` keys default to ISO date/times, or floats for a number.
+
+        Each boundary is found by a binary search over byte offsets, seeking
+        and resyncing on the next record, then each range is copied as raw
+        bytes: the cost grows with the number of boundaries and the output
+        size, not the input size. Empty ranges are skipped. With
+        ``preallocate`` each shard file gets its exact size up front.
+        Returns the written shards.
+        """
+        if (bounds is None) == (every is None): raise ValueError("bounds or every must be given")
+        buffer_size = self._buffer_size(buffer_size)
+        if self.row_range is not None or self.byte_range is not None:
+            raise ValueError("Key ranges cannot be combined with row or byte ranges")
+        every = PERIODS.get(every, every)
+        # a timedelta or a number, either way positive
+        if every is not None and every <= every * 0: raise ValueError("every must be greater than 0")
+        if key_type is None and isinstance(every, datetime.timedelta): key_type = datetime.datetime.fromisoformat
+        elif key_type is None and every is not None: key_type = float
+        if self.source is not None: self._spool()
+        if self.transcoded: raise ValueError(f"Key ranges need an ASCII-compatible encoding, not {self.source_encoding}")
+
+        key = SortKey(column if key_type is None else (column, key_type), self.encoding, self.delimiter)
+        with self._open_file() as file:
+            header = read_header(file, buffer_size)
+            columns = self._parse(header)
+            search = KeySearch(file, key.bind(columns), len(header), len(columns), buffer_size,
+                               delimiter=self.delimiter, encoding=self.encoding)
+
+            if bounds is not None:
+                keys = [((1, key_type(value) if key_type and isinstance(value, str) else value),) for value in bounds]
+                if any(a > b for a, b in zip(keys, keys[1:])): raise ValueError("bounds must be sorted")
+                offsets: list = []
+                for bound in keys: offsets.append(search.lower_bound(bound, offsets[-1] if offsets else None))
+                ranges = list(zip(offsets, offsets[1:]))
+            else:
+                ranges = []
+                offset = len(header)
+                while offset < search.size:
+                    first = search.key_at(offset)
+                    if first == ((0,),): raise ValueError(f"Empty key at offset {offset}")
+                    stop = search.lower_bound(((1, floor(first[0][1], every) + every),), offset)
+                    if stop <= offset: raise ValueError(f"Input is not sorted by {column}")
+                    ranges.append((offset, stop))
+                    offset = stop
+
+            with self._publish():
+                shards: list = []
+                for start, stop in ranges:
+                    if start >= stop: continue
+                    shards.append(self._copy_range(file, len(shards) + 1, header, start, stop, repeat_header,
+                                                   preallocate, buffer_size))
+                return shards
+
+    def _copy_range(self, file, index: int, header: bytes, start: int, stop: int, repeat_header: bool,
+                    preallocate: bool, buffer_size: int):
+        # a shard made of the input bytes [start, stop), records counted on the way
+        shard = Shard(index, len(header) if repeat_header or index == 1 else 0)
+        shard.name = self._output_filename(index)
+        counter = RecordCounter()
+        with self._open_shard(shard.name, shard.size + stop - start if preallocate else None) as output:
+            if shard.size: output.write(header)
+            file.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                data = file.read(min(buffer_size, remaining))
+                if not data: raise ValueError("Input file changed while splitting")
+                output.write(data)
+                counter.update(data)
+                remaining -= len(data)
+        shard.size += stop - start
+        shard.rows = counter.rows
+        return shard
+
+    MANIFEST_VERSION = 1
+    ENGINES = ("csv", "raw")
+    COMPRESSIONS = (None, "gzip")
+    ARRAY_FORMATS = ("npy", "npz")
+
+    def _check_engine(self, engine: str):
+        if engine not in self.ENGINES: raise ValueError(f"Unknown engine: {engine}")
+        return engine
+
+    def _buffer_size(self, buffer_size: int):
+        # the memory budget caps the read block, a smaller one passed to a call is kept
+        return buffer_size if self.memory is None else min(buffer_size, self.memory.buffer_size)
+
+    def _memory_limit(self, memory_limit: int):
+        return memory_limit if self.memory is None else min(memory_limit, self.memory.work_memory)
+
+    @staticmethod
+    def _check_range(bounds, kind: str):
+        if bounds is None: return None
+        start, stop = bounds
+        if start < 0: raise ValueError(f"{kind} range start must not be negative")
+        if stop is not None and stop < start: raise ValueError(f"{kind} range stop must not be before its start")
+        return start, stop
+
+    def _window(self, file, header: bytes, buffer_size: int, index=None):
+        # (first offset, stop offset, row count) of the records to split
+        index = index if index is not None else self.index
+        if self.row_range is not None:
+            start, stop = self.row_range
+            offset = row_offset(file, start, len(header), index, buffer_size)
+            return offset, None, None if stop is None else stop - start
+        if self.byte_range is not None:
+            start, stop = self.byte_range
+            field_count = len(self._parse(header))
+            dialect = {'delimiter': self.delimiter, 'encoding': self.encoding}
+            return record_start(file, start, field_count, len(header), buffer_size, **dialect), stop, None
+        return len(header), None, None
+
+    def _read_pieces(self, file, buffer_size: int):
+        if self.row_range is None and self.byte_range is None:
+            # header and records come from the same scan, without seeking back
+            header, pieces = split_header(RecordScanner(file, buffer_size).pieces())
+            self._start = len(header)
+            return header, pieces
+
+        header = read_header(file, buffer_size)
+        start, stop, rows = self._window(file, header, buffer_size)
+        self._start = start
+        file.seek(start)
+        pieces = RecordScanner(file, buffer_size).pieces()
+        if stop is not None or rows is not None: pieces = limit_pieces(pieces, start, stop, rows)
+        return header, pieces
+
+    def _read_rows(self, buffer_size: int):
+        if self.row_range is None and self.byte_range is None:
+            # utf-8-sig also reads files without a BOM
+            encoding = 'utf-8-sig' if self.encoding == 'utf-8' else self.encoding
+            with io.TextIOWrapper(_buffered(self._open_input(), buffer_size), encoding, newline='') as file:
+                yield from csv.reader(file, delimiter=self.delimiter)
+            return
+
+        with self._open_input() as file:
+            header, pieces = self._read_pieces(file, buffer_size)
+            yield self._parse(header)
+            yield from csv.reader((record.decode(self.encoding) for record in join_pieces(pieces)), delimiter=self.delimiter)
+
+    def _output_filename(self, output_index: Union[int, str], extension: str = ""):
+        return self.namer.name(output_index, extension)
+
+    @contextmanager
+    def _publish(self):
+        # shards of a failed split are never published by sinks that hold them back
+        try:
+            yield
+        except BaseException:
+            self.sink.discard()
+            raise
+        self.sink.flush()
+
+    def _stats_filename(self):
+        # <base>_stats.json, next to the shards
+        return self._output_filename("stats", ".json")
+
+    def _open_shard(self, name: str, size: Optional[int] = None):
+        # the expected size is only passed on when known, so sinks without the hint keep working
+        return self.sink.open(name) if size is None else self.sink.open(name, size)
+
+    def _parse(self, record: bytes):
+        text = record.decode(self.encoding)
+        if text.startswith('\ufeff'): text = text[1:]
+        return next(csv.reader([text], delimiter=self.delimiter), [])
+
+    def _sniff(self, encoding: Optional[str], delimiter: Optional[str]):
+        if encoding is not None and delimiter is not None: return encoding, delimiter
+        if self.source is not None:
+            prefix = self.source.peek(SNIFF_SIZE + 1)
+        else:
+            with open(self.input_file, 'rb') as file: prefix = file.read(SNIFF_SIZE + 1)
+        complete = len(prefix) <= SNIFF_SIZE
+        prefix = prefix[:SNIFF_SIZE]
+        if encoding is None: encoding = detect_encoding(prefix, complete)
+        if delimiter is None:
+            text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(prefix, final=complete)
+            delimiter = sniff_delimiter(text.lstrip('\ufeff'), complete)
+        return encoding, delimiter
+
+    def _open_input(self):
+        # binary stream of the records, in self.encoding
+        file = self._open_file() if self.source is None else self.source.open()
+        return TranscodingReader(file, self.source_encoding) if self.transcoded else file
+
+    def _open_file(self):
+        return AdvisedReader(self.input_file) if self.fadvise else open(self.input_file, 'rb')
+
+    def _input_size(self):
+        # expected bytes of input, 0 when a pipe does not tell
+        if self.source is None: return os.path.getsize(self.input_file)
+        return self.source.size or 0
+
+    def _spool(self):
+        # modes that seek or stat the input read a temporary copy of a stream
+        self.input_file = self.source.spool()
+        weakref.finalize(self, _remove, self.input_file)
+        self.source = None
+
+    @contextmanager
+    def _open_pieces(self, engine: str, buffer_size: int):
+        # header bytes and (data, end) pieces of the records to split; the csv
+        # engine parses each row and writes it again with csv.writer
+        if engine == "raw":
+            with self._open_input() as file:
+                header, pieces = self._read_pieces(file, buffer_size)
+                self._header = header
+                yield header, pieces
+            return
+
+        with closing(self._read_rows(buffer_size)) as reader:
             try: header = next(reader)
             except: raise ValueError('CSV file is empty')
 
-            output_index = 1
-            current_size = 0
-            current_file = None
-            current_writer = None
-            header_size = 0
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, delimiter=self.delimiter)
+            self._header = Util.serialize_row(header, buffer, writer, self.encoding)
+            yield (
+                self._header,
+                ((Util.serialize_row(row, buffer, writer, self.encoding), True) for row in reader)
+            )
 
-            size_buffer = io.StringIO()
-            size_writer = csv.writer(size_buffer)
+    def _write_shards(self, header: bytes, pieces, policy: SplitPolicy, repeat_header: bool,
+                      compression: Optional[str], stats: bool = False, first: int = 1, output_format=None,
+                      preallocate: bool = False, adaptive: Optional[AdaptiveSizer] = None):
+        # rows of another format are read back with its parser
+        parse = self._parse if output_format is None else output_format.parse
+        extension = "" if output_format is None else output_format.extension
+        # an adaptive split changes the size limit, or else the rows limit, of the policy between shards
+        limit = 'max_size' if policy.max_size is not None else 'max_rows'
+        if adaptive is not None:
+            expected_size = max(0, self._input_size() - len(header))
+            row_size = None
+            if adaptive.shards is not None:
+                buffer_size = self._buffer_size(DEFAULT_BUFFER_SIZE)
+                pieces, expected_size, row_size = self._expected_output(pieces, header, buffer_size)
+            setattr(policy, limit, adaptive.bind(limit[4:], getattr(policy, limit), expected_size, len(header), row_size))
+        shards = []
+        current: Any = None
+        output: Any = None
+        counter: Any = None
+        # column statistics of the current shard, fed whole records
+        collector = None
+        parts = []
+        columns: list = []
+        if stats: columns = self._parse(header) if output_format is None else output_format.columns
+        suffix = ".gz" if compression else ""
 
-            if repeat_header:
-                header_size = Util.get_row_size(header, size_buffer, size_writer)
+        def flush(shard):
+            # what deflate holds back is emitted, so that the shard is closed on its actual compressed size
+            output.flush(zlib.Z_SYNC_FLUSH)
+            shard.compressed_size = counter.written
+            shard.pending = 0
 
-            try:
-                for row in reader:
-                    row_size = Util.get_row_size(row, size_buffer, size_writer)
-
-                    if current_file is None or (current_size + row_size > size and current_size > 0):
-                        if current_file: 
-                            current_file.close()
-                            Util.show_memory_usage()
-                            output_index += 1
-
-                        output_filename = Util.get_output_filename(
-                            self.input_file,
-                            output_index,
-                            self.output_prefix,
-                            self.output_base_filename,
-                            self.output_sufix
-                        )
-
-                        output_path = os.path.join(self.output_dir, output_filename)
-                        current_file = open(output_path, 'w', newline='', encoding='utf-8')
-                        current_writer = csv.writer(current_file)
-
-                        current_size = 0
-                        if repeat_header or output_index == 1:
-                            current_writer.writerow(header)
-                            current_size += header_size
-
-                    current_writer.writerow(row)
-                    current_size += row_size
-                
-            finally:
-                if current_file:
-                    current_file.close()
-                    current_file = None
\ No newline at end of file
+        try:
+            for shard, data, end in policy.layout(pieces, len(header), repeat_header, parse, first,
+                                                  flush if compression else None):
+                if shard is not current:
+                    if output:
+                        self._close_output(current, output, counter)
+                        if collector: current.stats = collector.to_dict()
+                        if adaptive: setattr(policy, limit, self._adapt(adaptive, current, len(header), repeat_header))
+
+                    current = shard
+                    current.name = self._output_filename(current.index, extension) + suffix
+                    if adaptive: current.limit = getattr(policy, limit)
+                    # shards are expected to fill up to the size limit of what is written
+                    expected = None
+                    if preallocate: expected = policy.max_compressed_size if compression else policy.max_size
+                    counter = _CountingWriter(self._open_shard(current.name, expected))
+                    output = gzip.GzipFile(filename="", mode='wb', fileobj=counter) if compression else counter
+                    shards.append(current)
+                    if repeat_header or current.index == 1: output.write(header)
+                    if stats:
+                        collector = ShardStats(columns, encoding=self.encoding, delimiter=self.delimiter,
+                                               parse=None if output_format is None else parse,
+                                               buffer_size=self._buffer_size(DEFAULT_BUFFER_SIZE))
+
+                output.write(data)
+                if collector:
+                    if not end: parts.append(data)
+                    elif parts:
+                        parts.append(data)
+                        collector.add(b"".join(parts))
+                        parts = []
+                    else: collector.add(data)
+                if compression:
+                    # pending counts the bytes deflate still holds back
+                    if counter.written != current.compressed_size:
+                        current.compressed_size = counter.written
+                        current.pending = 0
+                    current.pending += len(data)
+
+        finally:
+            if output: self._close_output(current, output, counter)
+
+        if collector: current.stats = collector.to_dict()
+        if adaptive and current: self._adapt(adaptive, current, len(header), repeat_header)
+
+        return shards
+
+    def _expected_output(self, pieces, header: bytes, buffer_size: int):
+        # pieces, the bytes of records a split of the window is expected to write and the average
+        # bytes of its first records: the window of the input, in the bytes written per byte of
+        # input over the first records, as another engine, format or line terminator changes them
+        pieces, rows, written, complete = _sample_rows(pieces, buffer_size)
+        if complete: return pieces, written, written / rows if rows else None
+        row_size = written / rows if rows else None
+        header_size, head_size = len(header), None
+        # a stream is not read twice, its bytes are taken as they are written
+        if self.source is None: header_size, head_size = self._head_sizes(rows, buffer_size)
+        size = self._input_size()
+        start = self._start if self.row_range is not None or self.byte_range is not None else header_size
+        window = max(0, size - start)
+        if self.byte_range is not None and self.byte_range[1] is not None:
+            window = max(0, min(size, self.byte_range[1]) - start)
+        if self.row_range is not None and self.row_range[1] is not None and head_size:
+            window = min(window, (self.row_range[1] - self.row_range[0]) * head_size / rows)
+        if head_size: window = window * written / head_size
+        return pieces, int(window), row_size
+
+    def _head_sizes(self, rows: int, buffer_size: int):
+        # bytes of input of the header and of the first ``rows`` records of the window
+        with self._open_input() as file:
+            header, pieces = split_header(RecordScanner(file, buffer_size).pieces())
+            if self.row_range is not None or self.byte_range is not None:
+                file.seek(self._start)
+                pieces = RecordScanner(file, buffer_size).pieces()
+            records = itertools.islice(join_pieces(pieces), rows)
+            if not self.transcoded: return len(header), sum(len(record) for record in records)
+            # sizes in the encoding of the input file
+            size = lambda data: len(data.decode(self.encoding).encode(self.source_encoding))
+            return size(header), sum(size(record) for record in records)
+
+    @staticmethod
+    def _adapt(adaptive: AdaptiveSizer, shard, header_size: int, repeat_header: bool):
+        # the sizer counts the bytes of records, not of the headers repeated in shards
+        size = shard.size - (header_size if repeat_header or shard.index == 1 else 0)
+        return adaptive.update(shard, shard.limit, size)
+
+    @staticmethod
+    def _close_output(shard, output, counter):
+        output.close()
+        if output is not counter:
+            counter.close()
+            shard.compressed_size = counter.written
+            shard.pending = 0
+
+
+class _CountingWriter(io.RawIOBase):
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._stream.write(data)
+        self.written += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed: self._stream.close()
+        super().close()
+
+
+def _buffered(stream, buffer_size: int):
+    # large-block reads for streams without a buffer of their own
+    return stream if isinstance(stream, io.BufferedIOBase) else io.BufferedReader(stream, buffer_size)
+
+
+def _remove(path: str):
+    try: os.remove(path)
+    except FileNotFoundError: pass
+
+
+def _sample_rows(pieces, limit: int):
+    # pieces that still start with the records within the first ``limit`` bytes, their count and
+    # bytes, and whether they are all the records
+    pieces = iter(pieces)
+    head = []
+    size = complete = rows = 0
+    for data, end in pieces:
+        head.append((data, end))
+        size += len(data)
+        if end: complete, rows = size, rows + 1
+        if size >= limit: break
+    else:
+        return head, rows, size, True
+    return itertools.chain(head, pieces), rows, complete, False
\ No newline at end of file
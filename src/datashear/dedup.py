@@ -0,0 +1,236 @@
+"""
+Streaming removal of duplicate records.
+"""
+
+import csv
+import hashlib
+import heapq
+import itertools
+import math
+import os
+import struct
+import tempfile
+from typing import Optional
+
+from .policy import column_index
+
+DIGEST_SIZE = 16
+# bytes taken by one digest in a Python set, at worst just after the set grows its table
+DIGEST_COST = 168
+# partitions written at once by a spill; a partition that outgrows the limit is partitioned again
+MAX_PARTITIONS = 256
+
+_ENTRY = struct.Struct('<QI')
+
+
+class Deduplicator:
+    """
+    Drops every record whose key was already seen, keeping first occurrences in order.
+
+    The key is the whole record, or the fields of ``columns`` (names or
+    indices). Keys are reduced to 128-bit digests. In ``exact`` mode the
+    digests are kept in a set until it outgrows ``memory_limit``; the rest of
+    the input is then hash-partitioned into temporary files and each partition
+    is deduplicated on its own, a partition that outgrows the limit in turn
+    being partitioned again. ``bloom`` mode uses a Bloom filter of
+    ``memory_limit`` bytes instead: faster and never spilled, but a few unique
+    records may be dropped as false positives.
+    """
+
+    MODES = ("exact", "bloom")
+
+    def __init__(self, columns=None, mode: str = "exact", memory_limit: int = 64 * 1024 * 1024,
+                 temp_dir: Optional[str] = None, encoding: str = 'utf-8', delimiter: str = ','):
+        if mode not in self.MODES: raise ValueError(f"Unknown dedup mode: {mode}")
+        if memory_limit <= 0: raise ValueError("memory limit must be greater than 0")
+        self.columns = None if columns is None or columns is True else (
+            list(columns) if isinstance(columns, (list, tuple)) else [columns]
+        )
+        self.mode = mode
+        self.memory_limit = memory_limit
+        self.temp_dir = temp_dir
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.records = 0
+        self.duplicates = 0
+        self.spilled = False
+        self._fields: Optional[list] = None
+
+    def bind(self, header: list):
+        if self.columns is not None: self._fields = [column_index(header, column) for column in self.columns]
+        return self
+
+    def digest(self, record: bytes):
+        if self._fields is None:
+            data = record.rstrip(b"\r\n")
+        else:
+            row = next(csv.reader([record.decode(self.encoding)], delimiter=self.delimiter), [])
+            data = b"".join(
+                len(value).to_bytes(4, 'little') + value
+                for value in (row[i].encode(self.encoding) if i < len(row) else b"" for i in self._fields)
+            )
+        return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+    def filter(self, records, expected_size: int = 0):
+        """Yield the records of ``records`` seen for the first time."""
+        if self.mode == "bloom": return self._filter_bloom(records)
+        return self._filter_exact(records, expected_size)
+
+    def _filter_bloom(self, records):
+        bloom = BloomFilter(self.memory_limit * 8)
+        for record in records:
+            self.records += 1
+            if bloom.add(self.digest(record)): yield record
+            else: self.duplicates += 1
+
+    def _filter_exact(self, records, expected_size):
+        seen = set()
+        capacity = max(1, self.memory_limit // DIGEST_COST)
+        consumed = 0
+        records = iter(records)
+
+        for record in records:
+            self.records += 1
+            consumed += len(record)
+            digest = self.digest(record)
+            if digest in seen:
+                self.duplicates += 1
+                continue
+            seen.add(digest)
+            yield record
+            if len(seen) >= capacity:
+                break
+        else:
+            return
+
+        # out of memory: the seen digests and the rest of the input go to partitions
+        self.spilled = True
+        average = consumed / self.records
+        remaining = max(0, expected_size - consumed) / average
+        count = _count(len(seen) + remaining, capacity)
+
+        with tempfile.TemporaryDirectory(prefix="datashear-dedup-", dir=self.temp_dir) as directory:
+            yield from self._spill(records, seen, count, directory)
+
+    def _spill(self, records, seen, count, directory):
+        counts = _scatter(self._entries(records), seen, count, os.path.join(directory, ""), 0)
+
+        # each partition keeps its first occurrences, the partitions are then merged back in input order
+        block_size = max(4096, self.memory_limit // (2 * count))
+        for i in range(count): self._dedup_partition(os.path.join(directory, str(i)), counts[i], block_size, 1)
+
+        kept = [_read_entries(os.path.join(directory, f"{i}.kept"), block_size) for i in range(count)]
+        for _, _, record in heapq.merge(*kept, key=lambda entry: entry[0]):
+            yield record
+
+    def _entries(self, records):
+        for position, record in enumerate(records):
+            self.records += 1
+            yield position, self.digest(record), record
+
+    def _dedup_partition(self, path, entries, block_size, level):
+        with open(path + ".seen", 'rb') as file:
+            data = file.read()
+        partition_seen = {data[j:j + DIGEST_SIZE] for j in range(0, len(data), DIGEST_SIZE)}
+        del data
+        # at least one new digest is taken at each level, even when the digests of the partition
+        # already fill the limit, so that partitioning again always makes progress
+        capacity = max(self.memory_limit // DIGEST_COST, len(partition_seen) + 1)
+
+        pending = _read_entries(path + ".records", block_size)
+        with open(path + ".kept", 'wb') as output:
+            for done, entry in enumerate(pending):
+                position, digest, record = entry
+                if digest in partition_seen:
+                    self.duplicates += 1
+                    continue
+                if len(partition_seen) >= capacity: break
+                partition_seen.add(digest)
+                _write_entry(output, position, digest, record)
+            else:
+                return
+
+        # the partition outgrew the limit as well, e.g. when the input size was unknown: its
+        # digests and the rest of its entries are partitioned again, then merged after what it kept
+        count = _count(len(partition_seen) + entries - done, max(1, self.memory_limit // DIGEST_COST))
+        try: counts = _scatter(itertools.chain([entry], pending), partition_seen, count, path + "-", level)
+        finally: pending.close()
+        block_size = max(4096, self.memory_limit // (2 * (count + 1)))
+        for i in range(count): self._dedup_partition(f"{path}-{i}", counts[i], block_size, level + 1)
+
+        os.replace(path + ".kept", path + ".head")
+        parts = [_read_entries(path + ".head", block_size)]
+        parts += [_read_entries(f"{path}-{i}.kept", block_size) for i in range(count)]
+        with open(path + ".kept", 'wb') as output:
+            for position, digest, record in heapq.merge(*parts, key=lambda entry: entry[0]):
+                _write_entry(output, position, digest, record)
+
+
+class BloomFilter:
+    """Bloom filter over digests with double hashing; about 1% false positives at 10 bits per entry."""
+
+    def __init__(self, bits: int, hashes: int = 7):
+        self.bits = max(8, bits)
+        self.hashes = hashes
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def add(self, digest: bytes):
+        """Add ``digest``; return False if it was (probably) there already."""
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        array = self.array
+        new = False
+        for i in range(self.hashes):
+            bit = (h1 + i * h2) % self.bits
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not array[byte] & mask:
+                array[byte] |= mask
+                new = True
+        return new
+
+
+def _count(digests: float, capacity: int):
+    # partitions of about half the capacity each, as many as can be written at once
+    return min(MAX_PARTITIONS, max(2, math.ceil(2 * digests / capacity)))
+
+
+def _partition(digest: bytes, count: int, level: int = 0):
+    # a partition split again spreads over other bits of the digest
+    if level == 0: return int.from_bytes(digest[:4], 'little') % count
+    return hash((level, digest)) % count
+
+
+def _scatter(entries, seen, count: int, prefix: str, level: int):
+    # seen digests to <prefix><i>.seen, (position, digest, record) entries to <prefix><i>.records;
+    # returns the number of entries of each partition
+    seen_files = [open(f"{prefix}{i}.seen", 'wb') for i in range(count)]
+    for digest in seen: seen_files[_partition(digest, count, level)].write(digest)
+    for file in seen_files: file.close()
+    seen.clear()
+
+    counts = [0] * count
+    record_files = [open(f"{prefix}{i}.records", 'wb') for i in range(count)]
+    try:
+        for position, digest, record in entries:
+            i = _partition(digest, count, level)
+            counts[i] += 1
+            _write_entry(record_files[i], position, digest, record)
+    finally:
+        for file in record_files: file.close()
+    return counts
+
+
+def _write_entry(file, position: int, digest: bytes, record: bytes):
+    file.write(_ENTRY.pack(position, len(record)))
+    file.write(digest)
+    file.write(record)
+
+
+def _read_entries(path, block_size: int):
+    head_size = _ENTRY.size + DIGEST_SIZE
+    with open(path, 'rb', buffering=block_size) as file:
+        while True:
+            head = file.read(head_size)
+            if len(head) < head_size: return
+            position, length = _ENTRY.unpack_from(head)
+            yield position, head[_ENTRY.size:], file.read(length)
@@ -0,0 +1,120 @@
+"""
+Encoding and delimiter detection from a prefix of the input, and incremental transcoding.
+"""
+
+import codecs
+import collections
+import csv
+import io
+
+from .scanner import DEFAULT_BUFFER_SIZE
+
+# bytes read from the start of the input to detect its encoding and delimiter
+SNIFF_SIZE = 64 * 1024
+DELIMITERS = (",", ";", "\t", "|")
+
+# UTF-32 first: its little-endian BOM starts with the UTF-16 one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def detect_encoding(prefix: bytes, complete: bool = False):
+    """
+    Guess the encoding of a file from its first bytes (all of them if ``complete``).
+
+    A BOM decides; otherwise NUL bytes on odd or even positions mean UTF-16,
+    then UTF-8 is tried, then cp1252, and latin-1 accepts anything.
+    """
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom): return encoding
+
+    if b"\x00" in prefix:
+        odd = prefix[1::2].count(0)
+        even = prefix[0::2].count(0)
+        if odd > len(prefix) // 4 and odd > even: return 'utf-16-le'
+        if even > len(prefix) // 4: return 'utf-16-be'
+
+    for encoding in ('utf-8', 'cp1252'):
+        try: codecs.getincrementaldecoder(encoding)().decode(prefix, final=complete)
+        except UnicodeDecodeError: continue
+        return encoding
+    return 'latin-1'
+
+
+def ascii_compatible(encoding: str):
+    """
+    Whether records of ``encoding`` can be scanned as bytes.
+
+    True for UTF-8 and single-byte supersets of ASCII: a line feed, quote or
+    delimiter byte can then never be part of another character.
+    """
+    name = codecs.lookup(encoding).name
+    if name in ('utf-8', 'utf-8-sig'): return True
+    try:
+        if bytes(range(128)).decode(encoding) != ''.join(map(chr, range(128))): return False
+        return len(bytes(range(128, 256)).decode(encoding, 'replace')) == 128
+    except UnicodeDecodeError:
+        return False
+
+
+def sniff_delimiter(text: str, complete: bool = False):
+    """
+    The delimiter of DELIMITERS that splits the records of ``text`` most consistently, ',' by default.
+
+    Unless ``complete``, the last record may be cut and is not looked at.
+    """
+    best, best_score = ",", 0.0
+    for delimiter in DELIMITERS:
+        rows = list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+        if not complete: rows = rows[:-1]
+        counts = [len(row) for row in rows if row]
+        if not counts: continue
+        width, matches = collections.Counter(counts).most_common(1)[0]
+        if width < 2: continue
+        score = matches / len(counts)
+        if score > best_score: best, best_score = delimiter, score
+    return best
+
+
+class TranscodingReader(io.RawIOBase):
+    """
+    Binary stream of the UTF-8 bytes of a ``stream`` in another encoding.
+
+    The input is decoded ``block_size`` bytes at a time with an incremental
+    decoder, so characters cut between blocks are handled and a BOM is
+    dropped by the codecs that expect one.
+    """
+
+    def __init__(self, stream, encoding: str, block_size: int = DEFAULT_BUFFER_SIZE):
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._block_size = block_size
+        self._pending = bytearray()
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def read(self, size: int = -1):
+        while not self._eof and (size is None or size < 0 or len(self._pending) < size):
+            block = self._stream.read(self._block_size)
+            if not block: self._eof = True
+            self._pending += self._decoder.decode(block, final=not block).encode('utf-8')
+        if size is None or size < 0: size = len(self._pending)
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed: self._stream.close()
+        super().close()
@@ -0,0 +1,113 @@
+"""
+Output formats other than CSV, with their serializers.
+"""
+
+import csv
+import json
+import re
+
+_JSON_SPECIAL = re.compile(r'["\\\x00-\x1f]')
+_TSV_SPECIAL = re.compile(r'[\\\n\r]')
+_TSV_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+_TSV_UNESCAPES = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r'}
+
+
+class OutputFormat:
+    """
+    Turns parsed rows into the bytes of another format, and back.
+
+    ``header`` gives the bytes written at the top of a shard, ``serialize``
+    the bytes of one row; ``parse`` reads a serialized row back, for split
+    options that need the fields of a row.
+    """
+
+    extension = ""
+
+    def __init__(self, columns: list, encoding: str = 'utf-8'):
+        self.columns = columns
+        self.encoding = encoding
+
+    def header(self):
+        return self.serialize(self.columns)
+
+    def serialize(self, row: list):
+        raise NotImplementedError
+
+    def parse(self, data: bytes):
+        raise NotImplementedError
+
+    def records(self, records, encoding: str = 'utf-8', delimiter: str = ','):
+        """Serialize CSV ``records`` (bytes in ``encoding``) in the format."""
+        serialize = self.serialize
+        for row in csv.reader((record.decode(encoding) for record in records), delimiter=delimiter):
+            yield serialize(row)
+
+
+class JsonLinesFormat(OutputFormat):
+    """
+    One JSON object per line, keyed by the column names, with string values.
+
+    The ``"name":`` prefix of every key is built once, and a value is only
+    run through the JSON encoder when it holds a quote, a backslash or a
+    control character. Missing fields are null.
+    """
+
+    extension = ".jsonl"
+
+    def __init__(self, columns: list, encoding: str = 'utf-8'):
+        super().__init__(columns, encoding)
+        self._prefixes = [('{' if i == 0 else ',') + json.dumps(name, ensure_ascii=False) + ':'
+                          for i, name in enumerate(columns)]
+
+    def header(self):
+        return b""
+
+    def serialize(self, row: list):
+        prefixes = self._prefixes
+        parts = [
+            prefix + ('"' + value + '"' if _JSON_SPECIAL.search(value) is None else json.dumps(value, ensure_ascii=False))
+            for prefix, value in zip(prefixes, row)
+        ]
+        if len(row) < len(prefixes): parts.extend(prefix + 'null' for prefix in prefixes[len(row):])
+        parts.append('}\n' if prefixes else '{}\n')
+        return ''.join(parts).encode(self.encoding)
+
+    def parse(self, data: bytes):
+        item = json.loads(data)
+        return [item.get(column) or '' for column in self.columns]
+
+
+class TsvFormat(OutputFormat):
+    """
+    Tab-separated values, one row per line.
+
+    Backslashes, tabs and line breaks inside values are written as ``\\\\``,
+    ``\\t``, ``\\n`` and ``\\r``; rows without any of them are joined as is.
+    """
+
+    extension = ".tsv"
+
+    def serialize(self, row: list):
+        line = '\t'.join(row)
+        if line.count('\t') != len(row) - 1 or _TSV_SPECIAL.search(line) is not None:
+            line = '\t'.join(_tsv_escape(value) for value in row)
+        return (line + '\n').encode(self.encoding)
+
+    def parse(self, data: bytes):
+        line = data.decode(self.encoding)
+        if line.endswith('\n'): line = line[:-1]
+        return [_tsv_unescape(value) if '\\' in value else value for value in line.split('\t')]
+
+
+FORMATS = {
+    "jsonl": JsonLinesFormat,
+    "tsv": TsvFormat,
+}
+
+
+def _tsv_escape(value: str):
+    return re.sub(r'[\\\t\n\r]', lambda match: _TSV_ESCAPES[match.group()], value)
+
+
+def _tsv_unescape(value: str):
+    return re.sub(r'\\(.)', lambda match: _TSV_UNESCAPES.get(match.group(1), match.group(1)), value)
@@ -0,0 +1,104 @@
+"""
+Sparse row index of a CSV file.
+"""
+
+import json
+import os
+from typing import Optional
+
+from .scanner import DEFAULT_BUFFER_SIZE, RecordScanner
+
+
+class RowIndex:
+    """
+    Byte offset of every ``step``-th data row of a file.
+
+    ``offsets[i]`` is where data row ``i * step`` starts (rows are counted
+    from 0, after the header). The size and modification time of the file
+    are kept so a stale index can be detected.
+    """
+
+    VERSION = 1
+
+    def __init__(self, size: int, mtime: float, step: int, rows: int, header_size: int, offsets: list):
+        self.size = size
+        self.mtime = mtime
+        self.step = step
+        self.rows = rows
+        self.header_size = header_size
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, input_file: str, step: int = 10000, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        if step <= 0: raise ValueError("index step must be greater than 0")
+        stat = os.stat(input_file)
+
+        with open(input_file, 'rb') as file:
+            records = RecordScanner(file, buffer_size).records()
+            try: header = next(records)
+            except StopIteration: raise ValueError('CSV file is empty')
+
+            offset = len(header)
+            offsets = []
+            rows = 0
+            for record in records:
+                if rows % step == 0: offsets.append(offset)
+                offset += len(record)
+                rows += 1
+
+        return cls(stat.st_size, stat.st_mtime, step, rows, len(header), offsets)
+
+    def matches(self, input_file: str):
+        stat = os.stat(input_file)
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+    def locate(self, row: int):
+        """Return ``(indexed_row, offset)`` of the closest indexed row at or before ``row``."""
+        if row >= self.rows: return self.rows, self.size
+        slot = row // self.step
+        return slot * self.step, self.offsets[slot]
+
+    def to_dict(self):
+        return {
+            'version': self.VERSION,
+            'size': self.size,
+            'mtime': self.mtime,
+            'step': self.step,
+            'rows': self.rows,
+            'header_size': self.header_size,
+            'offsets': self.offsets,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if data.get('version') != cls.VERSION: raise ValueError(f"Unsupported index version: {data.get('version')}")
+        return cls(data['size'], data['mtime'], data['step'], data['rows'], data['header_size'], data['offsets'])
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
+
+
+def row_offset(file, row: int, header_size: int, index: Optional[RowIndex] = None,
+               buffer_size: int = DEFAULT_BUFFER_SIZE):
+    """
+    Return the byte offset where data row ``row`` starts.
+
+    With an index only the rows after the closest indexed row are walked;
+    without one the records are counted from the header on, which is a
+    byte-level scan with no parsing.
+    """
+    indexed_row, offset = index.locate(row) if index is not None else (0, header_size)
+    if indexed_row >= row: return offset
+
+    file.seek(offset)
+    for record in RecordScanner(file, buffer_size).records():
+        offset += len(record)
+        indexed_row += 1
+        if indexed_row >= row: break
+    return offset
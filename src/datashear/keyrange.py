@@ -0,0 +1,100 @@
+"""
+Binary search of key boundaries in inputs sorted by a key column.
+"""
+
+import datetime
+import io
+from typing import Optional
+
+from .scanner import RecordScanner, record_start
+
+# bytes read around each probe of the search; record_start grows the block when needed
+PROBE_SIZE = 64 * 1024
+PERIODS = {
+    'hour': datetime.timedelta(hours=1),
+    'day': datetime.timedelta(days=1),
+    'week': datetime.timedelta(weeks=1),
+}
+
+
+class KeySearch:
+    """
+    Finds where keys start in a binary ``file`` whose records are sorted by ``key`` (a bound SortKey).
+
+    Each probe seeks to a byte offset and resyncs on the next record
+    boundary, so finding a boundary costs O(log(size)) small reads. Below
+    ``buffer_size`` bytes the records are scanned in order.
+    """
+
+    def __init__(self, file, key, header_size: int, field_count: int, buffer_size: int, **dialect):
+        self.file = file
+        self.key = key
+        self.header_size = header_size
+        self.field_count = field_count
+        self.buffer_size = buffer_size
+        self.dialect = dialect
+        self.size = file.seek(0, io.SEEK_END)
+
+    def record_at(self, offset: int):
+        """The record starting at ``offset``."""
+        self.file.seek(offset)
+        return next(RecordScanner(self.file, min(self.buffer_size, PROBE_SIZE)).records())
+
+    def key_at(self, offset: int):
+        return self.key(self.record_at(offset))
+
+    def lower_bound(self, bound: tuple, low: Optional[int] = None):
+        """Offset of the first record at or after ``low`` whose key is not below ``bound``, or the input size."""
+        low = self.header_size if low is None else low
+        high = self.size
+        # the boundary is in [low, high]; both are record starts, or high is the end
+        while high - low > self.buffer_size:
+            start = record_start(self.file, (low + high) // 2, self.field_count, self.header_size,
+                                 min(self.buffer_size, PROBE_SIZE), **self.dialect)
+            if start >= high: break
+            if self.key_at(start) >= bound: high = start
+            else: low = start
+
+        self.file.seek(low)
+        offset = low
+        for record in RecordScanner(self.file, self.buffer_size).records():
+            if offset >= high or self.key(record) >= bound: return min(offset, high)
+            offset += len(record)
+        return min(offset, high)
+
+
+def floor(value, every):
+    """Start of the period of length ``every`` (a timedelta or a number) holding ``value``."""
+    if isinstance(every, datetime.timedelta):
+        if isinstance(value, datetime.datetime): origin = datetime.datetime(1970, 1, 1, tzinfo=value.tzinfo)
+        elif isinstance(value, datetime.date): origin = datetime.date(1970, 1, 1)
+        else: raise ValueError(f"Not a date or date/time: {value!r}")
+        return origin + (value - origin) // every * every
+    return value - value % every
+
+
+class RecordCounter:
+    """Counts the records of consecutive blocks of whole records as line feeds outside quotes, on the raw bytes."""
+
+    def __init__(self, quotechar: bytes = b'"'):
+        self.quotechar = quotechar
+        self.count = 0
+        self._quoted = False
+        self._ended = True
+
+    def update(self, block: bytes):
+        if not block: return
+        if self.quotechar not in block:
+            if not self._quoted: self.count += block.count(b"\n")
+        else:
+            for segment in block.split(self.quotechar):
+                if not self._quoted: self.count += segment.count(b"\n")
+                self._quoted = not self._quoted
+            # the last segment does not end on a quote
+            self._quoted = not self._quoted
+        self._ended = block.endswith(b"\n")
+
+    @property
+    def rows(self):
+        # the last record of the input may have no line feed
+        return self.count + (0 if self._ended else 1)
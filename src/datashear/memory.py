@@ -0,0 +1,61 @@
+"""
+One memory setting shared by the buffers and working sets of every split mode.
+"""
+
+from .scanner import DEFAULT_BUFFER_SIZE
+
+MIN_MEMORY_LIMIT = 4 * 1024 * 1024
+# smallest read block worth a system call
+MIN_BUFFER_SIZE = 64 * 1024
+# held by the shard being written besides its sink: file buffer, gzip state, CSV row buffers
+WRITER_MEMORY = 512 * 1024
+
+
+class MemoryBudget:
+    """
+    Shares ``limit`` bytes between what a split holds in memory.
+
+    - ``buffer_size``: the read block; the scanner holds about two blocks and
+      the piece it hands out, ``read_memory`` in all.
+    - ``sink_memory``: what the sink may hold for shards not written out yet
+      (archive spools, upload parts in flight, see ``Sink.memory_bound``).
+    - ``work_memory``: the working set of the external sort, the dedup and
+      the shuffle; sort and dedup take half each when both run.
+
+    ``bound(mode)`` is the declared peak of a mode above the interpreter:
+    streaming modes leave ``work_memory`` unused, the others use all of
+    ``limit``. Records longer than ``buffer_size`` are held whole by the
+    modes that need whole records (sort, dedup, shuffle, ``stats``,
+    ``validate`` for quoted records, other formats), and by size limits as
+    far as the room left in their shard, on top of the bound.
+    ``sample`` and ``batches`` hold their rows and are not bounded.
+    """
+
+    STREAMING = ("split", "random_split", "key_range", "plan", "execute")
+    WORKING = ("sort", "dedup", "shuffle")
+
+    def __init__(self, limit: int):
+        if limit < MIN_MEMORY_LIMIT: raise ValueError(f"memory limit must be at least {MIN_MEMORY_LIMIT} bytes")
+        self.limit = limit
+        self.buffer_size = min(DEFAULT_BUFFER_SIZE, max(MIN_BUFFER_SIZE, limit // 32))
+        self.read_memory = 4 * self.buffer_size
+        self.sink_memory = limit // 4
+        self.work_memory = limit - self.read_memory - WRITER_MEMORY - self.sink_memory
+
+    def bound(self, mode: str):
+        if mode in self.STREAMING: return self.limit - self.work_memory
+        if mode in self.WORKING: return self.limit
+        raise ValueError(f"Unknown mode: {mode}")
+
+    def to_dict(self):
+        return {
+            'limit': self.limit,
+            'buffer_size': self.buffer_size,
+            'read_memory': self.read_memory,
+            'writer_memory': WRITER_MEMORY,
+            'sink_memory': self.sink_memory,
+            'work_memory': self.work_memory,
+        }
+
+    def __repr__(self):
+        return f"MemoryBudget({self.limit})"
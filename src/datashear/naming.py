@@ -0,0 +1,73 @@
+"""
+Shard names, worked out once per split and fanned out into nested directories.
+"""
+
+import os
+from typing import Optional, Tuple
+
+
+class ShardNamer:
+    """
+    Names the outputs of a split after their index.
+
+    By default a shard is ``[prefix_]<base>[_sufix]_<index><ext>``, ``base``
+    defaulting to the input name and ``ext`` to its extension, as
+    ``Util.get_output_filename`` does; everything but the index is joined
+    once. ``template`` replaces that layout with a ``str.format`` string of
+    the fields ``prefix``, ``base``, ``sufix``, ``index`` and ``ext``, e.g.
+    ``"{base}-{index:06d}{ext}"``; it only names numbered shards, named
+    outputs (subsets, stats, rejects, manifest) keep the default layout.
+
+    With ``fan_out``, numbered shards go in nested directories of at most
+    ``fan_out`` shards or directories each, ``depth`` levels deep, named
+    after the digits of the index in base ``fan_out``: with ``fan_out=1000``
+    and ``depth=2``, shard 1234567 is ``001/234/<name>``. Named outputs
+    (subsets, stats, rejects) stay at the top.
+    """
+
+    def __init__(self, input_name: str, prefix: str = "", base: str = "", sufix: str = "",
+                 template: Optional[str] = None, fan_out: Optional[int] = None, depth: int = 1):
+        if fan_out is not None and fan_out < 2: raise ValueError("fan out must be at least 2")
+        if depth < 1: raise ValueError("fan out depth must be at least 1")
+        stem, self.extension = os.path.splitext(os.path.basename(input_name))
+        self.prefix = prefix
+        self.base = base if base != "" else stem
+        self.sufix = sufix
+        self.template = template
+        self.fan_out = fan_out
+        self.depth = depth
+        self._stem = "_".join(part for part in (prefix, self.base, sufix) if part != "") + "_"
+        if template is not None:
+            # fails now rather than at the first shard
+            template.format(prefix=prefix, base=self.base, sufix=sufix, index=1, ext=self.extension)
+        self._width = len(str(fan_out - 1)) if fan_out is not None else 0
+        # (group, directory) of the last numbered shard: consecutive shards share it; one
+        # tuple, so that threads naming shards at once never pair a group with another's directory
+        self._last: Tuple[Optional[int], str] = (None, "")
+
+    def name(self, index, extension: str = ""):
+        extension = extension or self.extension
+        # named outputs keep the default layout, a template formats numbers
+        numbered = isinstance(index, int)
+        if self.template is None or not numbered: name = f"{self._stem}{index}{extension}"
+        else: name = self.template.format(prefix=self.prefix, base=self.base, sufix=self.sufix, index=index,
+                                          ext=extension)
+        if self.fan_out is None or not numbered: return name
+        return self.directory(index) + name
+
+    def directory(self, index: int):
+        """Directories of the numbered shard ``index``, with a trailing slash."""
+        assert self.fan_out is not None
+        group = index // self.fan_out
+        last, directory = self._last
+        if group != last:
+            digits = []
+            rest = group
+            for _ in range(self.depth - 1):
+                rest, digit = divmod(rest, self.fan_out)
+                digits.append(digit)
+            # the top level takes whatever is left, so any index has a place
+            digits.append(rest)
+            directory = "".join(f"{digit:0{self._width}d}/" for digit in reversed(digits))
+            self._last = (group, directory)
+        return directory
@@ -0,0 +1,257 @@
+"""
+Dry-run split planning.
+
+A plan lists the byte range of every shard a raw split would produce. An
+exact plan can be executed later, in one go or shard by shard across
+several workers, and writes the same shards as ``engine="raw"``.
+"""
+
+import csv
+import heapq
+import io
+import json
+import math
+import os
+import time
+from typing import Optional
+
+from .index import row_offset
+from .policy import SplitPolicy
+from .scanner import RecordScanner, limit_pieces, resync
+
+
+class ShardPlan:
+
+    def __init__(self, index: int, start: int, end: int, rows: int):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.rows = rows
+
+    def __repr__(self):
+        return f"ShardPlan(index={self.index}, start={self.start}, end={self.end}, rows={self.rows})"
+
+    def __eq__(self, other):
+        return isinstance(other, ShardPlan) and vars(self) == vars(other)
+
+
+class SplitPlan:
+    """
+    Shard layout of a split, with a rough duration estimate.
+
+    ``exact`` is false for plans estimated by sampling; their shard ranges
+    and row counts are approximations and they cannot be executed.
+    """
+
+    VERSION = 1
+
+    def __init__(
+            self,
+            input_size: int,
+            input_mtime: float,
+            header_size: int,
+            max_rows: Optional[int],
+            max_size: Optional[int],
+            repeat_header: bool,
+            shards: list,
+            exact: bool,
+            estimated_seconds: float
+    ):
+        self.input_size = input_size
+        self.input_mtime = input_mtime
+        self.header_size = header_size
+        self.max_rows = max_rows
+        self.max_size = max_size
+        self.repeat_header = repeat_header
+        self.shards = shards
+        self.exact = exact
+        self.estimated_seconds = estimated_seconds
+
+    @property
+    def rows(self):
+        return sum(shard.rows for shard in self.shards)
+
+    def shard_size(self, shard: ShardPlan):
+        """Size of the output file of ``shard``, header included."""
+        with_header = self.repeat_header or shard.index == 1
+        return shard.end - shard.start + (self.header_size if with_header else 0)
+
+    @property
+    def output_size(self):
+        return sum(self.shard_size(shard) for shard in self.shards)
+
+    def partition(self, workers: int):
+        """Spread the shard indices over ``workers`` lists of similar byte volume."""
+        if workers <= 0: raise ValueError("workers must be greater than 0")
+        heap: list = [(0, i, []) for i in range(workers)]
+        for shard in sorted(self.shards, key=lambda shard: shard.end - shard.start, reverse=True):
+            load, i, indices = heapq.heappop(heap)
+            indices.append(shard.index)
+            heapq.heappush(heap, (load + shard.end - shard.start, i, indices))
+        return [sorted(indices) for _, _, indices in sorted(heap, key=lambda item: item[1])]
+
+    def to_dict(self):
+        return {
+            'version': self.VERSION,
+            'input_size': self.input_size,
+            'input_mtime': self.input_mtime,
+            'header_size': self.header_size,
+            'max_rows': self.max_rows,
+            'max_size': self.max_size,
+            'repeat_header': self.repeat_header,
+            'exact': self.exact,
+            'estimated_seconds': self.estimated_seconds,
+            'shards': [[shard.index, shard.start, shard.end, shard.rows] for shard in self.shards],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if data.get('version') != cls.VERSION: raise ValueError(f"Unsupported plan version: {data.get('version')}")
+        return cls(
+            data['input_size'],
+            data['input_mtime'],
+            data['header_size'],
+            data['max_rows'],
+            data['max_size'],
+            data['repeat_header'],
+            [ShardPlan(*shard) for shard in data['shards']],
+            data['exact'],
+            data['estimated_seconds'],
+        )
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
+
+
+def read_header(file, buffer_size: int):
+    """Read the header record of ``file`` and return it as bytes."""
+    return split_header(RecordScanner(file, buffer_size).pieces())[0]
+
+
+def split_header(pieces):
+    """Return the header record and the rest of the ``pieces`` iterator."""
+    parts = []
+    for data, end in pieces:
+        parts.append(data)
+        if end: break
+    if not parts: raise ValueError('CSV file is empty')
+    return b"".join(parts), pieces
+
+
+def scan_plan(input_file: str, max_rows, max_size, repeat_header: bool, buffer_size: int,
+              window: Optional[tuple] = None):
+    """Exact plan from one byte-level scan; ``window`` is ``(start, stop, rows)`` as in ``limit_pieces``."""
+    stat = os.stat(input_file)
+    started = time.perf_counter()
+
+    with open(input_file, 'rb') as file:
+        header_size = len(read_header(file, buffer_size))
+        start, stop, rows = window or (header_size, None, None)
+        file.seek(start)
+        pieces = limit_pieces(RecordScanner(file, buffer_size).pieces(), start, stop, rows)
+
+        shards: list = []
+        offset = start
+        for shard, data, end in SplitPolicy(max_rows, max_size).layout(pieces, header_size, repeat_header):
+            if not shards or shards[-1].index != shard.index:
+                if shards: shards[-1].end = offset
+                shards.append(ShardPlan(shard.index, offset, offset, 0))
+            offset += len(data)
+            if end: shards[-1].rows += 1
+        if shards: shards[-1].end = offset
+
+    rate = (offset - start or 1) / max(time.perf_counter() - started, 1e-9)
+    plan = SplitPlan(stat.st_size, stat.st_mtime, header_size, max_rows, max_size, repeat_header, shards, True, 0.0)
+    plan.estimated_seconds = plan.output_size / rate
+    return plan
+
+
+def index_plan(input_file: str, index, max_rows: int, repeat_header: bool, buffer_size: int,
+               first_row: int = 0, last_row: Optional[int] = None):
+    """Exact plan of a split by rows, read from a row index instead of a full scan."""
+    stat = os.stat(input_file)
+    last_row = index.rows if last_row is None else min(last_row, index.rows)
+    first_row = min(first_row, last_row)
+
+    with open(input_file, 'rb') as file:
+        rate = _calibrate(file, index.header_size, buffer_size)
+        # only the rows between the closest indexed row and each shard start are walked
+        starts = [row_offset(file, row, index.header_size, index, buffer_size) for row in range(first_row, last_row, max_rows)]
+        stop = row_offset(file, last_row, index.header_size, index, buffer_size)
+
+    ends = starts[1:] + [stop]
+    shards = [
+        ShardPlan(i, start, end, min(max_rows, last_row - first_row - (i - 1) * max_rows))
+        for i, (start, end) in enumerate(zip(starts, ends), 1)
+    ]
+    plan = SplitPlan(stat.st_size, stat.st_mtime, index.header_size, max_rows, None, repeat_header, shards, True, 0.0)
+    plan.estimated_seconds = plan.output_size / rate
+    return plan
+
+
+def sample_plan(input_file: str, max_rows, max_size, repeat_header: bool, buffer_size: int,
+                window: Optional[tuple] = None, samples: int = 16, delimiter: str = ',', encoding: str = 'utf-8'):
+    """Estimated plan from the average record size of a few blocks spread over the file (or window)."""
+    stat = os.stat(input_file)
+    block_size = min(buffer_size, 256 * 1024)
+
+    with open(input_file, 'rb') as file:
+        header = read_header(file, buffer_size)
+        header_size = len(header)
+        field_count = len(next(csv.reader([header.decode(encoding).lstrip('\ufeff')], delimiter=delimiter)))
+        rate = _calibrate(file, header_size, buffer_size)
+
+        start, stop, row_limit = window or (header_size, None, None)
+        stop = stat.st_size if stop is None else min(stop, stat.st_size)
+        data_size = stop - start
+        sampled_bytes = 0
+        sampled_rows = 0
+        for i in range(samples):
+            offset = start + data_size * i // samples
+            file.seek(offset)
+            block = file.read(block_size)
+            at_eof = offset + len(block) >= stat.st_size
+            first = 0 if i == 0 else resync(block, field_count, at_eof, delimiter=delimiter, encoding=encoding)
+            if first < 0: continue
+            for record in RecordScanner(io.BytesIO(block[first:]), block_size).records():
+                if not record.endswith(b"\n") and not at_eof: break
+                sampled_bytes += len(record)
+                sampled_rows += 1
+
+    record_size = sampled_bytes / sampled_rows if sampled_rows else max(data_size, 1)
+    rows = round(data_size / record_size)
+    if row_limit is not None: rows = min(rows, row_limit)
+
+    rows_per_shard = max_rows or rows or 1
+    if max_size is not None:
+        room = max_size - (header_size if repeat_header else 0)
+        rows_per_shard = min(rows_per_shard, max(1, int(room // record_size)))
+
+    shards = []
+    for i in range(math.ceil(rows / rows_per_shard)):
+        shard_start = start + round(i * rows_per_shard * record_size)
+        shard_end = min(stop, start + round((i + 1) * rows_per_shard * record_size))
+        shards.append(ShardPlan(i + 1, shard_start, shard_end, min(rows_per_shard, rows - i * rows_per_shard)))
+    if shards and row_limit is None: shards[-1].end = stop
+
+    plan = SplitPlan(stat.st_size, stat.st_mtime, header_size, max_rows, max_size, repeat_header, shards, False, 0.0)
+    plan.estimated_seconds = plan.output_size / rate
+    return plan
+
+
+def _calibrate(file, header_size: int, buffer_size: int):
+    # bytes per second of the raw split loop, measured on the start of the file
+    file.seek(header_size)
+    limit = 4 * buffer_size
+    started = time.perf_counter()
+    scanned = 0
+    for _, data, _ in SplitPolicy().layout(RecordScanner(file, buffer_size).pieces(), header_size, True):
+        scanned += len(data)
+        if scanned >= limit: break
+    return max(scanned, 1) / max(time.perf_counter() - started, 1e-9)
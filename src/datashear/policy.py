@@ -0,0 +1,216 @@
+"""
+Split policies: when a shard is closed and the next one started.
+"""
+
+import datetime
+from typing import Callable, Optional
+
+from .scanner import join_pieces
+
+# gzip header and trailer, plus the end-of-stream block
+GZIP_OVERHEAD = 32
+
+
+class Shard:
+    """
+    Manifest entry of one output shard.
+
+    ``size`` counts the uncompressed bytes of the shard, header included;
+    ``compressed_size`` is only set when the shard is compressed.
+    """
+
+    def __init__(self, index: int, size: int = 0):
+        self.index = index
+        self.name = ""
+        self.rows = 0
+        self.size = size
+        self.compressed_size = None
+        # uncompressed bytes not reflected in compressed_size yet
+        self.pending = 0
+        self.key = None
+        self.span_start = None
+        # row or byte limit the shard was cut at, when adaptive
+        self.limit = None
+        # column statistics, when gathered
+        self.stats = None
+
+    def __repr__(self):
+        return f"Shard(index={self.index}, name={self.name!r}, rows={self.rows}, size={self.size})"
+
+    def to_dict(self):
+        data = {'index': self.index, 'name': self.name, 'rows': self.rows, 'size': self.size}
+        if self.compressed_size is not None: data['compressed_size'] = self.compressed_size
+        if self.limit is not None: data['limit'] = self.limit
+        if self.stats is not None: data['stats'] = self.stats
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        shard = cls(data['index'], data['size'])
+        shard.name = data['name']
+        shard.rows = data['rows']
+        shard.compressed_size = data.get('compressed_size')
+        shard.limit = data.get('limit')
+        shard.stats = data.get('stats')
+        return shard
+
+
+class SplitPolicy:
+    """
+    Closes a shard as soon as adding the next record would break any limit.
+
+    ``key`` closes the shard when the key of the record differs from the key
+    of the shard's first record; it is a column name or index, a list of them,
+    or a callable taking the parsed row. ``max_span`` is ``(column, limit)``
+    and closes the shard when a record's value in ``column`` (a number or an
+    ISO date/time) is more than ``limit`` (seconds for dates) past the value
+    of the shard's first record.
+    """
+
+    def __init__(
+            self,
+            max_rows: Optional[int] = None,
+            max_size: Optional[int] = None,
+            max_compressed_size: Optional[int] = None,
+            key=None,
+            max_span: Optional[tuple] = None
+    ):
+        if max_rows is not None and max_rows <= 0: raise ValueError("rows per file must be greater than 0")
+        if max_size is not None and max_size <= 0: raise ValueError("size per file must be greater than 0")
+        if max_compressed_size is not None and max_compressed_size <= 0:
+            raise ValueError("compressed size per file must be greater than 0")
+        if max_span is not None and max_span[1] <= 0: raise ValueError("span per file must be greater than 0")
+
+        self.max_rows = max_rows
+        self.max_size = max_size
+        self.max_compressed_size = max_compressed_size
+        self.key = key
+        self.max_span = max_span
+        self._key: Optional[Callable] = None
+        self._span_column = None
+        self._flush = None
+
+    @property
+    def limited(self):
+        return any(limit is not None for limit in (
+            self.max_rows, self.max_size, self.max_compressed_size, self.key, self.max_span
+        ))
+
+    @property
+    def needs_fields(self):
+        return self.key is not None or self.max_span is not None
+
+    def bind(self, header: list):
+        """Resolve the column names of ``key`` and ``max_span`` against the header row."""
+        if self.key is not None:
+            if callable(self.key):
+                self._key = self.key
+            else:
+                columns = [column_index(header, column) for column in _as_list(self.key)]
+                self._key = lambda row: tuple(row[i] if i < len(row) else None for i in columns)
+        if self.max_span is not None:
+            self._span_column = column_index(header, self.max_span[0])
+        return self
+
+    def layout(self, pieces, header_size: int, repeat_header: bool, parse=None, first: int = 1, flush=None):
+        """
+        Assign the record pieces following the header to shards.
+
+        Yields ``(shard, data, end)``; shard indices start at ``first``. A record
+        larger than every limit gets a shard of its own. With a size limit, a
+        record in several pieces is read ahead until it ends or overflows the
+        room left in the shard, holding at most that room. ``parse`` turns a
+        record into its fields and is only needed for ``key`` and ``max_span``,
+        which also need whole records instead of pieces. ``flush(shard)`` has
+        the writer of a compressed shard emit what deflate holds back, setting
+        its ``compressed_size`` and ``pending``; it is called when only the
+        bytes held back would close the shard on ``max_compressed_size``.
+        """
+        self._flush = flush
+        if self.needs_fields: pieces = ((record, True) for record in join_pieces(pieces))
+
+        shard: Optional[Shard] = None
+        in_record = False
+        pieces = iter(pieces)
+        for data, end in pieces:
+            ahead = ((data, end),)
+            if not in_record:
+                row = parse(data) if self.needs_fields else None
+                size = len(data)
+                if not end and shard is not None and shard.rows: ahead, size = self._measure(data, pieces, shard)
+                if shard is None or self._full(shard, size, row):
+                    index = first if shard is None else shard.index + 1
+                    shard = Shard(index, header_size if repeat_header or index == 1 else 0)
+                    shard.pending = shard.size
+                    if self._key is not None: shard.key = self._key(row)
+                    if self._span_column is not None: shard.span_start = self._span_value(row)
+
+            assert shard is not None
+            for data, end in ahead:
+                yield shard, data, end
+                shard.size += len(data)
+                in_record = not end
+                if end: shard.rows += 1
+
+    def _measure(self, data: bytes, pieces, shard: Shard):
+        # pieces of the record starting with ``data`` and its size, read until it ends or
+        # overflows the room left in ``shard``: enough to tell whether it fits
+        room = self._room(shard)
+        ahead = [(data, False)]
+        size = len(data)
+        while size <= room:
+            piece = next(pieces, None)
+            if piece is None: break
+            ahead.append(piece)
+            size += len(piece[0])
+            if piece[1]: break
+        return ahead, size
+
+    def _room(self, shard: Shard):
+        # bytes the shard still takes under its size limits, -1 without them
+        rooms = []
+        if self.max_size is not None: rooms.append(self.max_size - shard.size)
+        if self.max_compressed_size is not None:
+            if shard.pending and self._flush is not None: self._flush(shard)
+            rooms.append(self.max_compressed_size - (shard.compressed_size or 0) - shard.pending - GZIP_OVERHEAD)
+        return min(rooms, default=-1)
+
+    def _compressed(self, shard: Shard, size: int, limit: int):
+        # deflate never grows data by more than a few bytes, so the pending bytes and
+        # the new record are counted uncompressed; when they are what would close the
+        # shard, deflate is flushed for the size of the bytes held back
+        compressed = (shard.compressed_size or 0) + shard.pending + size + GZIP_OVERHEAD
+        if compressed > limit and shard.pending and self._flush is not None:
+            self._flush(shard)
+            compressed = (shard.compressed_size or 0) + shard.pending + size + GZIP_OVERHEAD
+        return compressed
+
+    def _full(self, shard: Shard, size: int, row):
+        if shard.rows == 0: return False
+        if self.max_rows is not None and shard.rows >= self.max_rows: return True
+        if self.max_size is not None and shard.size + size > self.max_size: return True
+        limit = self.max_compressed_size
+        if limit is not None and self._compressed(shard, size, limit) > limit: return True
+        if self._key is not None and self._key(row) != shard.key: return True
+        if self._span_column is not None and self._span_value(row) - shard.span_start > self.max_span[1]: return True
+        return False
+
+    def _span_value(self, row):
+        value = row[self._span_column]
+        try: return float(value)
+        except ValueError: pass
+        try: return datetime.datetime.fromisoformat(value).timestamp()
+        except ValueError: raise ValueError(f"Not a number or ISO date/time: {value!r}")
+
+
+def column_index(header: list, column):
+    """Index of ``column``, given as a header name or an index."""
+    if isinstance(column, int):
+        if not 0 <= column < len(header): raise ValueError(f"Column index out of range: {column}")
+        return column
+    try: return header.index(column)
+    except ValueError: raise ValueError(f"Unknown column: {column}")
+
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else [value]
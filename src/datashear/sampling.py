@@ -0,0 +1,73 @@
+"""
+Seeded random routing and sampling of records.
+"""
+
+import bisect
+import math
+import random
+
+
+class FractionRouter:
+    """
+    Sends each record to one of several subsets with the given probabilities.
+
+    ``fractions`` maps subset names to fractions (a list gives subsets named
+    1, 2, ...). Fractions may add up to less than 1, the remaining records
+    are then dropped.
+    """
+
+    def __init__(self, fractions, seed=None):
+        if not isinstance(fractions, dict): fractions = {i: fraction for i, fraction in enumerate(fractions, 1)}
+        if not fractions: raise ValueError("at least one fraction must be given")
+        if any(fraction < 0 for fraction in fractions.values()): raise ValueError("fractions must not be negative")
+        total = sum(fractions.values())
+        if total > 1 + 1e-9: raise ValueError("fractions must not add up to more than 1")
+
+        self.names = list(fractions)
+        self.thresholds = []
+        cumulative = 0.0
+        for fraction in fractions.values():
+            cumulative += fraction
+            self.thresholds.append(cumulative)
+        self.dropped = total < 1 - 1e-9
+        self.random = random.Random(seed).random
+
+    def route(self):
+        """Index in ``names`` of the subset of the next record, or None when it is dropped."""
+        slot = bisect.bisect_right(self.thresholds, self.random())
+        return slot if slot < len(self.names) else None
+
+
+def reservoir_sample(records, k: int, seed=None):
+    """
+    Uniform sample of exactly ``k`` records (fewer if there are fewer), in input order.
+
+    Uses Li's algorithm L: only the records that enter the reservoir cost a
+    random draw, and memory is O(k).
+    """
+    if k <= 0: raise ValueError("sample size must be greater than 0")
+    rng = random.Random(seed)
+    draw = lambda: 1.0 - rng.random()  # in (0, 1], safe for log
+    records = iter(records)
+
+    reservoir = []
+    for position, record in enumerate(records):
+        reservoir.append((position, record))
+        if len(reservoir) == k: break
+    if len(reservoir) < k: return [record for _, record in reservoir]
+
+    position = k - 1
+    w = math.exp(math.log(draw()) / k)
+    while True:
+        skip = math.floor(math.log(draw()) / math.log(1 - w)) if 0 < w < 1 else 0
+        record = None
+        for _ in range(skip + 1):
+            record = next(records, None)
+            if record is None: break
+            position += 1
+        if record is None: break
+        reservoir[rng.randrange(k)] = (position, record)
+        w *= math.exp(math.log(draw()) / k)
+
+    reservoir.sort(key=lambda item: item[0])
+    return [record for _, record in reservoir]
@@ -0,0 +1,159 @@
+"""
+Byte-level CSV record scanning.
+
+Records are located by looking for line feeds outside of quoted fields;
+the quote state is tracked by the parity of quote characters seen since
+the start of the record, so escaped quotes (``""``) need no special case.
+"""
+
+import csv
+import io
+from typing import Optional
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+class RecordScanner:
+    """
+    Splits a binary stream into raw CSV records, line terminator included.
+
+    ``pieces`` bounds memory to about twice ``buffer_size``: a record that
+    grows past ``buffer_size`` without ending is handed out in pieces, so a
+    multi-hundred-MB quoted field is never held in memory at once.
+    """
+
+    def __init__(self, stream, buffer_size: int = DEFAULT_BUFFER_SIZE, quotechar: bytes = b'"'):
+        if buffer_size <= 0: raise ValueError("buffer size must be greater than 0")
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.quotechar = quotechar
+
+    def records(self):
+        """Yield each record as a single bytes object."""
+        return join_pieces(self._scan(None))
+
+    def pieces(self):
+        """Yield ``(data, end)`` tuples; ``end`` is true on the last piece of a record."""
+        return self._scan(self.buffer_size)
+
+    def _scan(self, max_pending):
+        read = self.stream.read
+        size = self.buffer_size
+        quote = self.quotechar
+
+        buf = b""
+        start = 0       # start of the pending record in buf
+        scan = 0        # quotes are counted in buf[start:scan]
+        in_quote = False
+
+        while True:
+            nl = buf.find(b"\n", scan)
+
+            if nl == -1:
+                chunk = read(size)
+                in_quote ^= buf.count(quote, scan) & 1
+
+                if not chunk:
+                    if start < len(buf): yield buf[start:], True
+                    return
+
+                if max_pending is not None and len(buf) - start >= max_pending:
+                    yield buf[start:], False
+                    buf = chunk
+                    scan = 0
+                else:
+                    scan = len(buf) - start
+                    buf = buf[start:] + chunk
+                start = 0
+                continue
+
+            in_quote ^= buf.count(quote, scan, nl) & 1
+            scan = nl + 1
+            if in_quote: continue
+
+            yield buf[start:scan], True
+            start = scan
+
+
+def join_pieces(pieces):
+    """Yield whole records from ``(data, end)`` pieces."""
+    parts = []
+    for data, end in pieces:
+        if not end:
+            parts.append(data)
+        elif parts:
+            parts.append(data)
+            yield b"".join(parts)
+            parts = []
+        else:
+            yield data
+
+
+def resync(block: bytes, field_count: int, at_eof: bool = False, confirm: int = 4,
+           delimiter: str = ',', quotechar: str = '"', encoding: str = 'utf-8'):
+    """
+    Return the offset of the first record boundary in ``block``, or -1.
+
+    ``block`` starts at an arbitrary byte, possibly inside a quoted field, so
+    the quote state is unknown. Each line feed is tried in turn and accepted
+    once the ``confirm`` records that follow it (or all the complete records
+    left in the block, if fewer) parse with ``field_count`` fields; a line
+    feed inside a quoted field fails that check.
+    """
+    pos = block.find(b"\n")
+    while pos != -1:
+        if _parses(block, pos + 1, field_count, at_eof, confirm, delimiter, quotechar, encoding):
+            return pos + 1
+        pos = block.find(b"\n", pos + 1)
+    return -1
+
+
+def _parses(block, start, field_count, at_eof, confirm, delimiter, quotechar, encoding):
+    stream = io.BytesIO(block)
+    stream.seek(start)
+    checked = 0
+    for record in RecordScanner(stream, len(block) or 1, quotechar.encode(encoding)).records():
+        if not record.endswith(b"\n") and not at_eof: break
+        try: fields = next(csv.reader([record.decode(encoding)], delimiter=delimiter, quotechar=quotechar, strict=True))
+        except (csv.Error, UnicodeDecodeError, StopIteration): return False
+        if len(fields) != field_count: return False
+        checked += 1
+        if checked >= confirm: return True
+    return checked > 0
+
+
+def record_start(file, offset: int, field_count: int, header_size: int,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, **dialect):
+    """
+    Return the offset of the first record starting at or after ``offset``.
+
+    The file is read from ``offset - 1`` so that a record starting exactly
+    at ``offset`` is kept; the block is grown until a boundary is found.
+    """
+    if offset <= header_size: return header_size
+    size = file.seek(0, io.SEEK_END)
+    if offset >= size: return size
+
+    block_size = buffer_size
+    while True:
+        file.seek(offset - 1)
+        block = file.read(block_size)
+        at_eof = offset - 1 + len(block) >= size
+        pos = resync(block, field_count, at_eof, **dialect)
+        if pos >= 0: return offset - 1 + pos
+        if at_eof: return size
+        block_size *= 2
+
+
+def limit_pieces(pieces, offset: int, stop: Optional[int] = None, rows: Optional[int] = None):
+    """Pass ``pieces`` through until a record starts at or after ``stop``, or ``rows`` records went by."""
+    count = 0
+    in_record = False
+    for data, end in pieces:
+        if not in_record:
+            if stop is not None and offset >= stop: return
+            if rows is not None and count >= rows: return
+        yield data, end
+        offset += len(data)
+        in_record = not end
+        if end: count += 1
@@ -0,0 +1,96 @@
+"""
+External-memory shuffle of records.
+"""
+
+import math
+import os
+import random
+import struct
+import tempfile
+from typing import Optional
+
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+
+_LENGTH = struct.Struct('<I')
+
+
+def terminate(records, terminator: bytes):
+    """Make sure every record ends with a line feed, so records can be reordered."""
+    for record in records:
+        yield record if record.endswith(b"\n") else record + terminator
+
+
+def external_shuffle(records, expected_size: int, seed=None, memory_limit: int = DEFAULT_MEMORY_LIMIT,
+                     temp_dir: Optional[str] = None):
+    """
+    Yield ``records`` in a uniformly random order, using temporary files.
+
+    Records are scattered at random into buckets on disk, each bucket is then
+    shuffled in memory. Buckets aim at a quarter of ``memory_limit`` and a
+    bucket that still ends up too large is scattered again, so the working
+    set stays within the limit whatever the input size. ``expected_size``
+    only sets the first number of buckets: with 0, for a stream of unknown
+    size, the two first buckets are scattered again as needed.
+    """
+    if memory_limit <= 0: raise ValueError("memory limit must be greater than 0")
+    rng = random.Random(seed)
+    target = max(1, memory_limit // 4)
+
+    with tempfile.TemporaryDirectory(prefix="datashear-shuffle-", dir=temp_dir) as directory:
+        yield from _shuffle(records, expected_size, rng, target, directory, "")
+
+
+def _shuffle(records, expected_size, rng, target, directory, prefix):
+    count = max(2, math.ceil(expected_size / target))
+    paths = [os.path.join(directory, f"{prefix}{i}.bucket") for i in range(count)]
+    files = [open(path, 'wb') for path in paths]
+    buffers = [bytearray() for _ in range(count)]
+    sizes = [0] * count
+    buffered = 0
+
+    try:
+        randrange = rng.randrange
+        for record in records:
+            slot = randrange(count)
+            buffers[slot] += _LENGTH.pack(len(record))
+            buffers[slot] += record
+            sizes[slot] += len(record)
+            buffered += len(record)
+            if buffered >= target:
+                for file, buffer in zip(files, buffers):
+                    file.write(buffer)
+                    buffer.clear()
+                buffered = 0
+        for file, buffer in zip(files, buffers):
+            file.write(buffer)
+    finally:
+        for file in files: file.close()
+    del buffers
+
+    # a bucket holding every record would be scattered again for nothing
+    total = sum(sizes)
+    for i, (path, size) in enumerate(zip(paths, sizes)):
+        if size > target and size < total:
+            yield from _shuffle(_read_bucket(path, target), size, rng, target, directory, f"{prefix}{i}-")
+        else:
+            bucket = list(_read_bucket(path, target))
+            rng.shuffle(bucket)
+            yield from bucket
+            del bucket
+        os.remove(path)
+
+
+def _read_bucket(path, block_size: int):
+    with open(path, 'rb') as file:
+        pending = b""
+        while True:
+            block = file.read(block_size)
+            if not block: break
+            data = pending + block
+            pos = 0
+            while pos + 4 <= len(data):
+                length = _LENGTH.unpack_from(data, pos)[0]
+                if pos + 4 + length > len(data): break
+                yield data[pos + 4:pos + 4 + length]
+                pos += 4 + length
+            pending = data[pos:]
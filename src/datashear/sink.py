@@ -0,0 +1,624 @@
+"""
+Output sinks receiving the shards produced by a Splitter.
+
+A sink hands out one binary writable stream per shard; the shard is
+complete once that stream is closed. Splits that know the size of a shard
+beforehand may pass it to ``open`` as a hint.
+"""
+
+import datetime
+import hashlib
+import hmac
+import http.client
+import io
+import os
+import queue
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+from typing import Optional
+
+
+class Sink:
+
+    def open(self, name: str, size: Optional[int] = None):
+        raise NotImplementedError
+
+    @property
+    def memory_bound(self):
+        """Bytes the sink holds at most for shards not written out yet, ``None`` when unbounded or unknown."""
+        return None
+
+    def flush(self):
+        """Publish the shards closed so far; called by the Splitter at the end of a split."""
+        pass
+
+    def discard(self):
+        """Drop the shards closed but not published yet; called when a split fails."""
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FileSink(Sink):
+    """
+    Writes each shard as a file in a local directory.
+
+    A shard opened with its expected ``size`` is preallocated to that size
+    in one extent, where the system supports it, and cut to the bytes
+    actually written when closed, so it does not grow by small appends.
+
+    With ``durable``, a shard is written under a temporary name and renamed
+    to its own name only once its data is on disk, so readers of the
+    directory never see a partial shard. Closed shards are synced
+    ``batch_size`` at a time, renamed, then the directory is synced once for
+    the batch. With ``background`` a worker thread syncs the batches while
+    the next shards are written.
+
+    Shard names may hold subdirectories (see ShardNamer); each one is
+    created with the first shard that goes in it, and only once.
+    """
+
+    def __init__(self, output_dir: str = ".", durable: bool = False, batch_size: int = 16, background: bool = False):
+        if batch_size <= 0: raise ValueError("batch size must be greater than 0")
+        self.output_dir = output_dir
+        self.durable = durable
+        self.batch_size = batch_size
+        self.background = background
+        # (temporary path, final path) of the shards closed but not published yet
+        self._pending: list = []
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._error = None
+        # subdirectories made so far, and those whose entry is not synced yet
+        self._directories = {""}
+        self._created: list = []
+        # create folder if not exists
+        if not os.path.exists(output_dir): os.makedirs(output_dir)
+
+    def open(self, name: str, size: Optional[int] = None):
+        path = os.path.join(self.output_dir, name)
+        directory = os.path.dirname(name)
+        if directory not in self._directories: self._make_directory(directory)
+        if not self.durable: return open(path, 'wb') if size is None else _ShardFile(path, size)
+        # a full batch is published when the next shard starts, so a shard
+        # closed by a failing split is still pending and can be discarded
+        if len(self._pending) >= self.batch_size: self._submit()
+        return _DurableFile(self, path, size)
+
+    @property
+    def memory_bound(self):
+        # shards go straight to their files
+        return 0
+
+    def flush(self):
+        if self._pending: self._submit()
+        if self._queue is not None: self._queue.join()
+        self._raise()
+
+    def discard(self):
+        if self._queue is not None: self._queue.join()
+        with self._lock: batch, self._pending = self._pending, []
+        for temp, _ in batch:
+            try: os.remove(temp)
+            except FileNotFoundError: pass
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._worker is not None:
+                self._queue.put(None)
+                self._worker.join()
+                self._queue = self._worker = None
+
+    def _make_directory(self, directory: str):
+        os.makedirs(os.path.join(self.output_dir, directory), exist_ok=True)
+        self._directories.add(directory)
+        if self.durable:
+            with self._lock: self._created.append(directory)
+
+    def _closed(self, temp: str, path: str):
+        with self._lock: self._pending.append((temp, path))
+
+    def _submit(self):
+        self._raise()
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self.background and self._worker is None:
+                # one batch syncing and one waiting at most, so writers cannot run far ahead
+                self._queue = queue.Queue(maxsize=1)
+                self._worker = threading.Thread(target=self._work, name="datashear-fsync", daemon=True)
+                self._worker.start()
+        if not batch: return
+        if self.background: self._queue.put(batch)
+        else: self._publish(batch)
+
+    def _work(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None: return
+                if self._error is None: self._publish(batch)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _publish(self, batch: list):
+        for temp, _ in batch:
+            fd = os.open(temp, os.O_RDONLY)
+            try: _datasync(fd)
+            finally: os.close(fd)
+        for temp, path in batch:
+            os.replace(temp, path)
+        # the renames are durable once the directories themselves are synced,
+        # and new directories once the directory holding them is
+        directories = {os.path.dirname(path) for _, path in batch}
+        with self._lock: created, self._created = self._created, []
+        for directory in created:
+            while directory:
+                directory = os.path.dirname(directory)
+                directories.add(os.path.join(self.output_dir, directory))
+        for directory in directories: _fsync_directory(directory)
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+
+class _ShardFile(io.BufferedWriter):
+    # preallocated to ``size`` bytes, cut to the bytes written when closed
+
+    def __init__(self, path: str, size: Optional[int] = None):
+        raw = io.FileIO(path, 'wb')
+        super().__init__(raw)
+        self._preallocated = size is not None and _preallocate(raw.fileno(), size)
+
+    def close(self):
+        if self.closed: return
+        try:
+            if self._preallocated: self.truncate(self.tell())
+        finally:
+            super().close()
+
+
+class _DurableFile(_ShardFile):
+
+    def __init__(self, sink: FileSink, path: str, size: Optional[int] = None):
+        directory, name = os.path.split(path)
+        self._sink = sink
+        self._path = path
+        self._temp = os.path.join(directory, f".{name}.part")
+        super().__init__(self._temp, size)
+
+    def close(self):
+        if self.closed: return
+        super().close()
+        self._sink._closed(self._temp, self._path)
+
+
+def _preallocate(fd: int, size: int):
+    # one extent for the whole shard; not every system or file system can
+    if size <= 0 or not hasattr(os, 'posix_fallocate'): return False
+    try: os.posix_fallocate(fd, 0, size)
+    except OSError: return False
+    return True
+
+
+def _fsync_directory(path: str):
+    try: fd = os.open(path, os.O_RDONLY)
+    except OSError: return
+    try: os.fsync(fd)
+    except OSError: pass
+    finally: os.close(fd)
+
+
+def _datasync(fd: int):
+    # the data and the size are needed, not the other metadata
+    if hasattr(os, 'fdatasync'): os.fdatasync(fd)
+    else: os.fsync(fd)
+
+
+class _MemoryFile(io.BytesIO):
+
+    def __init__(self, sink, name):
+        super().__init__()
+        self._sink = sink
+        self._name = name
+
+    def close(self):
+        if not self.closed: self._sink.files[self._name] = self.getvalue()
+        super().close()
+
+
+class MemorySink(Sink):
+    """Keeps each shard as bytes in ``files``, keyed by shard name."""
+
+    def __init__(self):
+        self.files = {}
+
+    def open(self, name: str, size: Optional[int] = None):
+        return _MemoryFile(self, name)
+
+    @property
+    def memory_bound(self):
+        # the shards themselves stay in memory
+        return None
+
+
+class _ArchiveMember(io.RawIOBase):
+
+    def __init__(self, sink, name):
+        self._sink = sink
+        self._name = name
+        self._buffer = tempfile.SpooledTemporaryFile(max_size=sink.spool_size)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self._buffer.write(data)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._buffer.seek(0)
+                self._sink._add(self._name, self._buffer)
+            finally:
+                self._buffer.close()
+        super().close()
+
+
+class ArchiveSink(Sink):
+    """
+    Writes every shard as a member of a single zip or tar archive.
+
+    The format is taken from the extension of ``path`` (``.zip``, ``.tar``,
+    ``.tar.gz``/``.tgz``, ``.tar.bz2``, ``.tar.xz``) unless ``format`` is given.
+    Members are spooled to a temporary file, spilling to disk past
+    ``spool_size``, and added to the archive whole when closed: a tar member
+    must know its size beforehand, and a zip archive takes a single member
+    at a time. Members are added under a lock, so shards may be written
+    from several threads or kept open together.
+    """
+
+    TAR_MODES = {
+        '.tar': 'w',
+        '.tar.gz': 'w:gz',
+        '.tgz': 'w:gz',
+        '.tar.bz2': 'w:bz2',
+        '.tar.xz': 'w:xz',
+    }
+
+    def __init__(self, path: str, format: str = "", spool_size: int = 16 * 1024 * 1024):
+        self.path = path
+        self.spool_size = spool_size
+
+        if format == "":
+            lower = path.lower()
+            format = next((ext for ext in ('.zip', *self.TAR_MODES) if lower.endswith(ext)), '')
+        format = format if format.startswith('.') else '.' + format
+
+        if format == '.zip':
+            self._archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+        elif format in self.TAR_MODES:
+            self._archive = tarfile.open(path, self.TAR_MODES[format])  # type: ignore[call-overload]
+        else:
+            raise ValueError(f"Unsupported archive format: {path}")
+        self.format = format
+        self._lock = threading.Lock()
+
+    def open(self, name: str, size: Optional[int] = None):
+        return _ArchiveMember(self, name)
+
+    @property
+    def memory_bound(self):
+        # members are spooled in memory up to spool_size
+        return self.spool_size
+
+    def close(self):
+        with self._lock: self._archive.close()
+
+    def _add(self, name, data):
+        with self._lock:
+            if self.format == '.zip':
+                with self._archive.open(name, 'w', force_zip64=True) as member: shutil.copyfileobj(data, member)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = data.seek(0, os.SEEK_END)
+                info.mtime = int(time.time())
+                data.seek(0)
+                self._archive.addfile(info, data)
+
+
+class ObjectStoreError(IOError):
+    pass
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP connections to a single host, shared between threads."""
+
+    def __init__(self, scheme, host, port, size, timeout):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=b"", headers=None):
+        try: conn = self._idle.get_nowait()
+        except queue.Empty: conn = self._connect()
+
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            data = response.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            try: self._idle.put_nowait(conn)
+            except queue.Full: conn.close()
+
+        return response.status, response.headers, data
+
+    def close(self):
+        while True:
+            try: self._idle.get_nowait().close()
+            except queue.Empty: break
+
+
+class _MultipartUpload(io.RawIOBase):
+
+    def __init__(self, sink, key):
+        self._sink = sink
+        self._key = key
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._error = None
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._sink.part_size:
+            self._submit(bytes(self._buffer[:self._sink.part_size]))
+            del self._buffer[:self._sink.part_size]
+        return len(data)
+
+    def _submit(self, data):
+        sink = self._sink
+        if self._upload_id is None: self._upload_id = sink._create_upload(self._key)
+        if self._error is not None: raise self._error
+
+        number = len(self._parts) + 1
+        # bounds the number of parts held in memory by in-flight uploads
+        sink._slots.acquire()
+        try:
+            future = sink._executor.submit(sink._upload_part, self._key, self._upload_id, number, data)
+        except Exception:
+            sink._slots.release()
+            raise
+        future.add_done_callback(self._on_part_done)
+        self._parts.append(future)
+
+    def _on_part_done(self, future):
+        self._sink._slots.release()
+        if future.exception() is not None and self._error is None:
+            self._error = future.exception()
+
+    def close(self):
+        if self.closed: return
+        sink = self._sink
+        try:
+            # small object, held for a single request when the split is published
+            if self._upload_id is None and sink._hold(self._key, bytes(self._buffer)): return
+            try:
+                # a part that failed earlier makes the last submit raise, the upload is aborted all the same
+                if self._buffer or not self._parts: self._submit(bytes(self._buffer))
+                etags = [part.result() for part in self._parts]
+            except Exception:
+                if self._upload_id is not None: sink._abort_upload(self._key, self._upload_id)
+                raise
+            sink._uploaded(self._key, self._upload_id, etags)
+        finally:
+            self._buffer = bytearray()
+            super().close()
+
+
+class ObjectStoreSink(Sink):
+    """
+    Streams each shard to an S3-compatible object store.
+
+    Shards are sent as multipart uploads of ``part_size`` bytes, with up to
+    ``max_workers`` parts uploaded concurrently over a pool of keep-alive
+    connections. Shards smaller than one part are held in memory, up to one
+    part in all, and sent with a single PUT; larger ones go as one-part
+    uploads.
+
+    Uploads are completed, and held shards sent, only when the split is
+    published by ``flush``, so objects appear in the bucket once the whole
+    split succeeded; ``discard`` aborts them instead. Requests are signed
+    with AWS Signature Version 4 when credentials are given, and sent
+    unsigned otherwise.
+    """
+
+    def __init__(
+            self,
+            endpoint: str,
+            bucket: str,
+            prefix: str = "",
+            access_key: str = "",
+            secret_key: str = "",
+            region: str = "us-east-1",
+            part_size: int = 8 * 1024 * 1024,
+            max_workers: int = 4,
+            timeout: float = 60.0
+    ):
+        if part_size <= 0: raise ValueError("part size must be greater than 0")
+        if max_workers <= 0: raise ValueError("max workers must be greater than 0")
+
+        url = urlsplit(endpoint)
+        if url.scheme not in ('http', 'https'): raise ValueError(f"Unsupported endpoint: {endpoint}")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.part_size = part_size
+        self.max_workers = max_workers
+
+        self._host = url.netloc
+        self._base_path = url.path.rstrip('/')
+        self._pool = _ConnectionPool(url.scheme, url.hostname, url.port, max_workers, timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers * 2)
+        self._lock = threading.Lock()
+        # (key, data) of the small shards and (key, upload id, etags) of the uploads not completed yet
+        self._held: list = []
+        self._held_size = 0
+        self._pending: list = []
+
+    def open(self, name: str, size: Optional[int] = None):
+        return _MultipartUpload(self, self.prefix + name)
+
+    @property
+    def memory_bound(self):
+        # the part being filled, the parts waiting for an upload slot and the small shards held
+        return self.part_size * (2 * self.max_workers + 2)
+
+    def flush(self):
+        with self._lock:
+            held, self._held, self._held_size = self._held, [], 0
+            pending, self._pending = self._pending, []
+        puts = [self._executor.submit(self._put_object, key, data) for key, data in held]
+        completions = [self._executor.submit(self._complete_upload, *upload) for upload in pending]
+        # every request is waited for before the first error is raised, uploads left open are aborted
+        errors = [request.exception() for request in puts + completions]
+        for (key, upload_id, _), request in zip(pending, completions):
+            if request.exception() is not None: self._abort_upload(key, upload_id)
+        error = next((error for error in errors if error is not None), None)
+        if error is not None: raise error
+
+    def discard(self):
+        with self._lock:
+            self._held, self._held_size = [], 0
+            pending, self._pending = self._pending, []
+        for key, upload_id, _ in pending: self._abort_upload(key, upload_id)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+            self._pool.close()
+
+    def _hold(self, key, data):
+        with self._lock:
+            if self._held_size + len(data) > self.part_size: return False
+            self._held.append((key, data))
+            self._held_size += len(data)
+            return True
+
+    def _uploaded(self, key, upload_id, etags):
+        with self._lock: self._pending.append((key, upload_id, etags))
+
+    def _request(self, method, key, query=None, body=b"", expected=200):
+        path = f"{self._base_path}/{quote(self.bucket)}/{quote(key, safe='/~')}"
+        query_string = '&'.join(
+            f"{quote(k, safe='~')}={quote(str(v), safe='~')}" for k, v in sorted((query or {}).items())
+        )
+        headers = {'Host': self._host, 'Content-Length': str(len(body))}
+        if self.access_key: headers.update(self._sign(method, path, query_string, body))
+
+        status, response_headers, data = self._pool.request(
+            method, path + ('?' + query_string if query_string else ''), body, headers
+        )
+        if status != expected:
+            raise ObjectStoreError(f"{method} {key} failed with status {status}: {data[:200]!r}")
+        return response_headers, data
+
+    def _sign(self, method, path, query_string, body):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        scope_date = now.strftime('%Y%m%d')
+        payload_hash = hashlib.sha256(body).hexdigest()
+
+        signed = {'host': self._host, 'x-amz-content-sha256': payload_hash, 'x-amz-date': amz_date}
+        signed_names = ';'.join(sorted(signed))
+        canonical = '\n'.join([
+            method,
+            path,
+            query_string,
+            ''.join(f"{k}:{signed[k]}\n" for k in sorted(signed)),
+            signed_names,
+            payload_hash,
+        ])
+
+        scope = f"{scope_date}/{self.region}/s3/aws4_request"
+        to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        ])
+
+        key = ('AWS4' + self.secret_key).encode('utf-8')
+        for part in (scope_date, self.region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+        signature = hmac.new(key, to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+        return {
+            'x-amz-content-sha256': payload_hash,
+            'x-amz-date': amz_date,
+            'Authorization': (
+                f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                f"SignedHeaders={signed_names}, Signature={signature}"
+            ),
+        }
+
+    def _put_object(self, key, data):
+        self._request('PUT', key, body=data)
+
+    def _create_upload(self, key):
+        _, data = self._request('POST', key, {'uploads': ''})
+        upload_id = next((el.text for el in ElementTree.fromstring(data).iter() if el.tag.endswith('UploadId')), None)
+        if not upload_id: raise ObjectStoreError(f"No upload id returned for {key}")
+        return upload_id
+
+    def _upload_part(self, key, upload_id, number, data):
+        headers, _ = self._request('PUT', key, {'partNumber': number, 'uploadId': upload_id}, data)
+        return headers.get('ETag', '')
+
+    def _complete_upload(self, key, upload_id, etags):
+        body = '<CompleteMultipartUpload>' + ''.join(
+            f"<Part><PartNumber>{i}</PartNumber><ETag>{etag}</ETag></Part>" for i, etag in enumerate(etags, 1)
+        ) + '</CompleteMultipartUpload>'
+        self._request('POST', key, {'uploadId': upload_id}, body.encode('utf-8'))
+
+    def _abort_upload(self, key, upload_id):
+        try: self._request('DELETE', key, {'uploadId': upload_id}, expected=204)
+        except Exception: pass
@@ -0,0 +1,160 @@
+"""
+External merge sort of records by key columns.
+"""
+
+import csv
+import heapq
+import os
+import pickle
+import struct
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .policy import column_index
+
+_LENGTH = struct.Struct('<I')
+
+# most runs merged at once; more runs are merged in several passes
+MAX_FAN_IN = 64
+# rough bytes a record takes in a run besides its data: the bytes object, its list slot and its sort key
+RECORD_COST = 160
+
+
+class SortKey:
+    """
+    Typed sort key over CSV columns.
+
+    ``spec`` is a column (name or index), a ``(column, type)`` pair, or a list
+    of those. ``type`` converts the field text, e.g. ``int``, ``float`` or
+    ``datetime.date.fromisoformat``; columns without a type compare as text.
+    Empty fields sort first.
+    """
+
+    def __init__(self, spec, encoding: str = 'utf-8', delimiter: str = ',', quotechar: str = '"'):
+        if isinstance(spec, tuple) and len(spec) == 2 and callable(spec[1]): spec = [spec]
+        elif not isinstance(spec, (list, tuple)): spec = [spec]
+        self.columns = [item if isinstance(item, tuple) else (item, None) for item in spec]
+        if not self.columns: raise ValueError("sort key needs at least one column")
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self._fields: list = []
+
+    def bind(self, header: list):
+        self._fields = [(column_index(header, column), kind) for column, kind in self.columns]
+        return self
+
+    def __call__(self, record: bytes):
+        row = next(csv.reader([record.decode(self.encoding)], delimiter=self.delimiter, quotechar=self.quotechar), [])
+        key: list = []
+        for i, kind in self._fields:
+            value = row[i] if i < len(row) else ''
+            if value == '':
+                key.append((0,))
+                continue
+            if kind is not None:
+                try: value = kind(value)
+                except (TypeError, ValueError): raise ValueError(f"Cannot convert {value!r} with {kind.__name__}")
+            key.append((1, value))
+        return tuple(key)
+
+
+def external_sort(records, key: SortKey, memory_limit: int, temp_dir: Optional[str] = None, workers: int = 1):
+    """
+    Yield ``records`` sorted by ``key``; equal keys keep their input order.
+
+    Records are cut into runs that fit the memory budget, each run is sorted
+    and spilled to a temporary file (by ``workers`` processes when more than
+    one), then runs are merged with a heap, in several passes if there are
+    more than MAX_FAN_IN of them.
+    """
+    if memory_limit <= 0: raise ValueError("memory limit must be greater than 0")
+    if workers <= 0: raise ValueError("workers must be greater than 0")
+    if workers > 1 and not _picklable(key): workers = 1
+
+    # runs being sorted, the run being filled and the merge buffers share the budget
+    run_size = max(1, memory_limit // (2 * (workers + 1)))
+
+    with tempfile.TemporaryDirectory(prefix="datashear-sort-", dir=temp_dir) as directory:
+        runs = _make_runs(records, key, run_size, directory, workers)
+
+        generation = 0
+        while len(runs) > MAX_FAN_IN:
+            merged = []
+            for i in range(0, len(runs), MAX_FAN_IN):
+                group = runs[i:i + MAX_FAN_IN]
+                path = os.path.join(directory, f"merge-{generation}-{i}.run")
+                _write_run(path, _merge(group, key, memory_limit))
+                for run in group: os.remove(run)
+                merged.append(path)
+            runs = merged
+            generation += 1
+
+        yield from _merge(runs, key, memory_limit)
+
+
+def _make_runs(records, key, run_size, directory, workers):
+    paths = []
+    batch = []
+    batch_size = 0
+
+    if workers == 1:
+        for record in records:
+            batch.append(record)
+            batch_size += len(record) + RECORD_COST
+            if batch_size >= run_size:
+                paths.append(_sort_run(batch, key, os.path.join(directory, f"run-{len(paths)}.run")))
+                batch = []
+                batch_size = 0
+        if batch: paths.append(_sort_run(batch, key, os.path.join(directory, f"run-{len(paths)}.run")))
+        return paths
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for record in records:
+            batch.append(record)
+            batch_size += len(record) + RECORD_COST
+            if batch_size >= run_size:
+                # at most one batch per worker in flight, so memory stays bounded
+                if len(pending) >= workers: pending.pop(0).result()
+                path = os.path.join(directory, f"run-{len(paths)}.run")
+                pending.append(executor.submit(_sort_run, batch, key, path))
+                paths.append(path)
+                batch = []
+                batch_size = 0
+        if batch: paths.append(_sort_run(batch, key, os.path.join(directory, f"run-{len(paths)}.run")))
+        for future in pending: future.result()
+    return paths
+
+
+def _sort_run(batch, key, path):
+    batch.sort(key=key)
+    _write_run(path, batch)
+    return path
+
+
+def _write_run(path, records):
+    with open(path, 'wb') as file:
+        for record in records:
+            file.write(_LENGTH.pack(len(record)))
+            file.write(record)
+
+
+def _read_run(path, block_size):
+    with open(path, 'rb', buffering=block_size) as file:
+        while True:
+            head = file.read(4)
+            if len(head) < 4: return
+            yield file.read(_LENGTH.unpack(head)[0])
+
+
+def _merge(paths, key, memory_limit):
+    block_size = max(4096, memory_limit // (2 * max(1, len(paths))))
+    return heapq.merge(*(_read_run(path, block_size) for path in paths), key=key)
+
+
+def _picklable(value):
+    try: pickle.dumps(value)
+    except Exception: return False
+    return True
@@ -0,0 +1,226 @@
+"""
+Split inputs: file objects (pipes, stdin, sockets or in-memory buffers),
+and input files read with page cache advice.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from .scanner import DEFAULT_BUFFER_SIZE
+
+# pages already read are dropped from the cache every DROP_SIZE bytes
+DROP_SIZE = 8 * 1024 * 1024
+
+
+class StreamSource:
+    """
+    Input read from a file object instead of a path.
+
+    Text streams are read through their binary buffer when they have one,
+    and encoded to UTF-8 otherwise. A seekable stream is read again from
+    where it stood when given; a pipe can only be read once, so the prefix
+    peeked for sniffing is kept and replayed in front of the rest. Modes
+    that need a file call ``spool`` to copy the stream to a temporary file.
+    """
+
+    def __init__(self, stream, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        # set when the bytes are known to be UTF-8
+        self.encoding = None
+        if isinstance(stream, io.TextIOBase) or isinstance(stream.read(0), str):
+            buffer = getattr(stream, 'buffer', None)
+            if buffer is None:
+                stream = _TextEncoder(stream, buffer_size)
+                self.encoding = 'utf-8'
+            else:
+                stream = buffer
+        self.stream = stream
+        self.buffer_size = buffer_size
+        name = getattr(stream, 'name', None)
+        # shards of stdin or of an anonymous stream are named after "stream.csv"
+        self.name = name if isinstance(name, str) and not name.startswith('<') else "stream.csv"
+        try: self.seekable = stream.seekable()
+        except (AttributeError, OSError): self.seekable = False
+        self.start = stream.tell() if self.seekable else 0
+        self._prefix = b""
+        self._consumed = False
+
+    @property
+    def size(self):
+        """Bytes of the input, or None for a pipe."""
+        if not self.seekable: return None
+        # the stream may be in the middle of being read
+        position = self.stream.tell()
+        try: return self.stream.seek(0, io.SEEK_END) - self.start
+        finally: self.stream.seek(position)
+
+    def peek(self, size: int):
+        """The first ``size`` bytes, without consuming them."""
+        if self.seekable:
+            self.stream.seek(self.start)
+            return _read_fully(self.stream, size)
+        if self._consumed: raise ValueError("The input stream was already read")
+        if len(self._prefix) < size: self._prefix += _read_fully(self.stream, size - len(self._prefix))
+        return self._prefix[:size]
+
+    def open(self):
+        """Binary stream of the input from its start; closing it leaves the file object open."""
+        if self.seekable: return _Window(self.stream, self.start)
+        if self._consumed: raise ValueError("The input stream can only be read once; pass a seekable file object")
+        self._consumed = True
+        return _Replay(self._prefix, self.stream)
+
+    def spool(self, temp_dir: Optional[str] = None):
+        """Copy the input to a temporary file, in blocks, and return its path."""
+        with self.open() as source, tempfile.NamedTemporaryFile(
+                'wb', prefix="datashear-input-", suffix=os.path.splitext(self.name)[1], dir=temp_dir,
+                delete=False) as file:
+            shutil.copyfileobj(source, file, self.buffer_size)
+        return file.name
+
+
+class AdvisedReader(io.RawIOBase):
+    """
+    Input file read with ``posix_fadvise`` hints, so a split does not evict the rest of the page cache.
+
+    The file is advised as read sequentially, for a larger readahead, and
+    the pages behind the read position are dropped with DONTNEED every
+    ``drop_size`` bytes and on close. Seeking is allowed; pages skipped over
+    are left alone. Without ``posix_fadvise`` this is a plain file.
+    """
+
+    def __init__(self, path: str, drop_size: int = DROP_SIZE):
+        self._file = io.FileIO(path, 'rb')
+        self._drop_size = drop_size
+        self._dropped = 0
+        _advise(self._file.fileno(), 0, 0, 'POSIX_FADV_SEQUENTIAL')
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self._file.readinto(buffer)
+        position = self._file.tell()
+        if position - self._dropped >= self._drop_size: self._drop(position)
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        self._drop(self._file.tell())
+        position = self._file.seek(offset, whence)
+        self._dropped = position
+        return position
+
+    def tell(self):
+        return self._file.tell()
+
+    def close(self):
+        if self.closed: return
+        try: self._drop(self._file.tell())
+        finally:
+            self._file.close()
+            super().close()
+
+    def _drop(self, position: int):
+        if position > self._dropped:
+            _advise(self._file.fileno(), self._dropped, position - self._dropped, 'POSIX_FADV_DONTNEED')
+        self._dropped = position
+
+
+class _Window(io.RawIOBase):
+    # a seekable stream seen from ``start`` on, left open when closed
+
+    def __init__(self, stream, start: int):
+        self._stream = stream
+        self._start = start
+        stream.seek(start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size: int = -1):
+        return self._stream.read(size)
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        if whence == io.SEEK_SET: offset += self._start
+        return self._stream.seek(offset, whence) - self._start
+
+    def tell(self):
+        return self._stream.tell() - self._start
+
+
+class _Replay(io.RawIOBase):
+    # the peeked prefix, then the rest of a pipe, left open when closed
+
+    def __init__(self, prefix: bytes, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def read(self, size: int = -1):
+        if not self._prefix: return self._stream.read(size)
+        if size is None or size < 0: data, self._prefix = self._prefix + self._stream.read(), b""
+        else: data, self._prefix = self._prefix[:size], self._prefix[size:]
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _TextEncoder(io.RawIOBase):
+    # UTF-8 bytes of a text stream without a binary buffer, such as StringIO
+
+    def __init__(self, stream, block_size: int):
+        self._stream = stream
+        self._block_size = block_size
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def read(self, size: int = -1):
+        while size is None or size < 0 or len(self._pending) < size:
+            text = self._stream.read(self._block_size)
+            if not text: break
+            self._pending += text.encode('utf-8')
+        if size is None or size < 0: size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _advise(fd: int, offset: int, length: int, advice: str):
+    if not hasattr(os, 'posix_fadvise'): return
+    try: os.posix_fadvise(fd, offset, length, getattr(os, advice))
+    except OSError: pass
+
+
+def _read_fully(stream, size: int):
+    # pipes may return fewer bytes than asked before the end
+    parts = []
+    while size > 0:
+        data = stream.read(size)
+        if not data: break
+        parts.append(data)
+        size -= len(data)
+    return b"".join(parts)
@@ -0,0 +1,200 @@
+"""
+Per-shard column statistics (zone maps) for shard pruning.
+"""
+
+import csv
+import datetime
+import io
+import json
+import threading
+from typing import Callable, Dict
+
+from .scanner import DEFAULT_BUFFER_SIZE
+
+# a column starts with the narrowest type its first value fits and widens when a value does not fit
+_CONVERT: Dict[str, Callable] = {
+    'int': int,
+    'float': float,
+    'date': datetime.date.fromisoformat,
+    'datetime': datetime.datetime.fromisoformat,
+    'string': str,
+}
+_WIDER = {'int': 'float', 'float': 'string', 'date': 'datetime', 'datetime': 'string'}
+# the csv field size limit is shared by the whole process
+_FIELD_LIMIT_LOCK = threading.Lock()
+
+
+class ColumnStats:
+    """
+    Type, minimum, maximum and null count of one column.
+
+    Empty fields are nulls. The type is ``int``, ``float``, ``date``,
+    ``datetime`` or ``string``; ``min`` and ``max`` are typed accordingly.
+    """
+
+    def __init__(self):
+        self.kind = None
+        self.min = None
+        self.max = None
+        self.nulls = 0
+        self._text_min = None
+        self._text_max = None
+
+    def update(self, values):
+        """Account for a batch of field values."""
+        present = [value for value in values if value != '']
+        self.nulls += len(values) - len(present)
+        if not present: return
+
+        low, high = min(present), max(present)
+        if self._text_min is None or low < self._text_min: self._text_min = low
+        if self._text_max is None or high > self._text_max: self._text_max = high
+
+        kind = self.kind or _infer(present[0])
+        while kind != 'string':
+            try:
+                typed = list(map(_CONVERT[kind], present))
+                low, high = min(typed), max(typed)
+                if self.min is not None:
+                    previous = (_widen(self.min, kind), _widen(self.max, kind))
+                    low, high = min(low, previous[0]), max(high, previous[1])
+                break
+            except (TypeError, ValueError):
+                kind = _WIDER[kind]
+        if kind == 'string': low, high = self._text_min, self._text_max
+
+        self.kind, self.min, self.max = kind, low, high
+
+    def to_dict(self):
+        return {'type': self.kind, 'nulls': self.nulls, 'min': _jsonable(self.min), 'max': _jsonable(self.max)}
+
+
+class ShardStats:
+    """
+    Column statistics of one shard, gathered in batches of ``batch_size`` records or ``buffer_size`` bytes.
+
+    Records are buffered and parsed a batch at a time, then every column of
+    the batch is checked with one conversion and one min/max pass. Records
+    are CSV unless ``parse`` is given to read one record into its fields.
+    """
+
+    def __init__(self, header: list, batch_size: int = 1024, encoding: str = 'utf-8', delimiter: str = ',',
+                 parse=None, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.header = header
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.parse = parse
+        self.rows = 0
+        self.columns = [ColumnStats() for _ in header]
+        self._batch: list = []
+        self._buffered = 0
+
+    def add(self, record: bytes):
+        self._batch.append(record)
+        self._buffered += len(record)
+        if len(self._batch) >= self.batch_size or self._buffered >= self.buffer_size: self.flush()
+
+    def flush(self):
+        if not self._batch: return
+        if self.parse is not None:
+            rows = [self.parse(record) for record in self._batch]
+        else:
+            text = b"".join(self._batch).decode(self.encoding)
+            rows = _read_rows(text, self.delimiter)
+        self._batch = []
+        self._buffered = 0
+        self.rows += len(rows)
+
+        width = len(self.columns)
+        if any(len(row) != width for row in rows): rows = [(row + [''] * width)[:width] for row in rows]
+        for column, values in zip(self.columns, zip(*rows)):
+            column.update(values)
+
+    def to_dict(self):
+        self.flush()
+        return {name: column.to_dict() for name, column in zip(self.header, self.columns)}
+
+
+def _read_rows(text: str, delimiter: str):
+    try:
+        return list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+    except csv.Error:
+        if len(text) <= csv.field_size_limit(): raise
+    # a field over the csv limit (128 KB by default): the batch is in memory already, so a
+    # limit of its size holds nothing more; the limit is only ever raised, other threads parse too
+    with _FIELD_LIMIT_LOCK:
+        if csv.field_size_limit() < len(text): csv.field_size_limit(len(text))
+    return list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+
+
+class ZoneMap:
+    """
+    Column statistics of every shard of a split, saved next to the shards.
+
+    ``select`` gives the shards that may hold values of a column in a range,
+    so readers can skip the others.
+    """
+
+    VERSION = 1
+
+    def __init__(self, columns: list, shards: list):
+        self.columns = columns
+        # {'name': ..., 'rows': ..., 'columns': {column: {'type', 'nulls', 'min', 'max'}}}
+        self.shards = shards
+
+    def select(self, column, low=None, high=None):
+        """Names of the shards whose values of ``column`` may fall in ``[low, high]``."""
+        if isinstance(column, int): column = self.columns[column]
+        if column not in self.columns: raise ValueError(f"Unknown column: {column}")
+        low, high = _jsonable(low), _jsonable(high)
+
+        names = []
+        for shard in self.shards:
+            stats = shard['columns'][column]
+            if stats['min'] is None: continue
+            try:
+                if low is not None and stats['max'] < low: continue
+                if high is not None and stats['min'] > high: continue
+            except TypeError:
+                pass  # not comparable, the shard cannot be ruled out
+            names.append(shard['name'])
+        return names
+
+    def to_dict(self):
+        return {'version': self.VERSION, 'columns': self.columns, 'shards': self.shards}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if data.get('version') != cls.VERSION: raise ValueError(f"Unsupported zone map version: {data.get('version')}")
+        return cls(data['columns'], data['shards'])
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
+
+
+def _infer(value: str):
+    for kind in ('int', 'float', 'date', 'datetime'):
+        try: _CONVERT[kind](value)
+        except ValueError: continue
+        return kind
+    return 'string'
+
+
+def _widen(value, kind: str):
+    if kind == 'float' and isinstance(value, int): return float(value)
+    if kind == 'datetime' and not isinstance(value, datetime.datetime):
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+
+def _jsonable(value):
+    if isinstance(value, (datetime.date, datetime.datetime)): return value.isoformat()
+    return value
@@ -21,7 +21,8 @@ class Util:
       extension: str = ""
     ):
         filename = os.path.splitext(os.path.basename(input_filename))[0]
-        extension = os.path.splitext(input_filename)[1]
+        # same extension as the input unless another one is given
+        if extension == "": extension = os.path.splitext(input_filename)[1]
 
         parts = []
         if prefix != "": parts.append(prefix)
@@ -32,6 +33,17 @@ class Util:
 
         return "_".join(parts) + extension
 
+    @staticmethod
+    def line_terminator(record: bytes):
+        return b"\r\n" if record.endswith(b"\r\n") else b"\n"
+
+    @staticmethod
+    def serialize_row(row, writer_buffer, writer, encoding: str = 'utf-8'):
+        writer_buffer.seek(0)
+        writer_buffer.truncate(0)
+        writer.writerow(row)
+        return writer_buffer.getvalue().encode(encoding)
+
     @staticmethod
     def get_row_size(row, writer_buffer=None, writer=None):
         if writer_buffer is None:
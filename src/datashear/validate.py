@@ -0,0 +1,262 @@
+"""
+In-stream validation of records against the header, with a reject file.
+"""
+
+import csv
+import io
+import tempfile
+from typing import BinaryIO, Optional
+
+from .scanner import DEFAULT_BUFFER_SIZE
+
+
+class Validator:
+    """
+    Passes on the records that have as many fields as the header and sets the others aside.
+
+    Fields are counted on the raw bytes, as the delimiters outside quotes,
+    so valid records go through without being parsed; records without
+    quotes take a shortcut. A record spanning lines that turns out invalid
+    comes from a stray quote when its quote is left open at the end of the
+    input, or closed by a quote followed by something else than a delimiter,
+    a quote or a line end: only its first line is rejected, as ``quote``, and
+    the lines after it are framed again. Otherwise its quotes are well formed
+    and it is rejected whole, as ``fields``: the lines of a quoted field are
+    data, not records. ``records``,
+    ``rejected`` and ``errors`` (per reason, ``fields`` or ``quote``) count
+    what was seen. Quotes and fields are counted as the pieces of a record
+    come; a record with quotes is held until it ends, in one buffer of at
+    most ``buffer_size`` bytes, moved to a temporary file past that.
+    """
+
+    def __init__(self, encoding: str = 'utf-8', delimiter: str = ',', quotechar: str = '"',
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, temp_dir: Optional[str] = None):
+        if buffer_size <= 0: raise ValueError("buffer size must be greater than 0")
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.buffer_size = buffer_size
+        self.temp_dir = temp_dir
+        self.records = 0
+        self.rejected = 0
+        self.errors = {'fields': 0, 'quote': 0}
+        self.field_count: Optional[int] = None
+
+    def bind(self, header: list):
+        self.field_count = len(header)
+        return self
+
+    def filter(self, pieces, offset: int, reject):
+        """
+        Yield the ``(data, end)`` pieces of valid records; ``offset`` is where the first one starts.
+
+        ``reject(offset, reason, record)`` is called with each invalid record.
+        """
+        delimiter = self.delimiter.encode(self.encoding)
+        quote = self.quotechar.encode(self.encoding)
+        expected = self.field_count
+        framer = _Framer(self, offset, reject)
+
+        for data, end in pieces:
+            if end and framer.idle and quote not in data:
+                # a whole record without quotes is a single line
+                if data.count(delimiter) + 1 == expected:
+                    self.records += 1
+                    yield data, True
+                else:
+                    self._reject(reject, framer.offset, 'fields', data)
+                framer.offset += len(data)
+                continue
+            yield from framer.feed(data)
+
+        yield from framer.finish()
+
+    def _reject(self, reject, offset: int, reason: str, record: bytes):
+        self.records += 1
+        self.rejected += 1
+        self.errors[reason] += 1
+        reject(offset, reason, record)
+
+
+class _Framer:
+    """Frames records on line feeds outside quotes, counting their fields on the way."""
+
+    def __init__(self, validator: Validator, offset: int, reject):
+        self._validator = validator
+        self._reject = reject
+        self._delimiter = validator.delimiter.encode(validator.encoding)
+        self._quote = validator.quotechar.encode(validator.encoding)
+        self.offset = offset
+        # the record being framed: in memory, or in a temporary file once larger than buffer_size
+        self._held = bytearray()
+        self._spool = None
+        self._size = 0
+        # length of its first line once seen, its fields so far, whether a quote is open, whether
+        # one was just closed, and whether one was closed amid a field, as a stray quote does
+        self._first_line: Optional[int] = None
+        self._fields = 1
+        self._quoted = False
+        self._closed = False
+        self._stray = False
+        self._after_quote = (self._delimiter[:1], self._quote[:1], b"\r", b"\n")
+        # (data, start) to frame before the rest of the input: what follows a cut record
+        self._sources: list = []
+
+    @property
+    def idle(self):
+        return self._size == 0
+
+    def feed(self, data: bytes):
+        self._sources.append(iter(((data, 0),)))
+        yield from self._drain()
+
+    def finish(self):
+        # only the last record of the input may end without a line feed; quotes still open are cut
+        while self._size:
+            cut = yield from self._complete(b"", 0, invalid=self._quoted)
+            if cut is not None: self._sources.append(cut)
+            yield from self._drain()
+
+    def _drain(self):
+        sources = self._sources
+        while sources:
+            source = next(sources[-1], None)
+            if source is None: sources.pop()
+            else: yield from self._frame(*source)
+
+    def _frame(self, data: bytes, pos: int):
+        delimiter, quote = self._delimiter, self._quote
+        length = len(data)
+        newline = -1
+        while pos < length:
+            start = pos
+            end = None
+            while pos < length:
+                if self._quoted:
+                    pos = data.find(quote, pos)
+                    if pos < 0: pos = length
+                    else:
+                        pos += 1
+                        self._quoted = False
+                        self._closed = True
+                    continue
+                if self._closed:
+                    self._closed = False
+                    if data[pos:pos + 1] not in self._after_quote: self._stray = True
+                if newline < pos:
+                    newline = data.find(b"\n", pos)
+                    if newline < 0: newline = length
+                stop = data.find(quote, pos, newline)
+                if stop >= 0:
+                    self._fields += data.count(delimiter, pos, stop)
+                    pos = stop + 1
+                    self._quoted = True
+                    continue
+                self._fields += data.count(delimiter, pos, newline)
+                pos = newline + 1 if newline < length else length
+                if newline < length: end = pos
+                break
+
+            if self._first_line is None:
+                line_end = data.find(b"\n", start, pos)
+                if line_end >= 0: self._first_line = self._size + line_end + 1 - start
+            if end is None:
+                self._append(memoryview(data)[start:pos])
+                continue
+            cut = yield from self._complete(data, start, end=end)
+            if cut is not None:
+                # the rest of the cut record comes before the rest of this data
+                self._sources.append(iter(((data, pos),)))
+                self._sources.append(cut)
+                return
+
+    def _append(self, segment):
+        if self._spool is None and len(self._held) + len(segment) > self._validator.buffer_size:
+            self._spool = tempfile.TemporaryFile(prefix="datashear-record-", dir=self._validator.temp_dir)
+            self._spool.write(self._held)
+            self._held = bytearray()
+        if self._spool is None: self._held += segment
+        else: self._spool.write(segment)
+        self._size += len(segment)
+
+    def _complete(self, data: bytes, start: int, end: Optional[int] = None, invalid: bool = False):
+        # the record ends with data[start:end], ``invalid`` when its quote is left open; returns
+        # the source to frame again when it is cut, after a stray quote
+        validator = self._validator
+        if self._size == 0: record = data[start:end]
+        else:
+            self._append(memoryview(data)[start:end])
+            record = None
+        size = self._size + (len(record) if record is not None else 0)
+        first_line, fields, stray = self._first_line, self._fields, invalid or self._stray
+        spool, held = self._spool, self._held
+        self._held, self._spool, self._size = bytearray(), None, 0
+        self._first_line, self._fields, self._quoted, self._closed, self._stray = None, 1, False, False, False
+        if record is None and spool is None: record = bytes(held)
+        del held
+
+        if not invalid and fields == validator.field_count:
+            validator.records += 1
+            self.offset += size
+            if spool is None: yield record, True
+            else: yield from _blocks(spool, 0, validator.buffer_size, True)
+            return None
+
+        if not stray or first_line is None or first_line >= size:
+            validator._reject(self._reject, self.offset, 'fields', record if spool is None else _read(spool, 0, size))
+            self.offset += size
+            if spool is not None: spool.close()
+            return None
+        # reject the first line of the record, frame the next ones again
+        validator._reject(self._reject, self.offset, 'quote',
+                          record[:first_line] if spool is None else _read(spool, 0, first_line))
+        self.offset += first_line
+        if spool is None: return iter(((record, first_line),))
+        return ((block, 0) for block, _ in _blocks(spool, first_line, validator.buffer_size, False))
+
+
+def _read(file, start: int, size: int):
+    file.seek(start)
+    return file.read(size)
+
+
+def _blocks(file, start: int, block_size: int, mark_end: bool):
+    # (block, end) of a temporary file from start on, end set on the last block; the file is closed after
+    try:
+        file.seek(start)
+        block = file.read(block_size)
+        while block:
+            following = file.read(block_size)
+            yield block, mark_end and not following
+            block = following
+    finally:
+        file.close()
+
+
+class RejectFile:
+    """
+    CSV of rejected records, with their offset in the input and the reason.
+
+    The file is only opened, with ``open_output``, when the first record is
+    rejected. Records keep their bytes: undecodable ones round-trip through
+    ``surrogateescape``.
+    """
+
+    def __init__(self, open_output, encoding: str = 'utf-8'):
+        self._open_output = open_output
+        self.encoding = encoding
+        self._output: Optional[BinaryIO] = None
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def write(self, offset: int, reason: str, record: bytes):
+        if self._output is None:
+            self._output = self._open_output()
+            self._writer.writerow(['offset', 'reason', 'record'])
+        self._writer.writerow([offset, reason, record.decode(self.encoding, 'surrogateescape')])
+        self._output.write(self._buffer.getvalue().encode(self.encoding, 'surrogateescape'))
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+
+    def close(self):
+        if self._output is not None: self._output.close()
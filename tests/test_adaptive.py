@@ -0,0 +1,185 @@
+"""
+Tests for adaptive shard limits, adjusted from downstream feedback while splitting.
+"""
+
+import pytest
+import os
+import csv
+import json
+import tempfile
+import shutil
+
+from datashear.adaptive import AdaptiveSizer
+from datashear.core import Splitter
+
+
+class TestSplitterAdaptive:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['ID', 'Name', 'Comment'])
+            for i in range(5000):
+                writer.writerow([i, f'name {i}', f'line\n{i}' if i % 7 == 0 else f'comment {i}'])
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def read_ids(self, shards):
+        """
+        Return the IDs of the rows of every shard, in shard order.
+        """
+        ids = []
+        for shard in shards:
+            with open(os.path.join(self.output_dir, shard.name), newline='', encoding='utf-8') as file:
+                ids.extend(int(row[0]) for row in list(csv.reader(file))[1:])
+        return ids
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_target_time(self):
+        """
+        Test that shards are cut at what the consumer gets through in the target time.
+        """
+        seen = []
+
+        def feedback(shard):
+            seen.append(shard.index)
+            return 4000.0
+
+        sizer = AdaptiveSizer(target_time=2.5, feedback=feedback)
+        shards = Splitter(self.sample_csv, self.output_dir).split(size=2000, adaptive=sizer)
+
+        assert seen == [shard.index for shard in shards]
+        assert [shard.limit for shard in shards] == [2000] + [10000] * (len(shards) - 1)
+        assert sizer.limits == [shard.limit for shard in shards]
+        assert all(shard.size <= 10000 for shard in shards)
+        assert shards[1].size > 9000
+        assert self.read_ids(shards) == list(range(5000))
+
+    def test_throughput_changes(self):
+        """
+        Test that row limits follow the measured throughput, smoothed, and stay within bounds.
+        """
+        rates = iter([None, 100, 100, 20, 20, 20, 5000])
+
+        def feedback(shard):
+            return next(rates, 5000)
+
+        sizer = AdaptiveSizer(target_time=3, feedback=feedback, smoothing=0.5, min_limit=50, max_limit=1000)
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=400, adaptive=sizer)
+
+        assert [shard.limit for shard in shards[:8]] == [400, 400, 300, 300, 180, 120, 90, 1000]
+        assert [shard.rows for shard in shards[:-1]] == [shard.limit for shard in shards[:-1]]
+        assert self.read_ids(shards) == list(range(5000))
+
+    @pytest.mark.parametrize("limit", [{'size': 1000}, {'rows': 10}])
+    def test_shard_count(self, limit):
+        """
+        Test that a count range spreads the input so the split ends with a count in the range.
+        """
+        sizer = AdaptiveSizer(shards=(15, 20))
+        shards = Splitter(self.sample_csv, self.output_dir).split(adaptive=sizer, **limit)
+
+        assert 15 <= len(shards) <= 20
+        assert self.read_ids(shards) == list(range(5000))
+
+    @pytest.mark.parametrize("limit", [{'size': 1000}, {'rows': 10}])
+    @pytest.mark.parametrize("count", [1, 2, 7])
+    def test_exact_shard_count(self, limit, count):
+        """
+        Test that a range of one count gives that many shards, the first limit included.
+        """
+        sizer = AdaptiveSizer(shards=(count, count))
+        shards = Splitter(self.sample_csv, self.output_dir).split(adaptive=sizer, **limit)
+
+        assert len(shards) == count
+        assert shards[0].limit != list(limit.values())[0]
+        assert self.read_ids(shards) == list(range(5000))
+
+    @pytest.mark.parametrize("limit", [{'size': 1000}, {'rows': 10}])
+    @pytest.mark.parametrize("options", [{'engine': 'csv'}, {'format': 'jsonl'}])
+    @pytest.mark.parametrize("memory", [None, 4 * 1024 * 1024])
+    def test_shard_count_written(self, limit, options, memory):
+        """
+        Test that a count range holds when shards are written in other bytes than the input, read whole or sampled.
+        """
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file, lineterminator='\n')
+            writer.writerow(['ID', 'Name', 'Comment'])
+            for i in range(5000):
+                writer.writerow([i, f'name {i}', f'line\n{i}' if i % 7 == 0 else f'comment {i}'])
+        sizer = AdaptiveSizer(shards=(5, 5))
+        shards = Splitter(self.sample_csv, self.output_dir, memory=memory).split(adaptive=sizer, **limit, **options)
+
+        assert len(shards) == 5
+        if options.get('format') != 'jsonl':
+            assert self.read_ids(shards) == list(range(5000))
+            return
+        ids = []
+        for shard in shards:
+            with open(os.path.join(self.output_dir, shard.name), encoding='utf-8') as file:
+                ids.extend(int(json.loads(line)['ID']) for line in file)
+        assert ids == list(range(5000))
+
+    @pytest.mark.parametrize("limit", [{'size': 1000}, {'rows': 10}])
+    @pytest.mark.parametrize("window", [{'row_range': (1000, 3000)}, {'row_range': (1000, None)},
+                                        {'byte_range': (20000, 60000)}])
+    @pytest.mark.parametrize("memory", [None, 4 * 1024 * 1024])
+    def test_shard_count_range(self, limit, window, memory):
+        """
+        Test that a count range spreads the rows of a ranged split, not those of the whole input.
+        """
+        sizer = AdaptiveSizer(shards=(5, 5))
+        shards = Splitter(self.sample_csv, self.output_dir, memory=memory, **window).split(adaptive=sizer, **limit)
+
+        assert len(shards) == 5
+        ids = self.read_ids(shards)
+        if 'row_range' in window:
+            assert ids == list(range(1000, window['row_range'][1] or 5000))
+        else:
+            assert ids == list(range(ids[0], ids[0] + len(ids)))
+
+    def test_manifest(self):
+        """
+        Test that the limits chosen are saved with the shards in the manifest.
+        """
+        sizer = AdaptiveSizer(target_time=1, feedback=lambda shard: 500, shards=(2, 100))
+        shards = Splitter(self.sample_csv, self.output_dir).by_rows(1000, adaptive=sizer)
+
+        with open(os.path.join(self.output_dir, "sample_manifest.json"), encoding='utf-8') as file:
+            manifest = json.load(file)
+        assert manifest['adaptive'] == {'unit': 'rows', 'limits': [1000] + [500] * (len(shards) - 1), 'throughput': 500}
+        assert manifest['shards'] == [shard.to_dict() for shard in shards]
+        assert [shard['limit'] for shard in manifest['shards']] == sizer.limits
+
+    def test_invalid_arguments(self):
+        """
+        Test that adaptive arguments are checked.
+        """
+        with pytest.raises(ValueError):
+            AdaptiveSizer()
+        with pytest.raises(ValueError):
+            AdaptiveSizer(target_time=10)
+        with pytest.raises(ValueError):
+            AdaptiveSizer(shards=(10, 5))
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        with pytest.raises(ValueError):
+            splitter.split(key="Name", adaptive=AdaptiveSizer(shards=(5, 10)))
+        with pytest.raises(ValueError):
+            splitter.split(rows=10, adaptive=AdaptiveSizer(shards=(5, 10)), cache=os.path.join(self.test_dir, "cache"))
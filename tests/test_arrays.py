@@ -0,0 +1,119 @@
+"""
+Tests for the NumPy array output of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import tempfile
+import shutil
+
+from datashear.arrays import Schema
+from datashear.core import Splitter
+
+numpy = pytest.importorskip("numpy")
+
+
+class TestSplitterArrays:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['ID', 'Price', 'Count', 'Day', 'Name']
+        self.create_sample_csv(1000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file with numeric, date and text columns, some fields empty.
+        """
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            for i in range(rows):
+                count = '' if i % 7 == 0 else i % 10
+                writer.writerow([i, f'{i / 4}', count, f'2024-02-{i % 28 + 1:02d}', f'name, {i}'])
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_batches_inferred_schema(self):
+        """
+        Test that batches hold typed columns inferred from a sample.
+        """
+        batches = list(Splitter(self.sample_csv, self.output_dir).batches(batch_rows=300))
+
+        assert [len(batch['ID']) for batch in batches] == [300, 300, 300, 100]
+        first = batches[0]
+        assert first['ID'].dtype == numpy.int64 and first['ID'][299] == 299
+        assert first['Price'].dtype == numpy.float64 and first['Price'][3] == 0.75
+        assert first['Count'].dtype == numpy.float64 and numpy.isnan(first['Count'][0]) and first['Count'][1] == 1
+        assert first['Day'].dtype == numpy.dtype('datetime64[D]') and str(first['Day'][0]) == '2024-02-01'
+        assert first['Name'][5] == 'name, 5'
+
+    def test_batches_given_schema(self):
+        """
+        Test explicit dtypes, given for some columns or as a whole schema.
+        """
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        batch = next(splitter.batches(schema={'ID': 'int32', 'Name': 'U12'}))
+        assert batch['ID'].dtype == numpy.int32 and batch['Name'].dtype == numpy.dtype('U12')
+
+        schema = Schema(self.header, ['float32', 'float32', 'float32', 'str', 'str'])
+        batch = next(splitter.batches(schema=schema))
+        assert batch['Day'][0] == '2024-02-01' and batch['Count'].dtype == numpy.float32
+
+        with pytest.raises(ValueError, match="Cannot convert column 'Name'"):
+            next(splitter.batches(schema={'Name': 'int64'}))
+        with pytest.raises(ValueError, match="Unknown column"):
+            next(splitter.batches(schema={'Missing': 'int64'}))
+
+    def test_npy_shards(self):
+        """
+        Test .npy shards holding memory-mappable structured arrays.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir, output_base_filename="part").to_arrays(400)
+
+        assert [(shard.name, shard.rows) for shard in shards] == [
+            ("part_1.npy", 400), ("part_2.npy", 400), ("part_3.npy", 200)
+        ]
+        array = numpy.load(os.path.join(self.output_dir, "part_2.npy"), mmap_mode='r')
+        assert isinstance(array, numpy.memmap)
+        assert array.dtype.names == tuple(self.header)
+        assert array['ID'][0] == 400 and array['Price'][-1] == 799 / 4
+        assert shards[1].size == os.path.getsize(os.path.join(self.output_dir, "part_2.npy"))
+
+    def test_npz_shards(self):
+        """
+        Test .npz shards holding one array per column.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).to_arrays(700, format="npz")
+
+        with numpy.load(os.path.join(self.output_dir, shards[1].name)) as data:
+            assert sorted(data.files) == sorted(self.header)
+            assert list(data['ID']) == list(range(700, 1000))
+
+    def test_arrays_invalid(self):
+        """
+        Test error handling for invalid array options.
+        """
+        splitter = Splitter(self.sample_csv, self.output_dir)
+
+        with pytest.raises(ValueError, match="Unknown array format"):
+            splitter.to_arrays(100, format="parquet")
+        with pytest.raises(ValueError, match="rows per file must be greater than 0"):
+            splitter.to_arrays(0)
@@ -0,0 +1,189 @@
+"""
+Tests for the run cache of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import tempfile
+import shutil
+
+from datashear.cache import RunCache
+from datashear.core import Splitter
+
+
+class TestSplitterCache:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.cache_dir = os.path.join(self.test_dir, "cache")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.create_sample_csv(0, 1000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, first, last):
+        """
+        Write rows [first, last) to the sample CSV file, appending when first is not 0.
+        """
+        with open(self.sample_csv, 'a' if first else 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            if not first: writer.writerow(['ID', 'Name', 'Comment'])
+            for i in range(first, last):
+                writer.writerow([i, f'name {i}', f'line\n{i}'])
+
+    def count_runs(self, monkeypatch):
+        """
+        Record the first shard index of every split actually run.
+        """
+        runs = []
+        split = Splitter._split
+
+        def counted(splitter, *args, **kwargs):
+            runs.append(kwargs['first'])
+            return split(splitter, *args, **kwargs)
+
+        monkeypatch.setattr(Splitter, "_split", counted)
+        return runs
+
+    def read_outputs(self, directory):
+        """
+        Return the content of every output file of a directory.
+        """
+        result = {}
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name), 'rb') as file:
+                result[name] = file.read()
+        return result
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_cache_unchanged(self, monkeypatch):
+        """
+        Test that an unchanged input is not split again.
+        """
+        runs = self.count_runs(monkeypatch)
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        first = splitter.split(rows=300, cache=self.cache_dir)
+        second = splitter.split(rows=300, cache=self.cache_dir)
+
+        assert runs == [1]
+        assert [shard.to_dict() for shard in second] == [shard.to_dict() for shard in first]
+
+    def test_cache_missing_output(self, monkeypatch):
+        """
+        Test that shards are written again when the output does not match the cache.
+        """
+        runs = self.count_runs(monkeypatch)
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        shards = splitter.split(rows=300, cache=self.cache_dir)
+        os.remove(os.path.join(self.output_dir, shards[1].name))
+        splitter.split(rows=300, cache=self.cache_dir)
+
+        assert runs == [1, 1]
+        assert os.path.exists(os.path.join(self.output_dir, shards[1].name))
+
+    def test_cache_appended_raw(self, monkeypatch):
+        """
+        Test that only the trailing shards are written again after an append.
+        """
+        runs = self.count_runs(monkeypatch)
+        Splitter(self.sample_csv, self.output_dir).split(rows=300, cache=self.cache_dir)
+        self.create_sample_csv(1000, 1700)
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=300, cache=self.cache_dir)
+
+        fresh_dir = os.path.join(self.test_dir, "fresh")
+        expected = Splitter(self.sample_csv, fresh_dir).split(rows=300)
+        assert runs == [1, 4, 1]
+        assert [shard.to_dict() for shard in shards] == [shard.to_dict() for shard in expected]
+        assert self.read_outputs(self.output_dir) == self.read_outputs(fresh_dir)
+
+    def test_cache_appended_csv(self, monkeypatch):
+        """
+        Test appends with the csv engine, without repeated headers and with statistics.
+        """
+        runs = self.count_runs(monkeypatch)
+        options = dict(repeat_header=False, stats=True, cache=RunCache(self.cache_dir))
+        Splitter(self.sample_csv, self.output_dir).by_size(5000, **options)
+        self.create_sample_csv(1000, 1500)
+        shards = Splitter(self.sample_csv, self.output_dir).by_size(5000, **options)
+
+        fresh_dir = os.path.join(self.test_dir, "fresh")
+        Splitter(self.sample_csv, fresh_dir).by_size(5000, repeat_header=False, stats=True)
+        assert runs[0] == 1 and 1 < runs[1] < len(shards)
+        assert self.read_outputs(self.output_dir) == self.read_outputs(fresh_dir)
+
+    def test_cache_changed(self, monkeypatch):
+        """
+        Test that other parameters or rewritten content of the same size and time miss the cache.
+        """
+        runs = self.count_runs(monkeypatch)
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        splitter.split(rows=300, cache=self.cache_dir)
+        splitter.split(rows=400, cache=self.cache_dir)
+
+        stat = os.stat(self.sample_csv)
+        with open(self.sample_csv, 'r+b') as file:
+            file.seek(stat.st_size - 3)
+            file.write(b"x")
+        os.utime(self.sample_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        splitter.split(rows=400, cache=self.cache_dir)
+
+        assert runs == [1, 1, 1]
+
+    def test_cache_eviction(self):
+        """
+        Test that the least recently used entries are evicted.
+        """
+        cache = RunCache(self.cache_dir, max_entries=2)
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        splitter.split(rows=100, cache=cache)
+        splitter.split(rows=200, cache=cache)
+        splitter.split(rows=100, cache=cache)
+        splitter.split(rows=300, cache=cache)
+
+        assert len(cache) == 2
+        assert cache.get(cache.key(self.parameters(100))) is not None
+        assert cache.get(cache.key(self.parameters(200))) is None
+
+    def test_cache_callables(self, monkeypatch):
+        """
+        Test that named functions are keyed by name, and that lambdas cannot be cached.
+        """
+        runs = self.count_runs(monkeypatch)
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        splitter.split(rows=300, sort_key=("ID", int), cache=self.cache_dir)
+        splitter.split(rows=300, sort_key=("ID", float), cache=self.cache_dir)
+        splitter.split(rows=300, sort_key=("ID", int), cache=self.cache_dir)
+
+        assert runs == [1, 1]
+        with pytest.raises(ValueError):
+            splitter.split(key=lambda row: row[0][-1], cache=self.cache_dir)
+        with pytest.raises(ValueError):
+            splitter.split(key=lambda row: row[1][-1], cache=self.cache_dir)
+        assert runs == [1, 1]
+
+    def parameters(self, rows):
+        """
+        Return the cache parameters of a raw split by rows.
+        """
+        return {
+            'input': os.path.abspath(self.sample_csv),
+            'output': [os.path.abspath(self.output_dir), "", "", "", None, None, 1],
+            'range': [None, None],
+            'split': [rows, None, None, None, None, True, None, None, None, "exact", False, False, "raw", "csv", None],
+        }
@@ -0,0 +1,200 @@
+"""
+Tests for distributed splits: a coordinator handing byte ranges to worker processes.
+"""
+
+import os
+import csv
+import json
+import socket
+import tempfile
+import shutil
+import multiprocessing
+
+import pytest
+
+from datashear.cluster import ClusterError, Coordinator, work
+
+
+class TestSplitterCluster:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['ID', 'Name', 'Comment'])
+            for i in range(3000):
+                writer.writerow([i, f'name {i}', f'line\n"{i}",x' if i % 7 == 0 else f'comment {i}'])
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def run_workers(self, coordinator, count=3):
+        """
+        Run ``count`` worker processes against a started coordinator and return its shards.
+        """
+        processes = [multiprocessing.Process(target=work, args=(coordinator.address,)) for _ in range(count)]
+        for process in processes: process.start()
+        try:
+            return coordinator.wait(timeout=60)
+        finally:
+            for process in processes: process.join(timeout=30)
+
+    def read_rows(self, shards):
+        """
+        Data rows of the shards, in order, without their headers.
+        """
+        rows = []
+        for shard in shards:
+            with open(os.path.join(self.output_dir, shard.name), newline='', encoding='utf-8') as file:
+                reader = csv.reader(file)
+                assert next(reader) == ['ID', 'Name', 'Comment']
+                rows.extend(reader)
+        return rows
+
+    def expected_rows(self):
+        """
+        Data rows of the sample CSV file.
+        """
+        with open(self.sample_csv, newline='', encoding='utf-8') as file:
+            return list(csv.reader(file))[1:]
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_workers_split_every_range(self):
+        """
+        Test that several worker processes split all the rows into globally numbered shards.
+        """
+        with Coordinator(self.sample_csv, self.output_dir, ranges=8, rows=250) as coordinator:
+            shards = self.run_workers(coordinator)
+
+        assert [shard.index for shard in shards] == list(range(1, len(shards) + 1))
+        assert [shard.name for shard in shards] == [f"sample_{i}.csv" for i in range(1, len(shards) + 1)]
+        assert self.read_rows(shards) == self.expected_rows()
+        assert all(shard.rows <= 250 for shard in shards)
+        assert not [name for name in os.listdir(self.output_dir) if name.startswith(".")]
+
+    def test_ranges_start_on_records(self):
+        """
+        Test that range boundaries never fall inside a quoted field spanning lines.
+        """
+        coordinator = Coordinator(self.sample_csv, self.output_dir, ranges=16, size=4096)
+
+        assert len(coordinator.ranges) == 16
+        with open(self.sample_csv, 'rb') as file:
+            data = file.read()
+        for start, _ in coordinator.ranges:
+            # a record boundary: the rest of the file parses as whole rows of three fields
+            rows = list(csv.reader(data[start:].decode('utf-8').splitlines(keepends=True)))
+            assert rows and all(len(row) == 3 for row in rows)
+
+    def test_manifest(self):
+        """
+        Test that the coordinator writes a manifest of the ranges and shards.
+        """
+        with Coordinator(self.sample_csv, self.output_dir, ranges=4, size=8192, stats=True) as coordinator:
+            shards = self.run_workers(coordinator, 2)
+
+        with open(os.path.join(self.output_dir, "sample_manifest.json"), encoding='utf-8') as file:
+            manifest = json.load(file)
+        assert manifest['ranges'] == coordinator.ranges
+        assert manifest['attempts'] == [1, 1, 1, 1]
+        assert manifest['shards'] == [shard.to_dict() for shard in shards]
+        assert sum(shard['rows'] for shard in manifest['shards']) == 3000
+        assert os.path.exists(os.path.join(self.output_dir, "sample_stats.json"))
+
+    def test_lost_range_is_retried(self):
+        """
+        Test that a range taken by a worker that disconnects is handed out again.
+        """
+        with Coordinator(self.sample_csv, self.output_dir, ranges=4, rows=500) as coordinator:
+            # a worker that dies right after taking a range
+            with socket.create_connection(coordinator.address) as connection, connection.makefile('rwb') as stream:
+                stream.write(b'{"op": "next"}\n')
+                stream.flush()
+                task = json.loads(stream.readline())['task']
+                lost = task['id']
+                # the shard it was writing when it died
+                os.makedirs(self.output_dir, exist_ok=True)
+                with open(os.path.join(self.output_dir, task['prefix'] + "_sample_1.csv"), 'w') as file:
+                    file.write("ID,Name,Comment\n")
+            shards = self.run_workers(coordinator, 2)
+
+        assert coordinator._attempts[lost] == 2
+        assert self.read_rows(shards) == self.expected_rows()
+        assert sorted(os.listdir(self.output_dir)) == sorted([shard.name for shard in shards] + ["sample_manifest.json"])
+
+    @pytest.mark.parametrize("name", ["../victim.csv", "victim.csv"])
+    def test_foreign_shard_names_are_refused(self, name):
+        """
+        Test that files other than the hidden shards of the attempt are neither renamed nor removed.
+        """
+        os.makedirs(self.output_dir)
+        victim = os.path.join(self.output_dir, name)
+        with open(victim, 'w') as file:
+            file.write("keep me\n")
+
+        with Coordinator(self.sample_csv, self.output_dir, ranges=4, rows=500) as coordinator:
+            with socket.create_connection(coordinator.address) as connection, connection.makefile('rwb') as stream:
+                stream.write(b'{"op": "next"}\n')
+                stream.flush()
+                task = json.loads(stream.readline())['task']
+                shard = {'index': 1, 'size': 8, 'name': name, 'rows': 1}
+                stream.write(json.dumps({'op': 'done', 'task': task['id'], 'attempt': task['attempt'],
+                                         'shards': [shard]}).encode('utf-8') + b"\n")
+                stream.flush()
+                # the message is refused and the connection dropped, so the range goes to another attempt
+                assert stream.readline() == b""
+            shards = self.run_workers(coordinator, 2)
+
+        assert coordinator._attempts[task['id']] == 2
+        assert self.read_rows(shards) == self.expected_rows()
+        with open(victim) as file:
+            assert file.read() == "keep me\n"
+
+    def test_failing_range_raises(self):
+        """
+        Test that a range failing on every attempt fails the split without leaving shards.
+        """
+        with Coordinator(self.sample_csv, self.output_dir, ranges=4, key="Missing", max_attempts=2) as coordinator:
+            with pytest.raises(ClusterError):
+                self.run_workers(coordinator, 2)
+
+        assert not os.listdir(self.output_dir)
+
+    def test_failing_range_after_writing(self):
+        """
+        Test that a range failing once it wrote shards leaves no partial shard of any attempt.
+        """
+        with open(self.sample_csv, 'a', newline='', encoding='utf-8') as file:
+            csv.writer(file).writerow(['unknown', 'name', 'comment'])
+
+        with Coordinator(self.sample_csv, self.output_dir, ranges=4, rows=100, max_span=("ID", 10 ** 6),
+                         max_attempts=2) as coordinator:
+            with pytest.raises(ClusterError, match="Not a number"):
+                self.run_workers(coordinator, 2)
+
+        assert coordinator._attempts[3] == 2
+        assert not os.listdir(self.output_dir)
+
+    def test_unsupported_options(self):
+        """
+        Test that options needing the whole input are rejected.
+        """
+        with pytest.raises(ValueError):
+            Coordinator(self.sample_csv, self.output_dir, rows=100, sort_key="ID")
+        with pytest.raises(ValueError):
+            Coordinator(self.sample_csv, self.output_dir, rows=100, repeat_header=False)
@@ -0,0 +1,179 @@
+"""
+Tests for the dedup option of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import random
+import tempfile
+import shutil
+
+import datashear.dedup
+from datashear.core import Splitter
+from datashear.dedup import DIGEST_COST, Deduplicator
+
+
+class TestSplitterDedup:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['Customer', 'Amount', 'Note']
+        self.rows = self.create_sample_csv(4000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file where many rows are repeated, far apart from each other.
+        """
+        rng = random.Random(0)
+        data = [[f'c{rng.randrange(500)}', str(rng.randrange(3)), f'note\n{rng.randrange(2)}'] for _ in range(rows)]
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            writer.writerows(data)
+        return data
+
+    def read_rows(self, shards):
+        """
+        Return the data rows of every shard, in shard order.
+        """
+        result = []
+        for shard in shards:
+            with open(os.path.join(self.output_dir, shard.name), 'r', newline='', encoding='utf-8') as file:
+                result.extend(row for row in csv.reader(file) if row != self.header)
+        return result
+
+    def expected_rows(self, key):
+        """
+        Return the first occurrence of every key, in input order.
+        """
+        seen = set()
+        result = []
+        for row in self.rows:
+            if key(row) in seen: continue
+            seen.add(key(row))
+            result.append(row)
+        return result
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_dedup_whole_rows(self):
+        """
+        Test that repeated rows are dropped and first occurrences keep their order.
+        """
+        dedup = Deduplicator(True)
+        shards = Splitter(self.sample_csv, self.output_dir).by_rows(300, dedup=dedup)
+
+        expected = self.expected_rows(tuple)
+        assert self.read_rows(shards) == expected
+        assert dedup.records == len(self.rows)
+        assert dedup.duplicates == len(self.rows) - len(expected)
+        assert not dedup.spilled
+
+    def test_dedup_key_columns(self):
+        """
+        Test deduplication on a subset of the columns, with the raw engine.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=100, dedup=["Customer", 1])
+
+        assert self.read_rows(shards) == self.expected_rows(lambda row: (row[0], row[1]))
+
+    def test_dedup_spill(self):
+        """
+        Test that a dedup outgrowing its memory budget spills to partitions and stays exact.
+        """
+        dedup = Deduplicator("Customer", memory_limit=4096)
+        shards = Splitter(self.sample_csv, self.output_dir).by_size(2048, dedup=dedup)
+
+        assert dedup.spilled
+        assert self.read_rows(shards) == self.expected_rows(lambda row: row[0])
+
+    def test_dedup_spill_unknown_size(self, monkeypatch):
+        """
+        Test that partitions outgrowing the memory budget, as when the input size is unknown, are partitioned again.
+        """
+        levels = []
+        scatter = datashear.dedup._scatter
+
+        def recorded(entries, seen, count, prefix, level):
+            levels.append(level)
+            assert len(seen) <= 4096 // DIGEST_COST
+            return scatter(entries, seen, count, prefix, level)
+
+        monkeypatch.setattr(datashear.dedup, "_scatter", recorded)
+        records = [",".join(row).encode('utf-8') + b"\n" for row in self.rows]
+        dedup = Deduplicator(True, memory_limit=4096)
+
+        assert list(dedup.filter(records, 0)) == list(dict.fromkeys(records))
+        assert levels[0] == 0 and len(levels) > 1
+        assert dedup.duplicates == len(records) - len(set(records))
+
+    @pytest.mark.parametrize("memory_limit", [1, DIGEST_COST, 2 * DIGEST_COST])
+    @pytest.mark.parametrize("expected_size", [0, None])
+    def test_dedup_tiny_memory_limit(self, monkeypatch, memory_limit, expected_size):
+        """
+        Test that a memory budget of about one digest still ends, exact, over a bounded number of partitions.
+        """
+        counts = []
+        scatter = datashear.dedup._scatter
+
+        def recorded(entries, seen, count, prefix, level):
+            counts.append(count)
+            return scatter(entries, seen, count, prefix, level)
+
+        monkeypatch.setattr(datashear.dedup, "_scatter", recorded)
+        records = [",".join(row).encode('utf-8') + b"\n" for row in self.rows[:400]]
+        if expected_size is None: expected_size = sum(map(len, records))
+        dedup = Deduplicator(True, memory_limit=memory_limit)
+
+        assert list(dedup.filter(records, expected_size)) == list(dict.fromkeys(records))
+        assert dedup.spilled and max(counts) <= datashear.dedup.MAX_PARTITIONS
+
+    def test_dedup_with_sort(self):
+        """
+        Test that dedup runs before the sort.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=100, dedup="Customer", sort_key="Customer",
+                                                                  memory_limit=8192)
+
+        expected = sorted(self.expected_rows(lambda row: row[0]), key=lambda row: row[0])
+        assert self.read_rows(shards) == expected
+
+    def test_dedup_bloom(self):
+        """
+        Test that the Bloom filter mode never lets a duplicate through.
+        """
+        dedup = Deduplicator(True, mode="bloom", memory_limit=64 * 1024)
+        rows = self.read_rows(Splitter(self.sample_csv, self.output_dir).by_rows(300, dedup=dedup))
+
+        assert len(set(map(tuple, rows))) == len(rows)
+        assert set(map(tuple, rows)) <= set(map(tuple, self.rows))
+        assert len(rows) == len(self.expected_rows(tuple))
+
+    def test_dedup_invalid(self):
+        """
+        Test error handling for invalid dedup options.
+        """
+        splitter = Splitter(self.sample_csv, self.output_dir)
+
+        with pytest.raises(ValueError, match="Unknown dedup mode"):
+            splitter.by_rows(100, dedup=True, dedup_mode="fuzzy")
+        with pytest.raises(ValueError, match="Unknown column"):
+            splitter.by_rows(100, dedup="Missing")
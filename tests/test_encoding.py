@@ -0,0 +1,138 @@
+"""
+Tests for the encoding and delimiter detection of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import io
+import tempfile
+import shutil
+
+from datashear.core import Splitter
+from datashear.detect import TranscodingReader, ascii_compatible, detect_encoding, sniff_delimiter
+
+
+class TestSplitterEncoding:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['Numéro', 'Ville', 'Note']
+        self.rows = [[str(i), f'Zürich {i % 3}', f'été; "chaud"\n{i}' if i % 4 == 0 else 'ok'] for i in range(300)]
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, encoding, delimiter, bom=b""):
+        """
+        Write the sample rows with the given encoding, delimiter and BOM.
+        """
+        text = io.StringIO(newline='')
+        writer = csv.writer(text, delimiter=delimiter)
+        writer.writerow(self.header)
+        writer.writerows(self.rows)
+        with open(self.sample_csv, 'wb') as file:
+            file.write(bom + text.getvalue().encode(encoding))
+
+    def read_rows(self, shards, encoding='utf-8', delimiter=','):
+        """
+        Return the data rows of every shard, in shard order.
+        """
+        rows = []
+        for shard in shards:
+            with open(os.path.join(self.output_dir, shard.name), 'r', newline='', encoding=encoding) as file:
+                rows.extend(row for row in csv.reader(file, delimiter=delimiter) if row != self.header)
+        return rows
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_latin1_semicolon(self):
+        """
+        Test that a Latin-1 file with semicolons is split as bytes, keeping its encoding.
+        """
+        self.create_sample_csv('latin-1', ';')
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        assert (splitter.source_encoding, splitter.delimiter, splitter.transcoded) == ('cp1252', ';', False)
+
+        shards = splitter.split(key="Ville", sort_key="Ville")
+        assert len(shards) == 3
+        assert self.read_rows(shards, 'latin-1', ';') == sorted(self.rows, key=lambda row: row[1])
+
+        shutil.rmtree(self.output_dir)
+        shards = Splitter(self.sample_csv, self.output_dir).by_rows(100)
+        assert self.read_rows(shards, 'latin-1', ';') == self.rows
+
+    def test_utf8_bom(self):
+        """
+        Test that the BOM of a UTF-8 file does not end up in the first column name.
+        """
+        self.create_sample_csv('utf-8', ',', b"\xef\xbb\xbf")
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=100, dedup="Numéro", stats=True)
+
+        assert list(shards[0].stats) == self.header
+        assert self.read_rows(shards, 'utf-8-sig') == self.rows
+
+    def test_utf16_transcoded(self):
+        """
+        Test that a UTF-16 file with tabs is transcoded to UTF-8 while it is read.
+        """
+        self.create_sample_csv('utf-16', '\t')
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        assert (splitter.source_encoding, splitter.delimiter, splitter.transcoded) == ('utf-16', '\t', True)
+
+        shards = splitter.split(size=4000)
+        assert self.read_rows(shards, 'utf-8', '\t') == self.rows
+        assert all(os.path.getsize(os.path.join(self.output_dir, shard.name)) == shard.size <= 4000 for shard in shards)
+
+        shutil.rmtree(self.output_dir)
+        assert self.read_rows(Splitter(self.sample_csv, self.output_dir).by_rows(70), 'utf-8', '\t') == self.rows
+        with pytest.raises(ValueError, match="ASCII-compatible"):
+            splitter.plan(rows=100)
+        with pytest.raises(ValueError, match="ASCII-compatible"):
+            Splitter(self.sample_csv, self.output_dir, row_range=(10, 20))
+
+    def test_explicit_dialect(self):
+        """
+        Test that a given encoding and delimiter are not sniffed.
+        """
+        self.create_sample_csv('utf-16-le', '|')
+        splitter = Splitter(self.sample_csv, self.output_dir, encoding='utf-16-le', delimiter='|')
+
+        assert self.read_rows(splitter.split(rows=1000), 'utf-8', '|') == self.rows
+
+    def test_detection(self):
+        """
+        Test encoding detection, ASCII compatibility, delimiter sniffing and block transcoding.
+        """
+        assert detect_encoding("a,b\n".encode('utf-16-le')) == 'utf-16-le'
+        assert detect_encoding("a,b\n".encode('utf-16-be')) == 'utf-16-be'
+        assert detect_encoding(b"\xff\xfe\x00\x00a\x00\x00\x00") == 'utf-32'
+        assert detect_encoding("é".encode('utf-8')[:1]) == 'utf-8'
+        assert detect_encoding(b"caf\xe9 ") == 'cp1252'
+        assert detect_encoding(b"caf\xe9", complete=True) == 'cp1252'
+        assert detect_encoding(b"\x81\x8d") == 'latin-1'
+
+        assert all(ascii_compatible(name) for name in ('utf-8', 'latin-1', 'cp1252', 'iso-8859-15', 'ascii'))
+        assert not any(ascii_compatible(name) for name in ('utf-16', 'utf-32-le', 'shift_jis', 'cp500'))
+
+        assert sniff_delimiter('a;b;c\n1;"x,y";3\n4;5;6\n7;8') == ';'
+        assert sniff_delimiter('a,b\n"1\t2",3\n', complete=True) == ','
+        assert sniff_delimiter('single\ncolumn\n') == ','
+
+        text = "é,ü\n" * 1000
+        reader = TranscodingReader(io.BytesIO(text.encode('utf-16')), 'utf-16', block_size=7)
+        assert reader.read(5) + reader.read() == text.encode('utf-8')
@@ -0,0 +1,107 @@
+"""
+Tests for the JSON Lines and TSV output formats of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import gzip
+import json
+import tempfile
+import shutil
+
+from datashear.core import Splitter
+from datashear.formats import TsvFormat
+
+
+class TestSplitterFormats:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['ID', 'Group', 'Text']
+        self.rows = self.create_sample_csv(600)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file whose texts need escaping now and then.
+        """
+        texts = ['plain', 'say "hi"', 'tab\there', 'line\nbreak', 'back\\slash', 'café', 'ctrl\x01']
+        data = [[str(i), f'g{i // 100}', texts[i % len(texts)]] for i in range(rows)]
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            writer.writerows(data)
+        return data
+
+    def read_lines(self, shard, opener=open):
+        """
+        Return the lines of a shard.
+        """
+        with opener(os.path.join(self.output_dir, shard.name), 'rb') as file:
+            return file.read().decode('utf-8').splitlines(keepends=True)
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_jsonl_by_rows(self):
+        """
+        Test that every row becomes a JSON object keyed by the header, without a header line.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).by_rows(250, format="jsonl")
+
+        assert [shard.name for shard in shards] == ["sample_1.jsonl", "sample_2.jsonl", "sample_3.jsonl"]
+        items = [json.loads(line) for shard in shards for line in self.read_lines(shard)]
+        assert items == [dict(zip(self.header, row)) for row in self.rows]
+
+    def test_tsv_by_size_exact(self):
+        """
+        Test that TSV sizes are exact and values with tabs and line breaks read back.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).by_size(1000, format="tsv")
+        tsv = TsvFormat(self.header)
+
+        rows = []
+        for shard in shards:
+            path = os.path.join(self.output_dir, shard.name)
+            assert os.path.getsize(path) == shard.size <= 1000
+            lines = self.read_lines(shard)
+            assert lines[0] == "ID\tGroup\tText\n" and len(lines) == shard.rows + 1
+            rows.extend(tsv.parse(line.encode('utf-8')) for line in lines[1:])
+        assert rows == self.rows
+
+    def test_format_with_options(self):
+        """
+        Test formats together with key changes, statistics, sorting and compression.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).split(key="Group", format="tsv", stats=True)
+        assert [shard.rows for shard in shards] == [100] * 6
+        assert shards[2].stats['ID']['min'] == 200
+
+        shutil.rmtree(self.output_dir)
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=400, sort_key=("ID", lambda v: -int(v)),
+                                                                  format="jsonl", compression="gzip")
+        assert shards[0].name == "sample_1.jsonl.gz"
+        assert json.loads(self.read_lines(shards[0], gzip.open)[0])['ID'] == '599'
+
+    def test_format_invalid(self):
+        """
+        Test error handling for unknown formats.
+        """
+        with pytest.raises(ValueError, match="Unknown format"):
+            Splitter(self.sample_csv, self.output_dir).by_rows(100, format="xml")
@@ -0,0 +1,142 @@
+"""
+Tests for key range splits of sorted inputs, by binary search over the file.
+"""
+
+import pytest
+import os
+import csv
+import datetime
+import tempfile
+import shutil
+
+import datashear.core
+from datashear.core import Splitter
+
+
+class TestSplitterKeyRange:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.create_sample_csv(1000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, count):
+        """
+        Write ``count`` rows sorted by time, one every 7 minutes.
+        """
+        start = datetime.datetime(2024, 3, 1, 0, 0)
+        self.rows = [
+            [(start + datetime.timedelta(minutes=7 * i)).isoformat(), str(i), f'note\n"{i}"' if i % 9 == 0 else 'ok']
+            for i in range(count)
+        ]
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Time', 'ID', 'Note'])
+            writer.writerows(self.rows)
+
+    def read_rows(self, shard):
+        """
+        Return the data rows of a shard.
+        """
+        with open(os.path.join(self.output_dir, shard.name), newline='', encoding='utf-8') as file:
+            rows = list(csv.reader(file))
+        assert rows[0] == ['Time', 'ID', 'Note']
+        return rows[1:]
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_bounds(self):
+        """
+        Test that bounds give one shard per key interval, the last bound excluded.
+        """
+        bounds = ['2024-03-01T12:00', '2024-03-02', '2024-03-02T06:30']
+        shards = Splitter(self.sample_csv, self.output_dir).by_key_range("Time", bounds, buffer_size=512)
+
+        assert len(shards) == 2
+        for shard, (low, high) in zip(shards, zip(bounds, bounds[1:])):
+            expected = [row for row in self.rows if low <= row[0] < high]
+            assert self.read_rows(shard) == expected
+            assert shard.rows == len(expected)
+            assert shard.size == os.path.getsize(os.path.join(self.output_dir, shard.name))
+
+    def test_every_day(self):
+        """
+        Test that every="day" gives one shard per day, holding all the rows of that day.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).by_key_range("Time", every="day", buffer_size=1024)
+
+        days = sorted({row[0][:10] for row in self.rows})
+        assert len(shards) == len(days)
+        for shard, day in zip(shards, days):
+            assert self.read_rows(shard) == [row for row in self.rows if row[0].startswith(day)]
+        assert sum(shard.rows for shard in shards) == len(self.rows)
+
+    def test_numeric_every(self):
+        """
+        Test that a number gives one shard per interval of numeric keys.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).by_key_range("ID", every=250, buffer_size=1024)
+
+        assert [shard.rows for shard in shards] == [250] * 4
+        assert self.read_rows(shards[1])[0][1] == '250'
+
+    def test_reads_little_of_the_input(self, monkeypatch):
+        """
+        Test that a narrow key range is found without reading the whole input.
+        """
+        self.create_sample_csv(100000)
+        read = []
+
+        class CountingFile:
+            def __init__(self, file):
+                self.file = file
+
+            def read(self, size=-1):
+                data = self.file.read(size)
+                read.append(len(data))
+                return data
+
+            def __getattr__(self, name):
+                return getattr(self.file, name)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self.file.close()
+
+        monkeypatch.setattr(datashear.core, "open", lambda *args, **kwargs: CountingFile(open(*args, **kwargs)),
+                            raising=False)
+        shard, = Splitter(self.sample_csv, self.output_dir).by_key_range(
+            "Time", ['2024-04-03T10:00', '2024-04-03T11:00'], buffer_size=4096)
+
+        assert self.read_rows(shard) == [row for row in self.rows if '2024-04-03T10:00' <= row[0] < '2024-04-03T11:00']
+        assert sum(read) < os.path.getsize(self.sample_csv) / 10
+
+    def test_invalid_arguments(self):
+        """
+        Test that key range arguments are checked.
+        """
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        with pytest.raises(ValueError):
+            splitter.by_key_range("Time")
+        with pytest.raises(ValueError):
+            splitter.by_key_range("Time", ['2024-03-02', '2024-03-01'])
+        with pytest.raises(ValueError):
+            splitter.by_key_range("Unknown", every="day")
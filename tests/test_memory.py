@@ -0,0 +1,215 @@
+"""
+Tests for the memory budget, and the peak memory of each split mode as the input grows.
+
+The default sizes are small enough for every run; set ``DATASHEAR_MEMORY_BENCHMARK``
+to a list of input sizes (e.g. ``10M,100M,1G,10G``) to also measure the peak RSS of
+each mode in a fresh process over inputs of those sizes.
+"""
+
+import pytest
+import os
+import sys
+import json
+import tempfile
+import shutil
+import subprocess
+import tracemalloc
+
+import datashear.core
+from datashear.core import Splitter
+from datashear.memory import MemoryBudget
+from datashear.sink import ArchiveSink, FileSink, MemorySink, ObjectStoreSink, Sink
+from datashear.scanner import DEFAULT_BUFFER_SIZE
+
+MODES = {
+    'split': lambda splitter: splitter.by_size(1024 * 1024),
+    'sort': lambda splitter: splitter.split(size=1024 * 1024, sort_key=("ID", int)),
+    'dedup': lambda splitter: splitter.split(size=1024 * 1024, dedup=True),
+    'shuffle': lambda splitter: splitter.shuffle(size=1024 * 1024, seed=1),
+    'stats': lambda splitter: splitter.split(size=1024 * 1024, stats=True),
+}
+SIZES = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+# peak RSS of one mode over one input, run in a fresh process
+BENCHMARK = """
+import json, resource, sys
+from datashear.core import Splitter
+from tests.test_memory import MODES
+splitter = Splitter(sys.argv[1], sys.argv[2], memory=int(sys.argv[4]))
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+MODES[sys.argv[3]](splitter)
+print(json.dumps([before * 1024, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024]))
+"""
+
+
+class TestSplitterMemory:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.budget = MemoryBudget(4 * 1024 * 1024)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_input(self, size):
+        """
+        Write an input of about ``size`` bytes of unique rows, in blocks, some rows spanning lines.
+        """
+        path = os.path.join(self.test_dir, f"input_{size}.csv")
+        rows = [f"{{0}}{i:04d},name {i % 97},\"{'line' if i % 5 == 0 else 'comment'}\n{i}\"" + " filler" * 60 + "\n"
+                for i in range(1000)]
+        template = "".join(rows)
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            file.write("ID,Name,Comment\n")
+            block = 1
+            while file.tell() < size:
+                file.write(template.replace("{0}", str(block)))
+                block += 1
+        return path
+
+    def peak_memory(self, source, mode):
+        """
+        Return the peak of memory allocated by Python while splitting ``source`` with ``mode``.
+        """
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        splitter = Splitter(source, self.output_dir, memory=self.budget)
+        tracemalloc.start()
+        try:
+            MODES[mode](splitter)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_budget(self):
+        """
+        Test that one limit is shared between reads, writes, sink and working set.
+        """
+        budget = MemoryBudget(256 * 1024 * 1024)
+        parts = budget.to_dict()
+
+        assert budget.buffer_size == DEFAULT_BUFFER_SIZE
+        assert parts['read_memory'] + parts['writer_memory'] + parts['sink_memory'] + parts['work_memory'] == budget.limit
+        assert budget.work_memory > budget.limit // 2
+        assert budget.bound("split") == budget.limit - budget.work_memory
+        assert budget.bound("sort") == budget.limit
+        assert self.budget.buffer_size < DEFAULT_BUFFER_SIZE
+        with pytest.raises(ValueError):
+            MemoryBudget(1024 * 1024)
+        with pytest.raises(ValueError):
+            budget.bound("unknown")
+
+    def test_caps_call_settings(self, monkeypatch):
+        """
+        Test that the budget caps the buffer size and memory limit of calls, keeping smaller ones.
+        """
+        path = self.create_input(256 * 1024)
+        limits = []
+        external_sort = datashear.core.external_sort
+
+        def recorded(records, key, memory_limit, *args):
+            limits.append(memory_limit)
+            return external_sort(records, key, memory_limit, *args)
+
+        monkeypatch.setattr(datashear.core, "external_sort", recorded)
+        splitter = Splitter(path, self.output_dir, memory=self.budget)
+        splitter.split(size=64 * 1024, sort_key="ID")
+        splitter.split(size=64 * 1024, sort_key="ID", dedup=True, memory_limit=64 * 1024)
+
+        assert limits == [self.budget.work_memory, 32 * 1024]
+        assert splitter._buffer_size(DEFAULT_BUFFER_SIZE) == self.budget.buffer_size
+        assert splitter._buffer_size(4096) == 4096
+
+    def test_sink_bounds(self):
+        """
+        Test that sinks holding more than the sink share of the budget, or not saying what they hold, are refused.
+        """
+        path = self.create_input(64 * 1024)
+        store = ObjectStoreSink("http://127.0.0.1:9", "bucket", part_size=128 * 1024, max_workers=2)
+        with ArchiveSink(os.path.join(self.test_dir, "shards.tar"), spool_size=64 * 1024) as sink:
+            Splitter(path, sink=sink, memory=self.budget).by_size(16 * 1024)
+
+        assert store.memory_bound == 6 * 128 * 1024
+        Splitter(path, sink=store, memory=self.budget)
+        assert FileSink(self.output_dir).memory_bound == 0
+        Splitter(path, sink=FileSink(self.output_dir), memory=self.budget)
+        with pytest.raises(ValueError):
+            Splitter(path, sink=MemorySink(), memory=self.budget)
+        # a sink that does not say what it holds may hold anything
+        with pytest.raises(ValueError):
+            Splitter(path, sink=Sink(), memory=self.budget)
+        with pytest.raises(ValueError):
+            Splitter(path, sink=ArchiveSink(os.path.join(self.test_dir, "big.tar")), memory=self.budget)
+        store.close()
+
+    @pytest.mark.parametrize("mode", list(MODES))
+    def test_peak_memory_is_flat(self, mode):
+        """
+        Test that the peak memory of a mode stays within its bound and does not grow with the input.
+        """
+        small = self.peak_memory(self.create_input(3 * 1024 * 1024), mode)
+        large = self.peak_memory(self.create_input(9 * 1024 * 1024), mode)
+        bound = self.budget.bound("split" if mode == "stats" else mode)
+
+        assert small <= bound and large <= bound
+        assert large <= small * 1.25 + self.budget.buffer_size
+
+    @pytest.mark.parametrize("mode", ["dedup", "shuffle"])
+    def test_stream_peak_memory(self, mode):
+        """
+        Test that a pipe, of unknown size, is deduplicated or shuffled within the bound all the same.
+        """
+        path = self.create_input(9 * 1024 * 1024)
+        command = [sys.executable, "-c", "import shutil, sys; shutil.copyfileobj(open(sys.argv[1], 'rb'), sys.stdout.buffer)",
+                   path]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE)
+        try:
+            peak = self.peak_memory(process.stdout, mode)
+        finally:
+            process.wait()
+            process.stdout.close()
+
+        assert peak <= self.budget.bound(mode)
+        assert sum(os.path.getsize(os.path.join(self.output_dir, name)) for name in os.listdir(self.output_dir)) > 0
+
+    @pytest.mark.skipif(not os.environ.get("DATASHEAR_MEMORY_BENCHMARK"), reason="DATASHEAR_MEMORY_BENCHMARK not set")
+    @pytest.mark.parametrize("mode", list(MODES))
+    def test_peak_rss_benchmark(self, mode):
+        """
+        Test that the peak RSS of a mode stays flat over the benchmark input sizes.
+        """
+        sizes = [int(size[:-1]) * SIZES[size[-1]] if size[-1] in SIZES else int(size)
+                 for size in os.environ["DATASHEAR_MEMORY_BENCHMARK"].split(",")]
+        budget = MemoryBudget(64 * 1024 * 1024)
+        root = os.path.join(os.path.dirname(__file__), "..")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(root, "src"), root]))
+        peaks = []
+        for size in sizes:
+            path = self.create_input(size)
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            result = subprocess.run([sys.executable, "-c", BENCHMARK, path, self.output_dir, mode, str(budget.limit)],
+                                    env=env, capture_output=True, text=True, check=True)
+            before, after = json.loads(result.stdout.strip().splitlines()[-1])
+            peaks.append(after - before)
+            print(f"{mode} {size} bytes: peak RSS +{(after - before) / 1024 / 1024:.1f} MB")
+            os.remove(path)
+
+        bound = budget.bound("split" if mode == "stats" else mode)
+        assert all(peak <= bound for peak in peaks)
+        # working sets fill up until the input outgrows the budget, then stay flat
+        spilled = [peak for size, peak in zip(sizes, peaks) if size >= 4 * budget.limit]
+        if spilled: assert max(spilled) <= spilled[0] * 1.25 + budget.read_memory
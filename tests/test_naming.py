@@ -0,0 +1,169 @@
+"""
+Tests for templated shard names and the fan-out of shards into nested directories.
+"""
+
+import pytest
+import os
+import csv
+import tempfile
+import shutil
+import threading
+import time
+from concurrent import futures
+
+from datashear import naming
+from datashear.core import Splitter
+from datashear.naming import ShardNamer
+from datashear.sink import FileSink
+from datashear.util import Util
+
+
+class TestSplitterNaming:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['ID', 'Name'])
+            for i in range(250):
+                writer.writerow([i, f'name {i}'])
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def list_files(self):
+        """
+        Return the paths of every file under the output directory, relative to it.
+        """
+        paths = []
+        for root, _, files in os.walk(self.output_dir):
+            paths.extend(os.path.relpath(os.path.join(root, name), self.output_dir) for name in files)
+        return sorted(path.replace(os.sep, "/") for path in paths)
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    @pytest.mark.parametrize("prefix, base, sufix", [("", "", ""), ("pre", "", "suf"), ("", "part", ""),
+                                                     ("pre", "part", "suf")])
+    def test_default_names(self, prefix, base, sufix):
+        """
+        Test that default names are the ones of Util.get_output_filename.
+        """
+        namer = ShardNamer("data/input.csv", prefix, base, sufix)
+
+        for index, extension in [(1, ""), (42, ""), (7, ".jsonl"), ("stats", ".json"), ("train", "")]:
+            expected = Util.get_output_filename("data/input.csv", index, prefix, base, sufix, extension)
+            assert namer.name(index, extension) == expected
+
+    def test_template(self):
+        """
+        Test that a template gives zero-padded names, and that invalid templates are refused at once.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir, output_prefix="day",
+                          name_template="{prefix}-{base}-{index:05d}{ext}").by_rows(100)
+
+        assert [shard.name for shard in shards] == ["day-sample-00001.csv", "day-sample-00002.csv", "day-sample-00003.csv"]
+        assert self.list_files() == [shard.name for shard in shards]
+        with pytest.raises(KeyError):
+            ShardNamer("input.csv", template="{unknown}_{index}{ext}")
+
+    def test_template_named_outputs(self):
+        """
+        Test that named outputs keep the default layout when a template names the shards.
+        """
+        namer = ShardNamer("data/input.csv", "pre", "", "suf", template="{base}-{index:06d}{ext}")
+
+        assert namer.name(12) == "input-000012.csv"
+        for index, extension in [("stats", ".json"), ("manifest", ".json"), ("rejects", ""), ("train", ""),
+                                 ("sample", "")]:
+            expected = Util.get_output_filename("data/input.csv", index, "pre", "", "suf", extension)
+            assert namer.name(index, extension) == expected
+
+    def test_template_with_named_outputs(self):
+        """
+        Test that splits writing stats and subsets work with an index format in the template.
+        """
+        template = "{base}-{index:06d}{ext}"
+        splitter = Splitter(self.sample_csv, self.output_dir, name_template=template)
+        shards = splitter.by_rows(100, stats=True)
+        subsets = splitter.random_split({"train": 0.5, "test": 0.5}, seed=1)
+
+        assert [shard.name for shard in shards] == ["sample-000001.csv", "sample-000002.csv", "sample-000003.csv"]
+        assert [shard.name for shard in subsets] == ["sample_train.csv", "sample_test.csv"]
+        assert "sample_stats.json" in self.list_files()
+
+    @pytest.mark.parametrize("durable", [False, True])
+    def test_fan_out(self, durable):
+        """
+        Test that shards fan out into directories of at most fan_out entries, other outputs staying at the top.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir, fan_out=4, fan_out_depth=2,
+                          durable=durable).by_rows(10, stats=True)
+
+        assert len(shards) == 25
+        assert shards[0].name == "0/0/sample_1.csv"
+        assert shards[4].name == "0/1/sample_5.csv"
+        assert shards[24].name == "1/2/sample_25.csv"
+        assert self.list_files() == sorted([shard.name for shard in shards] + ["sample_stats.json"])
+        for root, directories, files in os.walk(self.output_dir):
+            if root != self.output_dir: assert len(directories) + len(files) <= 4
+
+    def test_fan_out_threads(self):
+        """
+        Test that shards named from several threads at once get the directories of their own index.
+        """
+        namer = ShardNamer("d.csv", fan_out=3, depth=4)
+        expected = {index: ShardNamer("d.csv", fan_out=3, depth=4).name(index) for index in range(1, 500)}
+
+        def switch(frame, event, arg):
+            # hands the GIL over at every line of the namer, so that threads interleave inside it
+            if frame.f_code.co_filename != naming.__file__: return None
+            time.sleep(0)
+            return switch
+
+        def name_all(start):
+            return [(index, namer.name(index)) for index in range(start, 500, 8)]
+
+        threading.settrace(switch)
+        try:
+            with futures.ThreadPoolExecutor(8) as executor:
+                names = [name for names in executor.map(name_all, range(1, 9)) for name in names]
+        finally:
+            threading.settrace(None)
+        assert [name for _, name in names] == [expected[index] for index, _ in names]
+
+    def test_directories_created_once(self, monkeypatch):
+        """
+        Test that each directory is created with its first shard, and only then.
+        """
+        created = []
+        makedirs = os.makedirs
+        sink = FileSink(self.output_dir)
+        monkeypatch.setattr(os, "makedirs", lambda path, *args, **kwargs: (created.append(path),
+                                                                            makedirs(path, *args, **kwargs)))
+        Splitter(self.sample_csv, sink=sink, fan_out=10).by_rows(1)
+
+        assert len(self.list_files()) == 250
+        assert [os.path.relpath(path, self.output_dir) for path in created] == [f"{i:d}" for i in range(26)]
+
+    def test_invalid_fan_out(self):
+        """
+        Test that fan out arguments are checked.
+        """
+        with pytest.raises(ValueError):
+            Splitter(self.sample_csv, self.output_dir, fan_out=1)
+        with pytest.raises(ValueError):
+            Splitter(self.sample_csv, self.output_dir, fan_out=10, fan_out_depth=0)
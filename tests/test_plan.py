@@ -0,0 +1,169 @@
+"""
+Tests for the plan and execute methods of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import tempfile
+import shutil
+
+from datashear.core import Splitter
+from datashear.index import RowIndex
+from datashear.plan import SplitPlan
+
+
+class TestSplitterPlan:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.create_sample_csv(1000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file, with some multi-line quoted fields.
+        """
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['ID', 'Name', 'Notes'])
+            for i in range(1, rows + 1):
+                writer.writerow([i, f'Person_{i}', 'line\n"quoted"' if i % 7 == 0 else 'n' * (i % 13)])
+
+    def read_dir(self, path):
+        """
+        Return the content of every file in a directory, by name.
+        """
+        files = {}
+        for name in os.listdir(path):
+            with open(os.path.join(path, name), 'rb') as file:
+                files[name] = file.read()
+        return files
+
+    def raw_split(self, **kwargs):
+        """
+        Split with the raw engine and return the produced files.
+        """
+        output_dir = os.path.join(self.test_dir, "raw")
+        splitter = Splitter(self.sample_csv, output_dir)
+        if 'rows' in kwargs: splitter.by_rows(kwargs['rows'], engine="raw")
+        else: splitter.by_size(kwargs['size'], engine="raw")
+        return self.read_dir(output_dir)
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_plan_by_rows(self):
+        """
+        Test that a plan by rows matches the shards of a raw split.
+        """
+        plan = Splitter(self.sample_csv, self.test_dir).plan(rows=300)
+        expected = self.raw_split(rows=300)
+
+        assert plan.exact
+        assert [shard.rows for shard in plan.shards] == [300, 300, 300, 100]
+        assert [plan.shard_size(shard) for shard in plan.shards] == [len(expected[f"sample_{i}.csv"]) for i in range(1, 5)]
+        assert plan.estimated_seconds > 0
+
+    def test_plan_writes_nothing(self):
+        """
+        Test that planning does not create any output file.
+        """
+        output_dir = os.path.join(self.test_dir, "output")
+        Splitter(self.sample_csv, output_dir).plan(size=1000)
+        assert os.listdir(output_dir) == []
+
+    def test_execute_plan_by_size(self):
+        """
+        Test that executing a plan writes the same shards as a raw split.
+        """
+        output_dir = os.path.join(self.test_dir, "output")
+        splitter = Splitter(self.sample_csv, output_dir)
+        shards = splitter.execute(splitter.plan(size=2048))
+
+        assert self.read_dir(output_dir) == self.raw_split(size=2048)
+        expected = Splitter(self.sample_csv, os.path.join(self.test_dir, "expected")).split(size=2048)
+        assert [shard.to_dict() for shard in shards] == [shard.to_dict() for shard in expected]
+
+    def test_execute_plan_across_workers(self):
+        """
+        Test that a saved plan can be executed in parts by separate workers.
+        """
+        output_dir = os.path.join(self.test_dir, "output")
+        plan_path = os.path.join(self.test_dir, "plan.json")
+        Splitter(self.sample_csv, output_dir).plan(rows=70, repeat_header=False).save(plan_path)
+
+        plan = SplitPlan.load(plan_path)
+        parts = plan.partition(3)
+        assert sorted(index for part in parts for index in part) == list(range(1, 16))
+        for part in parts:
+            shards = Splitter(self.sample_csv, output_dir).execute(plan, shards=part, workers=2)
+            assert [shard.index for shard in shards] == [shard.index for shard in plan.shards if shard.index in part]
+            assert [shard.rows for shard in shards] == [plan.shards[index - 1].rows for index in sorted(part)]
+
+        rows = []
+        for i in range(1, 16):
+            with open(os.path.join(output_dir, f"sample_{i}.csv"), 'r', newline='', encoding='utf-8') as file:
+                rows.extend(csv.reader(file))
+        assert len(rows) == 1001
+        assert [row[0] for row in rows[1:]] == [str(i) for i in range(1, 1001)]
+
+    def test_plan_from_index(self):
+        """
+        Test that a plan read from a row index matches the scanned plan.
+        """
+        index_path = os.path.join(self.test_dir, "sample.idx.json")
+        RowIndex.build(self.sample_csv, step=64).save(index_path)
+        splitter = Splitter(self.sample_csv, self.test_dir)
+
+        from_index = splitter.plan(rows=100, index=index_path)
+        assert from_index.shards == splitter.plan(rows=100).shards
+
+    def test_plan_stale_index(self):
+        """
+        Test that an index of another version of the file is rejected.
+        """
+        index = RowIndex.build(self.sample_csv, step=64)
+        self.create_sample_csv(10)
+
+        with pytest.raises(ValueError, match="Index does not match"):
+            Splitter(self.sample_csv, self.test_dir).plan(rows=100, index=index)
+
+    def test_plan_estimate(self):
+        """
+        Test that a sampled plan is close to the exact one and cannot be executed.
+        """
+        splitter = Splitter(self.sample_csv, self.test_dir)
+        exact = splitter.plan(size=2048)
+        estimate = splitter.plan(size=2048, estimate=True)
+
+        assert not estimate.exact
+        assert abs(estimate.rows - 1000) < 150
+        assert abs(len(estimate.shards) - len(exact.shards)) <= max(2, len(exact.shards) // 5)
+        with pytest.raises(ValueError, match="Only exact plans"):
+            splitter.execute(estimate)
+
+    def test_plan_invalid_parameters(self):
+        """
+        Test error handling for invalid parameters.
+        """
+        splitter = Splitter(self.sample_csv, self.test_dir)
+
+        with pytest.raises(ValueError, match="rows or size must be given"):
+            splitter.plan()
+        with pytest.raises(ValueError, match="rows per file must be greater than 0"):
+            splitter.plan(rows=0)
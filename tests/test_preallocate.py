@@ -0,0 +1,141 @@
+"""
+Tests for preallocated shard files and page cache advice on the input.
+"""
+
+import pytest
+import os
+import csv
+import tempfile
+import shutil
+
+from datashear.core import Splitter
+from datashear.sink import FileSink, MemorySink
+from datashear.source import AdvisedReader
+
+
+class TestSplitterPreallocate:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['ID', 'Name', 'Comment'])
+            for i in range(2000):
+                writer.writerow([i, f'name {i}', f'line\n{i}' if i % 5 == 0 else f'comment {i}'])
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def read_outputs(self, directory):
+        """
+        Return the bytes of every file of a directory, by name.
+        """
+        outputs = {}
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name), 'rb') as file:
+                outputs[name] = file.read()
+        return outputs
+
+    def record_fallocate(self, monkeypatch):
+        """
+        Record the sizes files are preallocated to.
+        """
+        sizes = []
+        fallocate = getattr(os, 'posix_fallocate', None)
+
+        def recorded(fd, offset, length):
+            sizes.append(length)
+            if fallocate is not None: fallocate(fd, offset, length)
+
+        monkeypatch.setattr(os, 'posix_fallocate', recorded, raising=False)
+        return sizes
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    @pytest.mark.parametrize("durable", [False, True])
+    def test_preallocated_split(self, monkeypatch, durable):
+        """
+        Test that preallocated shards are reserved at the size limit and cut to their final size.
+        """
+        expected = os.path.join(self.test_dir, "expected")
+        Splitter(self.sample_csv, expected).by_size(8192)
+        sizes = self.record_fallocate(monkeypatch)
+        shards = Splitter(self.sample_csv, self.output_dir, durable=durable).by_size(8192, preallocate=True)
+
+        assert sizes == [8192] * len(shards)
+        assert self.read_outputs(self.output_dir) == self.read_outputs(expected)
+        for shard in shards:
+            assert os.path.getsize(os.path.join(self.output_dir, shard.name)) == shard.size
+
+    def test_preallocated_execute(self, monkeypatch):
+        """
+        Test that executing a plan preallocates each shard to its exact size.
+        """
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        plan = splitter.plan(size=10000)
+        sizes = self.record_fallocate(monkeypatch)
+        splitter.execute(plan, preallocate=True)
+
+        assert sizes == [plan.shard_size(shard) for shard in plan.shards]
+        for shard in plan.shards:
+            path = os.path.join(self.output_dir, splitter._output_filename(shard.index))
+            assert os.path.getsize(path) == plan.shard_size(shard)
+
+    def test_hint_ignored_by_other_sinks(self):
+        """
+        Test that sinks that cannot preallocate ignore the expected size.
+        """
+        sink = MemorySink()
+        shards = Splitter(self.sample_csv, sink=sink).by_size(8192, preallocate=True)
+
+        assert [len(sink.files[shard.name]) for shard in shards] == [shard.size for shard in shards]
+
+    def test_failed_preallocation(self, monkeypatch):
+        """
+        Test that a file system refusing preallocation still gets the shard written.
+        """
+        def refuse(fd, offset, length):
+            raise OSError(95, "Operation not supported")
+
+        monkeypatch.setattr(os, 'posix_fallocate', refuse, raising=False)
+        with FileSink(self.output_dir).open("shard.csv", 4096) as file:
+            file.write(b"a,b\n")
+
+        assert self.read_outputs(self.output_dir) == {"shard.csv": b"a,b\n"}
+
+    def test_fadvise(self, monkeypatch):
+        """
+        Test that the input is advised as sequential and its pages dropped once read.
+        """
+        calls = []
+        monkeypatch.setattr(os, 'posix_fadvise', lambda fd, offset, length, advice: calls.append((offset, length, advice)),
+                            raising=False)
+        monkeypatch.setattr(os, 'POSIX_FADV_SEQUENTIAL', 2, raising=False)
+        monkeypatch.setattr(os, 'POSIX_FADV_DONTNEED', 4, raising=False)
+        expected = os.path.join(self.test_dir, "expected")
+        Splitter(self.sample_csv, expected).by_rows(500, engine="raw")
+        Splitter(self.sample_csv, self.output_dir, fadvise=True).by_rows(500, engine="raw")
+
+        assert self.read_outputs(self.output_dir) == self.read_outputs(expected)
+        assert (0, 0, 2) in calls
+        dropped = sorted((offset, length) for offset, length, advice in calls if advice == 4)
+        assert sum(length for _, length in dropped) >= os.path.getsize(self.sample_csv)
+
+        calls.clear()
+        with AdvisedReader(self.sample_csv, drop_size=1000) as file:
+            while file.read(512): pass
+        assert len([call for call in calls if call[2] == 4]) > os.path.getsize(self.sample_csv) // 1024
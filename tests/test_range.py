@@ -0,0 +1,145 @@
+"""
+Tests for the row_range and byte_range options of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import tempfile
+import shutil
+
+from datashear.core import Splitter
+from datashear.index import RowIndex, row_offset
+
+
+class CountingFile:
+    """
+    Binary file wrapper counting the bytes read.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.read_bytes = 0
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.read_bytes += len(data)
+        return data
+
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+
+class TestSplitterRange:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['ID', 'Name', 'Notes']
+        self.create_sample_csv(2000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file, with some multi-line quoted fields.
+        """
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            for i in range(rows):
+                writer.writerow([i, f'Person_{i}', 'a\nb,"c"\nd' if i % 5 == 0 else 'plain'])
+
+    def read_ids(self):
+        """
+        Return the ids of the data rows of every output file, in shard order.
+        """
+        ids = []
+        names = sorted(os.listdir(self.output_dir), key=lambda name: int(name.rsplit('_', 1)[1][:-4]))
+        for name in names:
+            with open(os.path.join(self.output_dir, name), 'r', newline='', encoding='utf-8') as file:
+                ids.extend(int(row[0]) for row in csv.reader(file) if row != self.header)
+        shutil.rmtree(self.output_dir)
+        return ids
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_row_range_both_engines(self):
+        """
+        Test that only the rows of the range are split, with either engine.
+        """
+        for engine in ("csv", "raw"):
+            Splitter(self.sample_csv, self.output_dir, row_range=(1234, 1500)).by_rows(100, engine=engine)
+            assert self.read_ids() == list(range(1234, 1500))
+
+    def test_row_range_to_end(self):
+        """
+        Test an open-ended row range on a split by size.
+        """
+        Splitter(self.sample_csv, self.output_dir, row_range=(1990, None)).by_size(200, engine="raw")
+        assert self.read_ids() == list(range(1990, 2000))
+
+    def test_row_range_with_index(self):
+        """
+        Test that a saved index gives the same window.
+        """
+        index_path = os.path.join(self.test_dir, "sample.idx.json")
+        RowIndex.build(self.sample_csv, step=128).save(index_path)
+
+        splitter = Splitter(self.sample_csv, self.output_dir, row_range=(777, 1111), index=index_path)
+        splitter.by_rows(50)
+        assert self.read_ids() == list(range(777, 1111))
+
+        indexed = splitter.plan(rows=50)
+        scanned = Splitter(self.sample_csv, self.output_dir, row_range=(777, 1111)).plan(rows=50)
+        assert indexed.shards == scanned.shards
+
+    def test_row_offset_skips_ahead(self):
+        """
+        Test that locating a row with an index only reads near that row.
+        """
+        index = RowIndex.build(self.sample_csv, step=100)
+        with open(self.sample_csv, 'rb') as file:
+            counting = CountingFile(file)
+            offset = row_offset(counting, 1950, index.header_size, index, buffer_size=4096)
+            assert counting.read_bytes <= 2 * 4096
+
+            file.seek(offset)
+            assert file.read(5) == b'1950,'
+
+    def test_byte_ranges_cover_file(self):
+        """
+        Test that adjacent byte ranges, cut anywhere, hold every row exactly once.
+        """
+        size = os.path.getsize(self.sample_csv)
+        cuts = [0, size // 3 + 1, size // 2 + 7, size - 100, size]
+        ids = []
+        for start, stop in zip(cuts, cuts[1:]):
+            Splitter(self.sample_csv, self.output_dir, byte_range=(start, stop)).by_rows(400)
+            ids.extend(self.read_ids())
+        assert ids == list(range(2000))
+
+    def test_invalid_ranges(self):
+        """
+        Test error handling for invalid ranges.
+        """
+        with pytest.raises(ValueError, match="row range stop"):
+            Splitter(self.sample_csv, self.output_dir, row_range=(10, 5))
+        with pytest.raises(ValueError, match="byte range start"):
+            Splitter(self.sample_csv, self.output_dir, byte_range=(-1, 5))
+        with pytest.raises(ValueError, match="exclusive"):
+            Splitter(self.sample_csv, self.output_dir, row_range=(0, 5), byte_range=(0, 5))
@@ -0,0 +1,155 @@
+"""
+Tests for the raw engine and the byte-level record scanner.
+"""
+
+import pytest
+import os
+import io
+import csv
+import tempfile
+import tracemalloc
+import shutil
+
+from datashear.core import Splitter
+from datashear.scanner import RecordScanner
+
+
+class TestRawEngine:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['ID', 'Name', 'Payload']
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_csv(self, rows):
+        """
+        Create a CSV file with the given data rows.
+        """
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            writer.writerows(rows)
+
+    def read_outputs(self):
+        """
+        Return the parsed rows of every output file, in shard order.
+        """
+        names = sorted(os.listdir(self.output_dir), key=lambda name: int(name.rsplit('_', 1)[1][:-4]))
+        shards = []
+        for name in names:
+            with open(os.path.join(self.output_dir, name), 'r', newline='', encoding='utf-8') as file:
+                shards.append(list(csv.reader(file)))
+        return shards
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_scanner_quoted_records(self):
+        """
+        Test that line feeds and escaped quotes inside quoted fields are kept.
+        """
+        data = b'a,b\n1,"x\ny"\n2,"say ""hi""\n"\n3,z'
+        for buffer_size in (1, 3, 1024):
+            records = list(RecordScanner(io.BytesIO(data), buffer_size).records())
+            assert records == [b'a,b\n', b'1,"x\ny"\n', b'2,"say ""hi""\n"\n', b'3,z']
+
+    def test_scanner_pieces_bounded(self):
+        """
+        Test that a long record is handed out in bounded pieces.
+        """
+        data = b'h\n"' + b'x\n' * 1000 + b'"\nlast\n'
+        pieces = list(RecordScanner(io.BytesIO(data), 64).pieces())
+
+        assert max(len(piece) for piece, _ in pieces) <= 128
+        assert b"".join(piece for piece, _ in pieces) == data
+        assert [piece for piece, end in pieces if end][-1] == b'last\n'
+        assert sum(1 for _, end in pieces if end) == 3
+
+    def test_raw_matches_csv_engine(self):
+        """
+        Test that the raw engine produces the same shards as the csv engine.
+        """
+        self.create_csv([[i, f'Person_{i}', f'x,"{i}"\n'] for i in range(1, 21)])
+
+        Splitter(self.sample_csv, self.output_dir).by_rows(6)
+        expected = self.read_outputs()
+        shutil.rmtree(self.output_dir)
+
+        Splitter(self.sample_csv, self.output_dir).by_rows(6, engine="raw")
+        assert self.read_outputs() == expected
+
+    def test_raw_by_size_exact(self):
+        """
+        Test that raw shards never exceed the requested size.
+        """
+        self.create_csv([[i, f'Person_{i}', 'p' * (i % 7)] for i in range(1, 101)])
+
+        Splitter(self.sample_csv, self.output_dir).by_size(200, engine="raw")
+
+        for name in os.listdir(self.output_dir):
+            assert os.path.getsize(os.path.join(self.output_dir, name)) <= 200
+        rows = [row for shard in self.read_outputs() for row in shard if row != self.header]
+        assert len(rows) == 100
+
+    @pytest.mark.parametrize("size", [3000, 10000])
+    def test_raw_long_record_after_rows(self, size):
+        """
+        Test that a record longer than the buffer goes in the shard of the rows before it only when it fits.
+        """
+        self.create_csv([[i, f'Person_{i}', 'x' * 5000 if i == 5 else 'p'] for i in range(1, 11)])
+
+        shards = Splitter(self.sample_csv, self.output_dir).split(size=size, buffer_size=1024)
+
+        for shard in shards:
+            assert os.path.getsize(os.path.join(self.output_dir, shard.name)) == shard.size
+            if shard.rows > 1: assert shard.size <= size
+        rows = [row for shard in self.read_outputs() for row in shard if row != self.header]
+        assert [row[0] for row in rows] == [str(i) for i in range(1, 11)]
+        assert len(shards) == (3 if size == 3000 else 1)
+
+    def test_raw_huge_field_bounded_memory(self):
+        """
+        Test that a field far larger than the buffer goes through with bounded memory.
+        """
+        huge = ('{"k": "v\n' + 'a' * 4096 + '"}') * 1000  # about 4 MB with newlines and quotes
+        self.create_csv([[1, 'small', 'x'], [2, 'huge', huge], [3, 'small', 'y']])
+
+        splitter = Splitter(self.sample_csv, self.output_dir)
+        tracemalloc.start()
+        try:
+            splitter.by_size(1024, engine="raw", buffer_size=64 * 1024)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert peak < 1024 * 1024
+        limit = csv.field_size_limit(len(huge) + 1)
+        try:
+            shards = self.read_outputs()
+        finally:
+            csv.field_size_limit(limit)
+        assert [row[0] for shard in shards for row in shard[1:]] == ['1', '2', '3']
+        assert shards[1][1][2] == huge
+
+    def test_unknown_engine(self):
+        """
+        Test that an unknown engine is rejected.
+        """
+        self.create_csv([[1, 'a', 'b']])
+        with pytest.raises(ValueError, match="Unknown engine"):
+            Splitter(self.sample_csv, self.output_dir).by_rows(1, engine="fast")
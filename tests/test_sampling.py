@@ -0,0 +1,139 @@
+"""
+Tests for the random_split and sample methods of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import tempfile
+import shutil
+from collections import Counter
+
+from datashear.core import Splitter
+from datashear.sampling import reservoir_sample
+
+
+class TestSplitterSampling:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.create_sample_csv(5000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file with quoted multi-line fields.
+        """
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['ID', 'Text'])
+            for i in range(rows):
+                writer.writerow([i, f'line {i}\n"quoted"' if i % 3 == 0 else f'plain {i}'])
+
+    def read_lines(self, path):
+        """
+        Return the content of a file as raw bytes.
+        """
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def read_ids(self, name):
+        """
+        Return the ids of the data rows of an output file.
+        """
+        with open(os.path.join(self.output_dir, name), 'r', newline='', encoding='utf-8') as file:
+            return [int(row[0]) for row in list(csv.reader(file))[1:]]
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_random_split_fractions(self):
+        """
+        Test that every row goes to exactly one subset, in about the given proportions.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).random_split(
+            {"train": 0.8, "test": 0.1, "validation": 0.1}, seed=42
+        )
+
+        assert [shard.name for shard in shards] == ["sample_train.csv", "sample_test.csv", "sample_validation.csv"]
+        ids = {shard.name: self.read_ids(shard.name) for shard in shards}
+        assert sorted(sum(ids.values(), [])) == list(range(5000))
+        assert abs(len(ids["sample_train.csv"]) - 4000) < 150
+        assert abs(len(ids["sample_test.csv"]) - 500) < 80
+        for shard in shards:
+            assert shard.rows == len(ids[shard.name])
+            assert shard.size == os.path.getsize(os.path.join(self.output_dir, shard.name))
+
+    def test_random_split_reproducible(self):
+        """
+        Test that the same seed gives the same subsets.
+        """
+        first = os.path.join(self.test_dir, "first")
+        second = os.path.join(self.test_dir, "second")
+        Splitter(self.sample_csv, first).random_split([0.5, 0.5], seed=7)
+        Splitter(self.sample_csv, second).random_split([0.5, 0.5], seed=7)
+
+        for name in ("sample_1.csv", "sample_2.csv"):
+            assert self.read_lines(os.path.join(first, name)) == self.read_lines(os.path.join(second, name))
+
+    def test_random_split_partial(self):
+        """
+        Test that fractions adding up to less than 1 drop the other rows.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).random_split({"small": 0.05}, seed=1)
+        assert 150 < shards[0].rows < 350
+
+    def test_sample_exact_size(self):
+        """
+        Test that a sample holds exactly k raw rows, in input order.
+        """
+        shard = Splitter(self.sample_csv, self.output_dir).sample(100, seed=3)
+        ids = self.read_ids(shard.name)
+
+        assert shard.rows == 100
+        assert ids == sorted(set(ids))
+        source = self.read_lines(self.sample_csv)
+        output = self.read_lines(os.path.join(self.output_dir, shard.name))
+        for record in output.split(b'\r\n')[1:-1]:
+            assert record + b'\r\n' in source
+
+        again = Splitter(self.sample_csv, os.path.join(self.test_dir, "again")).sample(100, seed=3)
+        assert self.read_lines(os.path.join(self.test_dir, "again", again.name)) == output
+
+    def test_reservoir_uniform(self):
+        """
+        Test that every record is about as likely to be sampled.
+        """
+        counts = Counter()
+        for seed in range(4000):
+            counts.update(reservoir_sample(range(20), 5, seed))
+
+        assert sorted(counts) == list(range(20))
+        for count in counts.values():
+            assert abs(count - 1000) < 150
+
+    def test_sampling_invalid_parameters(self):
+        """
+        Test error handling for invalid parameters.
+        """
+        splitter = Splitter(self.sample_csv, self.output_dir)
+
+        with pytest.raises(ValueError, match="more than 1"):
+            splitter.random_split([0.8, 0.3])
+        with pytest.raises(ValueError, match="sample size must be greater than 0"):
+            splitter.sample(0)
@@ -0,0 +1,126 @@
+"""
+Tests for the shuffle method of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import tempfile
+import tracemalloc
+import shutil
+
+from datashear.core import Splitter
+
+
+class TestSplitterShuffle:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.temp_dir = os.path.join(self.test_dir, "tmp")
+        os.makedirs(self.temp_dir)
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.create_sample_csv(5000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file, without a line terminator after the last row.
+        """
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['ID', 'Text'])
+            for i in range(rows):
+                writer.writerow([i, f'multi\nline {i}' if i % 4 == 0 else f'row {i}'])
+        with open(self.sample_csv, 'rb+') as file:
+            file.truncate(os.path.getsize(self.sample_csv) - 2)
+
+    def read_ids(self, shards, output_dir=None):
+        """
+        Return the ids of the data rows of every shard, in shard order.
+        """
+        ids = []
+        for shard in shards:
+            with open(os.path.join(output_dir or self.output_dir, shard.name), 'r', newline='', encoding='utf-8') as file:
+                ids.append([int(row[0]) for row in list(csv.reader(file))[1:]])
+        return ids
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_shuffle_by_rows(self):
+        """
+        Test that shards hold every row once, globally shuffled.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).shuffle(rows=1000, seed=1, memory_limit=32 * 1024,
+                                                                   temp_dir=self.temp_dir)
+        ids = self.read_ids(shards)
+
+        assert [len(shard) for shard in ids] == [1000] * 5
+        flat = sum(ids, [])
+        assert sorted(flat) == list(range(5000))
+        assert flat != sorted(flat)
+        # rows of the first shard come from the whole file, not one slice of it
+        assert min(ids[0]) < 500 and max(ids[0]) > 4500
+        assert os.listdir(self.temp_dir) == []
+
+    def test_shuffle_by_size(self):
+        """
+        Test that shuffled shards respect the size limit.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).shuffle(size=4096, seed=2, memory_limit=64 * 1024)
+
+        for shard in shards:
+            assert os.path.getsize(os.path.join(self.output_dir, shard.name)) == shard.size <= 4096
+        assert sorted(sum(self.read_ids(shards), [])) == list(range(5000))
+
+    def test_shuffle_reproducible(self):
+        """
+        Test that the same seed gives the same shards.
+        """
+        other_dir = os.path.join(self.test_dir, "other")
+        first = Splitter(self.sample_csv, self.output_dir).shuffle(rows=2500, seed=9, memory_limit=16 * 1024)
+        second = Splitter(self.sample_csv, other_dir).shuffle(rows=2500, seed=9, memory_limit=16 * 1024)
+
+        assert self.read_ids(first) == self.read_ids(second, other_dir)
+
+    def test_shuffle_memory_bounded(self):
+        """
+        Test that the working set follows the memory limit, not the input size.
+        """
+        self.create_sample_csv(50000)
+        splitter = Splitter(self.sample_csv, self.output_dir)
+
+        tracemalloc.start()
+        try:
+            splitter.shuffle(rows=10000, seed=3, memory_limit=128 * 1024, buffer_size=64 * 1024)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert peak < os.path.getsize(self.sample_csv) / 2
+        assert peak < 1024 * 1024
+
+    def test_shuffle_invalid_parameters(self):
+        """
+        Test error handling for invalid parameters.
+        """
+        splitter = Splitter(self.sample_csv, self.output_dir)
+
+        with pytest.raises(ValueError, match="rows or size must be given"):
+            splitter.shuffle()
+        with pytest.raises(ValueError, match="memory limit must be greater than 0"):
+            splitter.shuffle(rows=10, memory_limit=0)
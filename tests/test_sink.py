@@ -0,0 +1,345 @@
+"""
+Tests for the output sinks of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import tarfile
+import tempfile
+import threading
+import shutil
+import zipfile
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from datashear.core import Splitter
+from datashear.sink import ArchiveSink, FileSink, MemorySink, ObjectStoreSink, ObjectStoreError
+
+
+class StandInStore:
+    """
+    Minimal in-memory S3 stand-in: single PUT and multipart uploads.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.requests = []
+        self.fail_parts = False
+        self.upload_count = 0
+        self.lock = threading.Lock()
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def parse(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                with store.lock:
+                    store.requests.append((self.command, url.path, dict(self.headers)))
+                return url.path, parse_qs(url.query, keep_blank_values=True), body
+
+            def do_PUT(self):
+                path, query, body = self.parse()
+                if "uploadId" in query and store.fail_parts:
+                    self.reply(500, b"<Error><Code>InternalError</Code></Error>")
+                elif "uploadId" in query:
+                    with store.lock:
+                        store.uploads[query["uploadId"][0]][int(query["partNumber"][0])] = body
+                    self.reply(200, headers={"ETag": f'"{query["partNumber"][0]}"'})
+                else:
+                    with store.lock:
+                        store.objects[path] = body
+                    self.reply(200)
+
+            def do_POST(self):
+                path, query, body = self.parse()
+                if "uploads" in query:
+                    with store.lock:
+                        store.upload_count += 1
+                        upload_id = f"upload-{store.upload_count}"
+                        store.uploads[upload_id] = {}
+                    self.reply(200, f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId>"
+                                    f"</InitiateMultipartUploadResult>".encode())
+                else:
+                    with store.lock:
+                        parts = store.uploads.pop(query["uploadId"][0])
+                        store.objects[path] = b"".join(parts[n] for n in sorted(parts))
+                    self.reply(200, b"<CompleteMultipartUploadResult/>")
+
+            def do_DELETE(self):
+                path, query, body = self.parse()
+                with store.lock:
+                    store.uploads.pop(query["uploadId"][0], None)
+                self.reply(204)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestSinks:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['ID', 'Name', 'Age', 'City']
+        self.create_sample_csv()
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows=10):
+        """
+        Create a sample CSV file for testing.
+        """
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            for i in range(1, rows + 1):
+                writer.writerow([i, f'Person_{i}', 20 + (i % 50), f'City_{i % 5}'])
+
+    def reference_shards(self, nb):
+        """
+        Split to the local filesystem and return shard contents by name.
+        """
+        output_dir = os.path.join(self.test_dir, "reference")
+        Splitter(self.sample_csv, output_dir).by_rows(nb)
+        shards = {}
+        for name in os.listdir(output_dir):
+            with open(os.path.join(output_dir, name), 'rb') as file:
+                shards[name] = file.read()
+        return shards
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def read_outputs(self, output_dir):
+        """
+        Return shard contents by name from a directory.
+        """
+        shards = {}
+        for name in os.listdir(output_dir):
+            with open(os.path.join(output_dir, name), 'rb') as file:
+                shards[name] = file.read()
+        return shards
+
+    def test_durable_file_sink(self, monkeypatch):
+        """
+        Test that durable shards are synced in batches and published under their names.
+        """
+        synced = []
+        fsync = os.fsync
+        monkeypatch.setattr(os, "fdatasync", lambda fd: synced.append("data"))
+        monkeypatch.setattr(os, "fsync", lambda fd: synced.append("directory") or fsync(fd))
+
+        output_dir = os.path.join(self.test_dir, "durable")
+        sink = FileSink(output_dir, durable=True, batch_size=2)
+        Splitter(self.sample_csv, sink=sink).by_rows(2)
+
+        assert self.read_outputs(output_dir) == self.reference_shards(2)
+        assert synced == ["data", "data", "directory"] * 2 + ["data", "directory"]
+
+    def test_durable_file_sink_background(self):
+        """
+        Test that a background worker publishes the same shards.
+        """
+        output_dir = os.path.join(self.test_dir, "durable")
+        self.create_sample_csv(1000)
+        with FileSink(output_dir, durable=True, batch_size=3, background=True) as sink:
+            Splitter(self.sample_csv, sink=sink).by_rows(30)
+            assert self.read_outputs(output_dir) == self.reference_shards(30)
+        assert sink._worker is None
+
+    def test_durable_file_sink_failure(self):
+        """
+        Test that shards of a failed split are held back and removed.
+        """
+        output_dir = os.path.join(self.test_dir, "durable")
+        with open(self.sample_csv, 'a', newline='', encoding='utf-8') as file:
+            csv.writer(file).writerow([11, 'Person_11', 'unknown', 'City_1'])
+
+        with pytest.raises(ValueError, match="Not a number"):
+            Splitter(self.sample_csv, output_dir, durable=True).split(max_span=("Age", 100), rows=4)
+        assert os.listdir(output_dir) == []
+
+    def test_memory_sink(self):
+        """
+        Test that shards are kept in memory and nothing is written to disk.
+        """
+        sink = MemorySink()
+        Splitter(self.sample_csv, sink=sink).by_rows(3)
+
+        assert sink.files == self.reference_shards(3)
+        assert sorted(os.listdir(self.test_dir)) == ["reference", "sample.csv"]
+
+    def test_zip_archive_sink(self):
+        """
+        Test that all shards end up in a single zip archive.
+        """
+        archive = os.path.join(self.test_dir, "shards.zip")
+        with ArchiveSink(archive) as sink:
+            Splitter(self.sample_csv, sink=sink).by_rows(4)
+
+        with zipfile.ZipFile(archive) as file:
+            shards = {name: file.read(name) for name in file.namelist()}
+        assert shards == self.reference_shards(4)
+
+    def test_tar_archive_sink(self):
+        """
+        Test that all shards end up in a single compressed tar archive.
+        """
+        archive = os.path.join(self.test_dir, "shards.tar.gz")
+        with ArchiveSink(archive) as sink:
+            Splitter(self.sample_csv, sink=sink).by_size(100)
+
+        with tarfile.open(archive) as file:
+            names = file.getnames()
+            assert names == sorted(names, key=lambda name: int(name[7:-4]))
+            assert len(names) > 1
+
+    def test_zip_archive_sink_open_together(self):
+        """
+        Test that shards kept open together, as random subsets are, go in one zip archive.
+        """
+        archive = os.path.join(self.test_dir, "subsets.zip")
+        with ArchiveSink(archive) as sink:
+            shards = Splitter(self.sample_csv, sink=sink).random_split({"train": 0.5, "test": 0.5}, seed=3)
+
+        with zipfile.ZipFile(archive) as file:
+            assert sorted(file.namelist()) == ["sample_test.csv", "sample_train.csv"]
+            rows = [len(file.read(shard.name).splitlines()) - 1 for shard in shards]
+        assert rows == [shard.rows for shard in shards]
+        assert sum(rows) == 10
+
+    @pytest.mark.parametrize("name", ["shards.tar", "shards.zip"])
+    def test_archive_sink_workers(self, name):
+        """
+        Test that shards written by concurrent workers are added whole to the archive.
+        """
+        self.create_sample_csv(400)
+        archive = os.path.join(self.test_dir, name)
+        splitter = Splitter(self.sample_csv, sink=ArchiveSink(archive))
+        with splitter.sink:
+            splitter.execute(splitter.plan(rows=10), workers=4)
+
+        expected = self.reference_shards(10)
+        if name.endswith(".zip"):
+            with zipfile.ZipFile(archive) as file:
+                shards = {member: file.read(member) for member in file.namelist()}
+        else:
+            with tarfile.open(archive) as file:
+                shards = {member.name: file.extractfile(member).read() for member in file.getmembers()}
+        assert shards == expected
+
+    def test_archive_sink_unknown_format(self):
+        """
+        Test that an unknown archive extension is rejected.
+        """
+        with pytest.raises(ValueError, match="Unsupported archive format"):
+            ArchiveSink(os.path.join(self.test_dir, "shards.rar"))
+
+    def test_object_store_sink_multipart(self):
+        """
+        Test multipart uploads with concurrent parts against a stand-in server.
+        """
+        self.create_sample_csv(200)
+        store = StandInStore()
+        try:
+            with ObjectStoreSink(store.endpoint, "bucket", prefix="run/", part_size=256, max_workers=3) as sink:
+                Splitter(self.sample_csv, sink=sink).by_rows(100)
+        finally:
+            store.stop()
+
+        expected = {f"/bucket/run/{name}": data for name, data in self.reference_shards(100).items()}
+        assert store.objects == expected
+        assert store.uploads == {}
+        assert any(method == "POST" for method, _, _ in store.requests)
+
+    def test_object_store_sink_single_put_signed(self):
+        """
+        Test that small shards use a single signed PUT.
+        """
+        store = StandInStore()
+        try:
+            with ObjectStoreSink(store.endpoint, "bucket", access_key="AK", secret_key="SK") as sink:
+                Splitter(self.sample_csv, sink=sink).by_rows(5)
+        finally:
+            store.stop()
+
+        assert sorted(store.objects) == ["/bucket/sample_1.csv", "/bucket/sample_2.csv"]
+        for method, _, headers in store.requests:
+            assert method == "PUT"
+            assert headers["Authorization"].startswith("AWS4-HMAC-SHA256 Credential=AK/")
+
+    def test_object_store_sink_error(self):
+        """
+        Test that a failing part aborts the upload and surfaces an error.
+        """
+        store = StandInStore()
+        store.fail_parts = True
+        try:
+            with ObjectStoreSink(store.endpoint, "bucket", part_size=64) as sink:
+                upload = sink.open("failing.csv")
+                upload.write(b"x" * 100)
+                # the first part has failed before the shard is closed with the rest
+                futures.wait(upload._parts)
+                with pytest.raises(ObjectStoreError):
+                    upload.close()
+        finally:
+            store.stop()
+
+        assert store.objects == {}
+        assert store.uploads == {}
+
+    @pytest.mark.parametrize("part_size", [64, 4096])
+    def test_object_store_sink_failed_split(self, part_size):
+        """
+        Test that a failed split leaves no object in the bucket and no upload open.
+        """
+        with open(self.sample_csv, 'a', newline='', encoding='utf-8') as file:
+            csv.writer(file).writerow([11, 'Person_11', 'unknown', 'City_1'])
+        store = StandInStore()
+        try:
+            with ObjectStoreSink(store.endpoint, "bucket", part_size=part_size) as sink:
+                with pytest.raises(ValueError, match="Not a number"):
+                    Splitter(self.sample_csv, sink=sink).split(max_span=("Age", 100), rows=4)
+        finally:
+            store.stop()
+
+        assert store.objects == {}
+        assert store.uploads == {}
+        # large shards were uploaded then aborted, small ones never left the sink
+        if part_size == 64: assert any(method == "DELETE" for method, _, _ in store.requests)
+        else: assert store.requests == []
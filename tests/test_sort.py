@@ -0,0 +1,110 @@
+"""
+Tests for the sort_key option of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import random
+import tempfile
+import shutil
+
+from datashear.core import Splitter
+
+
+class TestSplitterSort:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['ID', 'Score', 'Group']
+        self.create_sample_csv(3000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file with shuffled scores and a few empty ones.
+        """
+        rng = random.Random(0)
+        scores = [str(rng.randrange(1000)) if i % 50 else '' for i in range(rows)]
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            for i, score in enumerate(scores):
+                writer.writerow([i, score, f'group\n{i % 3}'])
+
+    def read_rows(self, shards):
+        """
+        Return the data rows of every shard, in shard order.
+        """
+        result = []
+        for shard in shards:
+            with open(os.path.join(self.output_dir, shard.name), 'r', newline='', encoding='utf-8') as file:
+                result.append([row for row in csv.reader(file) if row != self.header])
+        return result
+
+    def expected_rows(self, key):
+        """
+        Return the data rows of the input sorted in memory.
+        """
+        with open(self.sample_csv, 'r', newline='', encoding='utf-8') as file:
+            return sorted(list(csv.reader(file))[1:], key=key)
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_sort_typed_column(self):
+        """
+        Test that shards are sorted numerically, do not overlap and keep ties in input order.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).by_rows(500, sort_key=("Score", int))
+        rows = self.read_rows(shards)
+
+        expected = self.expected_rows(lambda row: (row[1] != '', int(row[1] or 0)))
+        assert sum(rows, []) == expected
+        for previous, following in zip(rows, rows[1:]):
+            assert int(previous[-1][1] or -1) <= int(following[0][1] or -1)
+
+    def test_sort_many_runs(self):
+        """
+        Test a sort spilling more runs than can be merged in one pass.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).by_size(
+            8192, engine="raw", sort_key=[("Group", str), ("ID", int)], memory_limit=2048
+        )
+
+        assert sum(self.read_rows(shards), []) == self.expected_rows(lambda row: (row[2], int(row[0])))
+
+    def test_sort_parallel_runs(self):
+        """
+        Test that runs sorted by several processes give the same result.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=1000, sort_key="Score", memory_limit=64 * 1024,
+                                                                  workers=2)
+
+        assert sum(self.read_rows(shards), []) == self.expected_rows(lambda row: (row[1] != '', row[1]))
+
+    def test_sort_invalid_key(self):
+        """
+        Test error handling for invalid sort keys.
+        """
+        splitter = Splitter(self.sample_csv, self.output_dir)
+
+        with pytest.raises(ValueError, match="Unknown column"):
+            splitter.by_rows(100, sort_key="Missing")
+        with pytest.raises(ValueError, match="Cannot convert"):
+            splitter.by_rows(100, sort_key=("Group", int))
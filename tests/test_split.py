@@ -0,0 +1,153 @@
+"""
+Tests for the split method of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import gzip
+import tempfile
+import shutil
+import datetime
+
+from datashear.core import Splitter
+
+
+class TestSplitterSplit:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['ID', 'Day', 'Time', 'Payload']
+        self.create_sample_csv(500)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file sorted by day.
+        """
+        start = datetime.datetime(2024, 1, 1)
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            for i in range(rows):
+                time = start + datetime.timedelta(minutes=7 * i)
+                writer.writerow([i, time.date().isoformat(), time.isoformat(), 'x' * (i % 37)])
+
+    def read_shards(self, shards, compressed=False):
+        """
+        Return the parsed data rows of every shard of a manifest.
+        """
+        opener = gzip.open if compressed else open
+        result = []
+        for shard in shards:
+            with opener(os.path.join(self.output_dir, shard.name), 'rt', newline='', encoding='utf-8') as file:
+                result.append([row for row in csv.reader(file) if row != self.header])
+        return result
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_split_rows_and_size(self):
+        """
+        Test that both limits hold in every shard.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=40, size=2200)
+
+        for shard in shards:
+            assert shard.rows <= 40
+            assert shard.size <= 2200
+            assert os.path.getsize(os.path.join(self.output_dir, shard.name)) == shard.size
+        assert any(shard.rows == 40 for shard in shards)
+        assert any(shard.rows < 40 for shard in shards[:-1])
+        assert sum(shard.rows for shard in shards) == 500
+
+    def test_by_rows_is_split_by_rows(self):
+        """
+        Test that by_rows and split give the same shards.
+        """
+        expected = Splitter(self.sample_csv, self.output_dir).by_rows(64, engine="raw")
+        contents = self.read_shards(expected)
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=64)
+
+        assert [shard.to_dict() for shard in shards] == [shard.to_dict() for shard in expected]
+        assert self.read_shards(shards) == contents
+
+    def test_split_compressed_size(self):
+        """
+        Test that gzip shards stay under the compressed size limit.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).split(compressed_size=2000, compression="gzip")
+
+        assert len(shards) > 1
+        for shard in shards:
+            assert shard.name.endswith(".csv.gz")
+            assert os.path.getsize(os.path.join(self.output_dir, shard.name)) == shard.compressed_size
+            assert shard.compressed_size <= 2000
+        rows = [row for shard in self.read_shards(shards, compressed=True) for row in shard]
+        assert [int(row[0]) for row in rows] == list(range(500))
+
+    @pytest.mark.parametrize("engine", ["raw", "csv"])
+    def test_split_compressed_size_filled(self, engine):
+        """
+        Test that gzip shards fill up to the compressed size limit, not to what deflate held back.
+        """
+        self.create_sample_csv(20000)
+        shards = Splitter(self.sample_csv, self.output_dir).split(compressed_size=20000, compression="gzip",
+                                                                  engine=engine)
+
+        assert all(19000 <= shard.compressed_size <= 20000 for shard in shards[:-1])
+        assert shards[-1].compressed_size <= 20000
+        rows = [row for shard in self.read_shards(shards, compressed=True) for row in shard]
+        assert [int(row[0]) for row in rows] == list(range(20000))
+
+    def test_split_by_key(self):
+        """
+        Test that a key change starts a new shard, combined with a row limit.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).split(key="Day", rows=150)
+
+        for rows in self.read_shards(shards):
+            assert len({row[1] for row in rows}) == 1
+        assert [shard.rows for shard in shards] == [150, 56, 150, 56, 88]
+
+    def test_split_by_time_span(self):
+        """
+        Test that no shard covers more than the given time span.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).split(max_span=("Time", 3600))
+
+        for rows in self.read_shards(shards):
+            first = datetime.datetime.fromisoformat(rows[0][2])
+            last = datetime.datetime.fromisoformat(rows[-1][2])
+            assert (last - first).total_seconds() <= 3600
+        assert len(shards) == 56
+
+    def test_split_invalid_parameters(self):
+        """
+        Test error handling for invalid parameters.
+        """
+        splitter = Splitter(self.sample_csv, self.output_dir)
+
+        with pytest.raises(ValueError, match="at least one limit"):
+            splitter.split()
+        with pytest.raises(ValueError, match="compressed_size needs a compression"):
+            splitter.split(compressed_size=1000)
+        with pytest.raises(ValueError, match="Unknown column"):
+            splitter.split(key="Missing")
+        with pytest.raises(ValueError, match="rows per file must be greater than 0"):
+            splitter.split(rows=0)
@@ -0,0 +1,148 @@
+"""
+Tests for the per-shard column statistics (zone maps) of the Splitter class.
+"""
+
+import pytest
+import os
+import csv
+import json
+import tempfile
+import shutil
+
+from datashear.core import Splitter
+from datashear.sink import MemorySink
+from datashear.stats import ColumnStats, ZoneMap
+
+
+class TestSplitterStats:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        self.header = ['ID', 'Price', 'Day', 'Name', 'Comment']
+        self.create_sample_csv(1000)
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, rows):
+        """
+        Create a sample CSV file with typed columns, empty fields and multiline values.
+        """
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            for i in range(rows):
+                price = '' if i % 10 == 0 else (str(i) if i < 500 else f'{i}.5')
+                writer.writerow([i, price, f'2024-01-{i // 100 + 1:02d}', f'name {i:04d}', f'line\n{i}'])
+
+    def load_zone_map(self):
+        """
+        Return the zone map written next to the shards.
+        """
+        return ZoneMap.load(os.path.join(self.output_dir, "sample_stats.json"))
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_stats_per_shard(self):
+        """
+        Test the type, min, max and null count of every column of every shard.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).by_rows(250, stats=True)
+
+        assert [shard.stats['ID'] for shard in shards] == [
+            {'type': 'int', 'nulls': 0, 'min': i * 250, 'max': i * 250 + 249} for i in range(4)
+        ]
+        assert [shard.stats['Price']['type'] for shard in shards] == ['int', 'int', 'float', 'float']
+        assert shards[0].stats['Price']['nulls'] == 25
+        assert shards[3].stats['Price']['max'] == 999.5
+        assert shards[1].stats['Day'] == {'type': 'date', 'nulls': 0, 'min': '2024-01-03', 'max': '2024-01-05'}
+        assert shards[2].stats['Name']['min'] == 'name 0500'
+        assert shards[0].to_dict()['stats'] == shards[0].stats
+
+    def test_stats_type_widening(self):
+        """
+        Test that a column widens its type when a batch does not fit it.
+        """
+        column = ColumnStats()
+        column.update(('3', '1', ''))
+        column.update(('2.5', '7'))
+        assert (column.kind, column.min, column.max, column.nulls) == ('float', 1.0, 7.0, 1)
+
+        column.update(('n/a',))
+        assert (column.kind, column.min, column.max) == ('string', '1', 'n/a')
+
+        column = ColumnStats()
+        column.update(('2024-01-02',))
+        column.update(('2024-01-01T12:00:00',))
+        assert (column.kind, column.min.isoformat(), column.max.isoformat()) == (
+            'datetime', '2024-01-01T12:00:00', '2024-01-02T00:00:00'
+        )
+
+    def test_stats_sidecar_pruning(self):
+        """
+        Test that the sidecar file lets readers skip shards, with the raw engine.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).split(size=20000, stats=True)
+        zone_map = self.load_zone_map()
+
+        assert [shard['name'] for shard in zone_map.shards] == [shard.name for shard in shards]
+        assert sum(shard['rows'] for shard in zone_map.shards) == 1000
+        assert zone_map.select("ID", 0, 0) == [shards[0].name]
+        assert zone_map.select("ID", 10000) == []
+        assert zone_map.select("Day", "2024-01-10") == [shard.name for shard in shards if shard.stats['ID']['max'] >= 900]
+        assert zone_map.select(3, high="name 0000") == [shards[0].name]
+        assert len(zone_map.select("Comment", 0)) == len(shards)
+
+    def test_stats_large_field(self):
+        """
+        Test that fields over the csv field size limit are gathered like the others.
+        """
+        comment = "long comment, " * 20000
+        with open(self.sample_csv, 'a', newline='', encoding='utf-8') as file:
+            csv.writer(file).writerow([1000, '1000.5', '2024-01-11', 'name 1000', comment])
+        limit = csv.field_size_limit(128 * 1024)
+        try:
+            shards = Splitter(self.sample_csv, self.output_dir).split(rows=500, stats=True)
+        finally:
+            csv.field_size_limit(limit)
+
+        assert [shard.rows for shard in shards] == [500, 500, 1]
+        stats = shards[2].stats
+        assert stats['Comment'] == {'type': 'string', 'nulls': 0, 'min': comment, 'max': comment}
+        assert stats['ID']['max'] == 1000
+
+    def test_stats_sink(self):
+        """
+        Test that the sidecar file goes through the sink.
+        """
+        sink = MemorySink()
+        Splitter(self.sample_csv, sink=sink).by_size(50000, stats=True)
+
+        data = json.loads(sink.files["sample_stats.json"])
+        assert data['columns'] == self.header
+        assert len(data['shards']) == len(sink.files) - 1
+
+    def test_stats_disabled(self):
+        """
+        Test that no statistics are gathered by default.
+        """
+        shards = Splitter(self.sample_csv, self.output_dir).by_rows(500)
+
+        assert all(shard.stats is None for shard in shards)
+        assert not os.path.exists(os.path.join(self.output_dir, "sample_stats.json"))
+        with pytest.raises(ValueError, match="Unknown column"):
+            ZoneMap(self.header, []).select("Missing")
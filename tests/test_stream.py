@@ -0,0 +1,155 @@
+"""
+Tests for splitting file objects: in-memory buffers, pipes and text streams.
+"""
+
+import pytest
+import os
+import csv
+import io
+import subprocess
+import sys
+import tempfile
+import shutil
+
+from datashear.adaptive import AdaptiveSizer
+from datashear.core import Splitter
+
+
+class TestSplitterStream:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['ID', 'Name', 'Comment'])
+            for i in range(1000):
+                writer.writerow([i, f'name {i}', f'line\n{i}' if i % 5 == 0 else f'comment {i}'])
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def pipe(self):
+        """
+        Return a child process writing the sample CSV file to a pipe.
+        """
+        command = [sys.executable, "-c", "import shutil, sys; shutil.copyfileobj(open(sys.argv[1], 'rb'), sys.stdout.buffer)",
+                   self.sample_csv]
+        return subprocess.Popen(command, stdout=subprocess.PIPE)
+
+    def read_outputs(self, shards):
+        """
+        Return the bytes of every shard, in shard order.
+        """
+        outputs = []
+        for shard in shards:
+            with open(os.path.join(self.output_dir, shard.name), 'rb') as file:
+                outputs.append(file.read())
+        return outputs
+
+    def expected_outputs(self, **options):
+        """
+        Return the bytes of the shards of the sample CSV file split from its path.
+        """
+        directory = os.path.join(self.test_dir, "expected")
+        shards = Splitter(self.sample_csv, directory).split(**options)
+        outputs = []
+        for shard in shards:
+            with open(os.path.join(directory, shard.name), 'rb') as file:
+                outputs.append(file.read())
+        return outputs
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_bytes_buffer(self):
+        """
+        Test that an in-memory buffer is split like the file, and can be split again.
+        """
+        with open(self.sample_csv, 'rb') as file:
+            buffer = io.BytesIO(file.read())
+        splitter = Splitter(buffer, self.output_dir)
+
+        shards = splitter.split(rows=300)
+        assert [shard.name for shard in shards] == [f"stream_{i}.csv" for i in range(1, 5)]
+        assert self.read_outputs(shards) == self.expected_outputs(rows=300)
+        assert self.read_outputs(splitter.split(size=4096)) == self.expected_outputs(size=4096)
+
+    @pytest.mark.parametrize("engine", ["raw", "csv"])
+    def test_size_while_reading(self, engine):
+        """
+        Test that asking the size of a file object while it is read, as adaptive splits do, reads on.
+        """
+        sizer = AdaptiveSizer(target_time=1, feedback=lambda shard: 4096)
+        with open(self.sample_csv, 'rb') as file:
+            splitter = Splitter(file, self.output_dir, output_base_filename="sample")
+            shards = splitter.split(size=4096, engine=engine, adaptive=sizer)
+
+        assert self.read_outputs(shards) == self.expected_outputs(size=4096, engine=engine)
+
+    def test_pipe(self):
+        """
+        Test that a non-seekable pipe is split in one pass, with both engines.
+        """
+        for engine in ("raw", "csv"):
+            process = self.pipe()
+            shards = Splitter(process.stdout, self.output_dir).split(rows=300, engine=engine)
+            process.wait()
+            process.stdout.close()
+            assert self.read_outputs(shards) == self.expected_outputs(rows=300, engine=engine)
+
+    def test_pipe_read_once(self):
+        """
+        Test that reading a pipe a second time fails clearly.
+        """
+        process = self.pipe()
+        splitter = Splitter(process.stdout, self.output_dir)
+        splitter.by_rows(500)
+        with pytest.raises(ValueError):
+            splitter.by_rows(500)
+        process.wait()
+        process.stdout.close()
+
+    def test_text_stream(self):
+        """
+        Test that a text stream without a binary buffer is split as UTF-8.
+        """
+        with open(self.sample_csv, 'r', newline='', encoding='utf-8') as file:
+            text = io.StringIO(file.read(), newline='')
+        shards = Splitter(text, self.output_dir, output_base_filename="sample").split(size=4096, stats=True)
+
+        assert self.read_outputs(shards) == self.expected_outputs(size=4096, stats=True)
+        assert os.path.exists(os.path.join(self.output_dir, "sample_stats.json"))
+
+    def test_seeking_modes_fall_back(self):
+        """
+        Test that ranges and plans of a pipe work on a temporary copy of it.
+        """
+        process = self.pipe()
+        shards = Splitter(process.stdout, self.output_dir, row_range=(100, 400)).by_rows(100)
+        process.wait()
+        process.stdout.close()
+        expected = Splitter(self.sample_csv, os.path.join(self.test_dir, "expected"), row_range=(100, 400)).by_rows(100)
+        assert [shard.rows for shard in shards] == [shard.rows for shard in expected] == [100, 100, 100]
+
+        process = self.pipe()
+        splitter = Splitter(process.stdout, self.output_dir)
+        plan = splitter.plan(rows=250)
+        process.wait()
+        process.stdout.close()
+        assert [shard.rows for shard in plan.shards] == [250] * 4
+        splitter.execute(plan)
+        with pytest.raises(ValueError):
+            Splitter(io.BytesIO(b"a,b\n1,2\n"), self.output_dir).split(rows=1, cache=os.path.join(self.test_dir, "cache"))
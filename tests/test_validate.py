@@ -0,0 +1,185 @@
+"""
+Tests for the validation of records, with malformed rows quarantined to a reject file.
+"""
+
+import pytest
+import os
+import csv
+import tempfile
+import shutil
+import tracemalloc
+
+from datashear.core import Splitter
+from datashear.validate import Validator
+
+
+class TestSplitterValidate:
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Utils
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def setup_method(self):
+        """
+        Set up test fixtures before each test method.
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, "output")
+        self.sample_csv = os.path.join(self.test_dir, "sample.csv")
+
+    def teardown_method(self):
+        """
+        Clean up after each test method.
+        """
+        shutil.rmtree(self.test_dir)
+
+    def create_sample_csv(self, bad_lines=None):
+        """
+        Write 500 valid rows, with quoted delimiters, line feeds and quotes, then replace some lines.
+        """
+        bad_lines = bad_lines or {}
+        with open(self.sample_csv, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['ID', 'Name', 'Comment'])
+            for i in range(500):
+                if i in bad_lines: file.write(bad_lines[i])
+                else: writer.writerow([i, f'name, {i}', f'say "hi"\n{i}' if i % 3 == 0 else f'comment {i}'])
+
+    def read_rows(self, shards):
+        """
+        Return the data rows of every shard, in shard order.
+        """
+        rows = []
+        for shard in shards:
+            with open(os.path.join(self.output_dir, shard.name), newline='', encoding='utf-8') as file:
+                rows.extend(list(csv.reader(file))[1:])
+        return rows
+
+    def read_rejects(self):
+        """
+        Return the rows of the reject file, without its header.
+        """
+        with open(os.path.join(self.output_dir, "sample_rejects.csv"), newline='', encoding='utf-8') as file:
+            return list(csv.reader(file))[1:]
+
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+    Tests
+    """""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+    def test_valid_input(self):
+        """
+        Test that a valid input gives the same shards and no reject file.
+        """
+        self.create_sample_csv()
+        validator = Validator()
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=100, validate=validator)
+
+        assert (validator.records, validator.rejected) == (500, 0)
+        assert [shard.rows for shard in shards] == [100] * 5
+        assert len(self.read_rows(shards)) == 500
+        assert not os.path.exists(os.path.join(self.output_dir, "sample_rejects.csv"))
+
+    def test_wrong_field_count(self):
+        """
+        Test that rows with too few or too many fields are rejected with their offsets.
+        """
+        self.create_sample_csv({10: '10,too few\n', 20: '20,a,b,"c,d",e\n', 499: '499,last,row,extra'})
+        validator = Validator()
+        shards = Splitter(self.sample_csv, self.output_dir).split(rows=100, validate=validator)
+
+        assert (validator.records, validator.rejected, validator.errors) == (500, 3, {'fields': 3, 'quote': 0})
+        assert sum(shard.rows for shard in shards) == 497
+        assert [row[0] for row in self.read_rows(shards)] == [str(i) for i in range(499) if i not in (10, 20)]
+
+        with open(self.sample_csv, 'rb') as file:
+            data = file.read()
+        rejects = self.read_rejects()
+        assert [(row[1], row[2]) for row in rejects] == [
+            ('fields', '10,too few\n'), ('fields', '20,a,b,"c,d",e\n'), ('fields', '499,last,row,extra')
+        ]
+        for offset, _, record in rejects:
+            assert data[int(offset):].startswith(record.encode('utf-8'))
+
+    def test_unterminated_quote(self):
+        """
+        Test that only the first line of a record with an unclosed quote is rejected.
+        """
+        self.create_sample_csv({250: '250,"open quote,never closed\n'})
+        validator = Validator()
+        shards = Splitter(self.sample_csv, self.output_dir).by_size(4096, validate=validator)
+
+        assert validator.errors == {'fields': 0, 'quote': 1}
+        assert [row[0] for row in self.read_rows(shards)] == [str(i) for i in range(500) if i != 250]
+        assert [row[1:] for row in self.read_rejects()] == [['quote', '250,"open quote,never closed\n']]
+
+    @pytest.mark.parametrize("buffer_size", [16, 64 * 1024])
+    def test_quoted_lines_with_wrong_field_count(self, buffer_size):
+        """
+        Test that a record whose quoted field spans lines is rejected whole when its field count is wrong.
+        """
+        record = '100,"x\n2,3,4\ny"\n'
+        self.create_sample_csv({100: record})
+        validator = Validator(buffer_size=buffer_size)
+        shards = Splitter(self.sample_csv, self.output_dir).by_rows(100, validate=validator)
+
+        assert validator.errors == {'fields': 1, 'quote': 0}
+        assert [row[0] for row in self.read_rows(shards)] == [str(i) for i in range(500) if i != 100]
+        assert [row[1:] for row in self.read_rejects()] == [['fields', record]]
+
+    def test_byte_range_offsets(self):
+        """
+        Test that reject offsets are offsets in the whole input when splitting a byte range.
+        """
+        self.create_sample_csv({300: 'broken\n'})
+        size = os.path.getsize(self.sample_csv)
+        Splitter(self.sample_csv, self.output_dir, byte_range=(size // 2, None)).by_rows(100, validate=True)
+
+        with open(self.sample_csv, 'rb') as file:
+            data = file.read()
+        (offset, reason, record), = self.read_rejects()
+        assert (reason, record) == ('fields', 'broken\n')
+        assert data[int(offset):int(offset) + 7] == b'broken\n'
+
+    def test_long_quoted_record(self):
+        """
+        Test that a record with a field of many lines is checked within a bounded buffer, then passed whole.
+        """
+        peaks = []
+        for lines in (100000, 200000):
+            field = "a line, of text\n" * lines
+            self.create_sample_csv({100: f'100,long,"{field}"\n', 250: '250,"open quote,never closed\n'})
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            validator = Validator(buffer_size=64 * 1024)
+            tracemalloc.start()
+            try:
+                shards = Splitter(self.sample_csv, self.output_dir).split(rows=100, validate=validator,
+                                                                          buffer_size=64 * 1024)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+            assert validator.errors == {'fields': 0, 'quote': 1}
+            limit = csv.field_size_limit(len(field) + 1)
+            try: rows = self.read_rows(shards)
+            finally: csv.field_size_limit(limit)
+            assert [row[0] for row in rows] == [str(i) for i in range(500) if i != 250]
+            assert rows[100][2] == field
+
+        # the field doubled, the memory held did not
+        assert peaks[1] <= peaks[0] * 1.1
+
+    def test_spooled_record_cut(self):
+        """
+        Test that a record moved to a temporary file is cut and framed again like one held in memory.
+        """
+        self.create_sample_csv({250: '250,"open quote,never closed\n'})
+        expected = Splitter(self.sample_csv, self.output_dir).by_rows(100, validate=True)
+        expected_rows, expected_rejects = self.read_rows(expected), self.read_rejects()
+        shutil.rmtree(self.output_dir)
+
+        validator = Validator(buffer_size=16)
+        shards = Splitter(self.sample_csv, self.output_dir).by_rows(100, validate=validator)
+
+        assert self.read_rows(shards) == expected_rows
+        assert self.read_rejects() == expected_rejects
+        assert validator.errors == {'fields': 0, 'quote': 1}